@@ -0,0 +1,231 @@
+"""
+Batch structured extraction: many records per LLM call.
+
+custom_parsing.py extracts one User per request and lang_parser_2.py one
+People per query.  For bulk backfills that is one round trip, one system
+prompt and one schema per record.  BatchExtractor packs N input texts into one
+request as indexed slots, asks for a JSON array back, validates every element
+against the model, and re-submits only the records that were missing or
+invalid.  Batch size adapts to the context window and the output-token limit
+(learning the output size per record as it goes) and shrinks when a response
+is cut off.
+
+    extractor = BatchExtractor(openai_complete(client, "qwen/qwen3-32b"), User,
+                               "Extract the contact details of each person.")
+    results = extractor.extract(statements)
+"""
+import pathlib
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence, Type
+
+from pydantic import BaseModel, ValidationError
+
+from partial_json import JsonEvent, StreamingJsonParser
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "prompt_engineering"))
+from instrumentation import response_usage, usage_counts
+from schema_registry import get_schema
+
+_PROMPT = """{instruction}
+Each record below starts with its index in square brackets.
+Return ONLY a JSON array with one element per record, in any order:
+[{{"index": <record index>, "data": <object for that record>}}, ...]
+Every "data" object must match this JSON schema: {schema}
+
+Records:
+{records}"""
+
+
+def response_text(response: Any) -> str:
+    """Text of a ChatCompletion, a LangChain/LlamaIndex message, or a plain string."""
+    if isinstance(response, str):
+        return response
+    if hasattr(response, "choices"):
+        return response.choices[0].message.content or ""
+    if hasattr(response, "message"):
+        return response.message.content or ""
+    return response.content or ""
+
+
+def response_truncated(response: Any) -> bool:
+    choices = getattr(response, "choices", None)
+    return bool(choices) and choices[0].finish_reason == "length"
+
+
+def openai_complete(client, model: str, **settings) -> Callable[[List[dict]], Any]:
+    """complete(messages) for an OpenAI/Groq client."""
+    return lambda messages: client.chat.completions.create(model=model, messages=messages, **settings)
+
+
+@dataclass
+class ExtractionResult:
+    index: int
+    value: Optional[BaseModel] = None
+    error: Optional[str] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.value is not None
+
+
+@dataclass
+class BatchStats:
+    requests: int = 0
+    records: int = 0
+    resubmitted: int = 0
+    failed: int = 0
+    truncated: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    batch_sizes: List[int] = field(default_factory=list)
+
+    @property
+    def records_per_request(self) -> float:
+        return self.records / self.requests if self.requests else 0.0
+
+
+def _array_of_objects(event: JsonEvent) -> bool:
+    """First event of an array of records; an echoed "record [0]" is prose, not the answer."""
+    if not event.path:
+        return isinstance(event.value, list)
+    return isinstance(event.path[0], int) and (len(event.path) > 1 or isinstance(event.value, dict))
+
+
+class BatchExtractor:
+
+    def __init__(self, complete: Callable[[List[dict]], Any], schema_model: Type[BaseModel], instruction: str,
+                 context_window: int = 8192, max_output_tokens: int = 2048,
+                 count_tokens: Optional[Callable[[str], int]] = None, max_batch: int = 64,
+                 max_attempts: int = 3, output_tokens_per_record: Optional[int] = None):
+        self.complete = complete
+        self.schema = get_schema(schema_model)
+        self.instruction = instruction
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+        self.count_tokens = count_tokens or (lambda text: (len(text) + 3) // 4)
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.stats = BatchStats()
+        self._overhead = self.count_tokens(_PROMPT.format(
+            instruction=instruction, schema=self.schema.schema_text, records=""))
+        # until we have seen real responses, assume a record's output is about its schema's size
+        self._out_per_record = float(output_tokens_per_record or self.count_tokens(self.schema.schema_text))
+
+    def _next_batch(self, queue: deque, texts: Sequence[str]) -> List[int]:
+        input_budget = self.context_window - self.max_output_tokens - self._overhead
+        output_budget = self.max_output_tokens * 0.9
+        batch, used = [], 0
+        while queue and len(batch) < self.max_batch:
+            index = queue[0]
+            cost = self.count_tokens(texts[index]) + 4
+            if batch and (used + cost > input_budget or (len(batch) + 1) * self._out_per_record > output_budget):
+                break
+            batch.append(queue.popleft())
+            used += cost
+        return batch
+
+    def _parse(self, text: str) -> List[Any]:
+        """Completed array elements, including those before a truncation point."""
+        parser = StreamingJsonParser(accept=_array_of_objects)
+        items = []
+        try:
+            for path, value in parser.feed(text):
+                if path and isinstance(path[-1], int) and len(path) <= 2:
+                    items.append(value)
+        except ValueError:
+            pass
+        return items
+
+    def extract(self, texts: Sequence[str]) -> List[ExtractionResult]:
+        results = [ExtractionResult(i) for i in range(len(texts))]
+        queue = deque(range(len(texts)))
+        self.stats.records += len(texts)
+
+        while queue:
+            batch = self._next_batch(queue, texts)
+            records = "\n".join(f"[{i}] {texts[i]}" for i in batch)
+            prompt = _PROMPT.format(instruction=self.instruction, schema=self.schema.schema_text, records=records)
+            for i in batch:
+                results[i].attempts += 1
+
+            try:
+                response = self.complete([{"role": "user", "content": prompt}])
+            except Exception as e:
+                response, error = None, f"request failed: {e!r}"
+            else:
+                error = "missing from the response"
+            self.stats.requests += 1
+            self.stats.batch_sizes.append(len(batch))
+
+            pending = set(batch)
+            if response is not None:
+                text = response_text(response)
+                usage = response_usage(response)
+                prompt_tokens, completion_tokens, _ = usage_counts(usage)
+                self.stats.prompt_tokens += prompt_tokens
+                self.stats.completion_tokens += completion_tokens
+                returned = 0
+                for item in self._parse(text):
+                    index = item.get("index") if isinstance(item, dict) else None
+                    # the model may echo anything as the index, e.g. a list, which is not hashable
+                    if type(index) is not int or index not in pending:
+                        continue
+                    returned += 1
+                    try:
+                        results[index].value = self.schema.validate_python(item.get("data"))
+                    except ValidationError as e:
+                        results[index].error = str(e)
+                        continue
+                    results[index].error = None
+                    pending.discard(index)
+
+                out_tokens = completion_tokens if usage is not None else self.count_tokens(text)
+                if returned:
+                    self._out_per_record = 0.7 * self._out_per_record + 0.3 * (out_tokens / returned)
+                if response_truncated(response):
+                    self.stats.truncated += 1
+                    # the model ran out of room: plan smaller batches from now on
+                    self._out_per_record *= 1.5
+
+            for index in sorted(pending):
+                if results[index].error is None:
+                    results[index].error = error
+                if results[index].attempts < self.max_attempts:
+                    queue.append(index)
+                    self.stats.resubmitted += 1
+                else:
+                    self.stats.failed += 1
+        return results
+
+
+if __name__ == "__main__":
+    # offline demo with a stub "LLM" that answers from the records, dropping one on the first try
+    import json
+    import re
+
+    class Person(BaseModel):
+        """Information about a person."""
+        name: str
+        age: int
+
+    seen = set()
+
+    def fake_complete(messages):
+        time.sleep(0.001)
+        items = []
+        for index, name, age in re.findall(r"\[(\d+)\] (\w+) is (\d+) years old", messages[0]["content"]):
+            if index == "7" and index not in seen:
+                seen.add(index)
+                continue
+            items.append({"index": int(index), "data": {"name": name, "age": int(age)}})
+        return "```json\n" + json.dumps(items) + "\n```"
+
+    texts = [f"Person{i} is {20 + i % 50} years old" for i in range(1000)]
+    extractor = BatchExtractor(fake_complete, Person, "Extract the name and age of each person.")
+    results = extractor.extract(texts)
+    print(f"{sum(r.ok for r in results)}/{len(texts)} records in {extractor.stats.requests} requests "
+          f"({extractor.stats.records_per_request:.1f} records/request, "
+          f"{extractor.stats.resubmitted} resubmitted, batch sizes {extractor.stats.batch_sizes[:5]}...)")
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark: greedy regex + json.loads (old extract_and_validate_json path)
+vs the single-pass JsonExtractor on synthetic reasoning-model outputs of 1 KB - 1 MB.
+
+    python bench_json_extractor.py
+"""
+import json
+import re
+import timeit
+
+from json_extractor import extract_json
+
+ANSWER = {
+    "name": "Ram",
+    "surname": "kumar",
+    "age": 26,
+    "email": "ram@social.com",
+    "phone": "1234567890",
+    "social_accounts": {"bluesky": "ramkumar", "instagram": "ramkumar_26"},
+}
+
+
+def make_output(size: int) -> str:
+    """<think> preamble with stray brace blocks, then a fenced answer, then chatter."""
+    thought = 'Okay, the schema looks like {"name": str, "age": int}; let me check the text again. '
+    think = "<think>\n" + thought * max(1, (size - 300) // len(thought)) + "\n</think>\n"
+    answer = "```json\n" + json.dumps(ANSWER, indent=2) + "\n```\n"
+    return think + answer + "Let me know if you need {anything} else!"
+
+
+def regex_path(text):
+    match = re.search(r"\{[\s\S]*\}", text)
+    try:
+        return json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+
+
+def extractor_path(text):
+    return extract_json(text)
+
+
+if __name__ == "__main__":
+    print(f"{'size':>8} | {'regex us':>10} {'ok':>3} | {'extractor us':>12} {'ok':>3}")
+    for size in (1_000, 10_000, 100_000, 1_000_000):
+        text = make_output(size)
+        number = max(3, 200_000 // size)
+        row = [f"{len(text) / 1000:>6.0f}KB"]
+        for fn in (regex_path, extractor_path):
+            seconds = min(timeit.repeat(lambda: fn(text), number=number, repeat=3)) / number
+            ok = "yes" if fn(text) == ANSWER else "no"
+            row.append(f"{seconds * 1e6:>10.1f} {ok:>3}")
+        print(" | ".join(row))
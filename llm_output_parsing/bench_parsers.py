@@ -0,0 +1,466 @@
+"""
+Every way this directory turns LLM text into objects, on one corpus.
+
+Strategies (the ones whose package is not installed are listed and skipped):
+
+  regex_greedy      - greedy {...} regex + json.loads, the old custom_parsing.py path
+  fence_regex       - lang_parser_2.extract_json's ```json regex + json.loads
+  cascade           - parser_cascade.PARSER, what custom_parsing.py uses now
+  lc_pydantic       - LangChain PydanticOutputParser
+  lc_json           - LangChain JsonOutputParser + model_validate
+  li_pydantic       - LlamaIndex PydanticOutputParser (what as_structured_llm falls back to)
+  openai_parse      - beta.chat.completions.parse (structure_output_openai.py), run through
+                      an in-process transport, so it includes the SDK's request handling;
+                      structured outputs are always clean JSON, so clean entries only
+  lc_xml / etree / stream_xml    - XML renderings: XMLOutputParser, ElementTree, StreamingXmlParser
+  lc_yaml / safe_load / stream_yaml - YAML renderings: YamlOutputParser, yaml.safe_load, StreamingYamlParser
+
+The corpus covers User, Joke, People, Invoice and ContentCompliance, small
+and large (People / Invoice with a few thousand entries), clean and messy:
+fenced with prose, <think> preambles with stray braces, an example object
+before the answer, trailing commas and Python literals.  `--dump-corpus`
+writes it as JSONL and `--corpus` reads one back, so recorded outputs can be
+added next to the synthetic ones ({"schema", "variant", "format", "text"}).
+
+Per strategy and corpus group it reports us/parse, MB/s, peak allocation per
+parse (tracemalloc, separate run) and the failure rate (exception, or a value
+that differs from the expected one).  `--save-baseline` stores the numbers;
+later runs compare against the baseline and flag timings more than
+`--tolerance` slower or failure rates that went up, exiting 1 when any did.
+
+    python bench_parsers.py [--quick] [--only cascade,lc_pydantic] [--save-baseline]
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+import yaml
+from pydantic import BaseModel, Field
+
+from invoice_models import Invoice, LineItem
+from parser_cascade import PARSER
+from schema_registry import get_schema
+from stream_markup import StreamingXmlParser, StreamingYamlParser, element_value
+
+BASELINE = Path(__file__).with_name("bench_parsers_baseline.json")
+
+
+class User(BaseModel):
+    """A user profile with contact details."""
+    name: str
+    surname: str
+    age: int
+    email: str
+    phone: str
+    social_accounts: Dict[str, str]
+
+
+class Joke(BaseModel):
+    setup: str = Field(description="question to set up a joke")
+    punchline: str = Field(description="answer to resolve the joke")
+
+
+class Person(BaseModel):
+    """Information about a person."""
+    name: str = Field(..., description="The name of the person")
+    height_in_meters: float = Field(..., description="The height of the person expressed in meters.")
+
+
+class People(BaseModel):
+    """Identifying information about all people in a text."""
+    people: List[Person]
+
+
+class Category(str, Enum):
+    violence = "violence"
+    sexual = "sexual"
+    self_harm = "self_harm"
+
+
+class ContentCompliance(BaseModel):
+    is_violating: bool
+    category: Optional[Category]
+    explanation_if_violating: Optional[str]
+
+
+SCHEMAS: Dict[str, Type[BaseModel]] = {"User": User, "Joke": Joke, "People": People, "Invoice": Invoice,
+                                       "ContentCompliance": ContentCompliance}
+
+_NAMES = ["Anna", "Ram", "Tom", "Mei", "Ola", "Luis", "Priya", "Jonas"]
+
+
+class Entry(NamedTuple):
+    schema: str
+    size: str          # small / large / recorded
+    variant: str
+    format: str        # json / xml / yaml
+    text: str
+    expected: Optional[dict]
+
+    @property
+    def group(self) -> str:
+        return f"{self.schema}/{self.size}/{self.format}"
+
+
+def _objects(rng: random.Random) -> List[Tuple[str, str, BaseModel]]:
+    people = lambda n: People(people=[Person(name=f"{rng.choice(_NAMES)} {i}",
+                                             height_in_meters=round(rng.uniform(1.5, 2.0), 2)) for i in range(n)])
+    invoice = lambda n: Invoice(invoice_id="INV-2024-0042", date="2024-08-14", line_items=[
+        LineItem(Description=f"Trip {i} fare, incl. IGST", price=round(rng.uniform(50, 900), 2)) for i in range(n)])
+    return [
+        ("User", "small", User(name="Ram", surname="kumar", age=26, email="ram@social.com", phone="1234567890",
+                               social_accounts={"bluesky": "ramkumar", "instagram": "ramkumar_26"})),
+        ("Joke", "small", Joke(setup="Why did the math book look sad?", punchline="It had too many problems.")),
+        ("ContentCompliance", "small", ContentCompliance(is_violating=True, category=Category.violence,
+                                                         explanation_if_violating="Asks how to fight someone.")),
+        ("People", "small", people(2)),
+        ("Invoice", "small", invoice(3)),
+        ("People", "large", people(2000)),
+        ("Invoice", "large", invoice(2000)),
+    ]
+
+
+def _python_literals(value: Any) -> str:
+    """repr()-style output: single quotes, True/None, trailing commas."""
+    if isinstance(value, dict):
+        return "{" + "".join(f"{k!r}: {_python_literals(v)}, " for k, v in value.items()) + "}"
+    if isinstance(value, list):
+        return "[" + "".join(f"{_python_literals(v)}, " for v in value) + "]"
+    return repr(value)
+
+
+def _xml(tag: str, value: Any) -> str:
+    if isinstance(value, dict):
+        return f"<{tag}>" + "".join(_xml(k, v) for k, v in value.items()) + f"</{tag}>"
+    if isinstance(value, list):
+        return "".join(_xml(tag, v) for v in value)
+    return f"<{tag}>{'' if value is None else value}</{tag}>"
+
+
+def build_corpus(seed: int = 0) -> List[Entry]:
+    rng = random.Random(seed)
+    entries = []
+    for schema, size, obj in _objects(rng):
+        data = obj.model_dump(mode="json")
+        compact, pretty = json.dumps(data), json.dumps(data, indent=2)
+        stray = 'the schema looks like {"name": str, "age": int} so {fields} must match. '
+        for variant, text in (
+            ("clean", compact),
+            ("fenced", f"Sure! Here is the JSON you asked for:\n```json\n{pretty}\n```\nLet me know if you need more."),
+            ("think", f"<think>\n{stray * 20}\n</think>\n```json\n{pretty}\n```"),
+            ("example_first", f'For example {{"note": "illustration"}} would not match; the answer is:\n{compact}'),
+            ("trailing_commas", pretty.replace("\n  }", ",\n  }").replace("\n]", ",\n]").replace("\n}", ",\n}")),
+            ("python_literals", _python_literals(data)),
+        ):
+            entries.append(Entry(schema, size, variant, "json", text, data))
+        if schema in ("Joke", "People"):
+            xml = _xml("people", {"person": data["people"]}) if schema == "People" else _xml("joke", data)
+            entries.append(Entry(schema, size, "fenced", "xml", f"```xml\n{xml}\n```", data))
+            entries.append(Entry(schema, size, "fenced", "yaml",
+                                 f"```yaml\n{yaml.safe_dump(data, sort_keys=False)}```", data))
+    return entries
+
+
+def load_corpus(path: str) -> List[Entry]:
+    entries = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                d = json.loads(line)
+                entries.append(Entry(d["schema"], d.get("size", "recorded"), d.get("variant", "recorded"),
+                                     d.get("format", "json"), d["text"], d.get("expected")))
+    return entries
+
+
+class Strategy(NamedTuple):
+    name: str
+    formats: Tuple[str, ...]
+    parse: Callable[[str, Type[BaseModel]], Any]
+    clean_only: bool = False
+
+
+def regex_greedy(text, cls):
+    return cls.model_validate(json.loads(re.search(r"\{[\s\S]*\}", text).group(0)))
+
+
+def fence_regex(text, cls):
+    matches = re.findall(r"```json(.*?)```", text, re.DOTALL)
+    return cls.model_validate(json.loads(matches[0].strip()))
+
+
+def cascade(text, cls):
+    return PARSER.parse(text, validate=get_schema(cls).validate_python)
+
+
+def _from_xml(root: Dict[str, Any], cls):
+    """The model from element_value() of the XML rendering: <joke> holds the fields, <people> the <person>s."""
+    if cls is People:
+        items = root.get("person", [])
+        return People(people=items if isinstance(items, list) else [items])
+    return cls.model_validate(root)
+
+
+def _from_langchain_xml(value: Any) -> Any:
+    """XMLOutputParser's {tag: [{child: value}, ...]} nesting, as element_value() returns it."""
+    if not isinstance(value, list):
+        return value
+    merged: Dict[str, Any] = {}
+    for entry in value:
+        for tag, child in entry.items():
+            child = _from_langchain_xml(child)
+            if tag not in merged:
+                merged[tag] = child
+            elif isinstance(merged[tag], list):
+                merged[tag].append(child)
+            else:
+                merged[tag] = [merged[tag], child]
+    return merged
+
+
+def lc_xml(text, cls):
+    from langchain_core.output_parsers import XMLOutputParser
+
+    (root,) = XMLOutputParser().parse(text).values()
+    return _from_xml(_from_langchain_xml(root), cls)
+
+
+def etree(text, cls):
+    start = text.index("<")
+    end = text.rindex(">") + 1
+    return _from_xml(element_value(ET.fromstring(text[start:end])), cls)
+
+
+def stream_xml(text, cls):
+    item = "person" if cls is People else "joke"
+    parser = StreamingXmlParser(item_tags=(item,))
+    events = parser.feed(text) + parser.close()
+    if not events:
+        raise ValueError("no items")
+    if cls is People:
+        return People(people=[event.value for event in events])
+    return cls.model_validate(events[0].value)
+
+
+def safe_load(text, cls):
+    return cls.model_validate(yaml.load(text.split("```yaml\n", 1)[1].rsplit("```", 1)[0],
+                                        Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)))
+
+
+def stream_yaml(text, cls):
+    parser = StreamingYamlParser(model=cls)
+    events = parser.feed(text) + parser.close()
+    return events[-1].value
+
+
+def _langchain() -> List[Strategy]:
+    from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser
+
+    strategies = [
+        Strategy("lc_pydantic", ("json",), lambda text, cls: PydanticOutputParser(pydantic_object=cls).parse(text)),
+        Strategy("lc_json", ("json",), lambda text, cls: cls.model_validate(JsonOutputParser().parse(text))),
+        Strategy("lc_xml", ("xml",), lc_xml),
+    ]
+    try:
+        from langchain.output_parsers import YamlOutputParser
+    except ImportError:
+        return strategies
+    return strategies + [Strategy("lc_yaml", ("yaml",),
+                                  lambda text, cls: YamlOutputParser(pydantic_object=cls).parse(text))]
+
+
+def _llama_index() -> List[Strategy]:
+    from llama_index.core.output_parsers import PydanticOutputParser
+
+    return [Strategy("li_pydantic", ("json",), lambda text, cls: PydanticOutputParser(output_cls=cls).parse(text))]
+
+
+def _openai() -> List[Strategy]:
+    import httpx
+    from openai import OpenAI
+
+    current = {"text": ""}
+
+    def handler(request):
+        return httpx.Response(200, json={
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "bench",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": current["text"]}}],
+        })
+
+    client = OpenAI(api_key="bench", base_url="http://bench.invalid/v1",
+                    http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    messages = [{"role": "user", "content": "extract"}]
+
+    def parse(text, cls):
+        current["text"] = text
+        message = client.beta.chat.completions.parse(model="bench", messages=messages, response_format=cls)
+        return message.choices[0].message.parsed
+
+    return [Strategy("openai_parse", ("json",), parse, clean_only=True)]
+
+
+def strategies() -> Tuple[List[Strategy], Dict[str, str]]:
+    available = [
+        Strategy("regex_greedy", ("json",), regex_greedy),
+        Strategy("fence_regex", ("json",), fence_regex),
+        Strategy("cascade", ("json",), cascade),
+        Strategy("etree", ("xml",), etree),
+        Strategy("stream_xml", ("xml",), stream_xml),
+        Strategy("safe_load", ("yaml",), safe_load),
+        Strategy("stream_yaml", ("yaml",), stream_yaml),
+    ]
+    skipped = {}
+    for label, loader in (("langchain", _langchain), ("llama_index", _llama_index), ("openai", _openai)):
+        try:
+            available.extend(loader())
+        except ImportError as e:
+            skipped[label] = str(e)
+    return available, skipped
+
+
+def _ok(value: Any, expected: Optional[dict]) -> bool:
+    if expected is None:
+        return value is not None
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json")
+    return value == expected
+
+
+def run_one(strategy: Strategy, entry: Entry, min_time: float) -> Tuple[float, bool]:
+    """(seconds per parse, correct); best of three rounds of at least `min_time`."""
+    cls = SCHEMAS[entry.schema]
+
+    def call():
+        try:
+            return strategy.parse(entry.text, cls)
+        except Exception:
+            return None
+
+    ok = _ok(call(), entry.expected)
+    number, best = 1, float("inf")
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 3 or number >= 1 << 16:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(2):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best, ok
+
+
+def peak_bytes(strategy: Strategy, entry: Entry) -> int:
+    cls = SCHEMAS[entry.schema]
+    tracemalloc.start()
+    try:
+        strategy.parse(entry.text, cls)
+    except Exception:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench(entries: List[Entry], selected: List[Strategy], min_time: float) -> Dict[str, dict]:
+    results = {}
+    for strategy in selected:
+        groups: Dict[str, List[Tuple[Entry, float, bool, int]]] = {}
+        for entry in entries:
+            if entry.format not in strategy.formats or (strategy.clean_only and entry.variant != "clean"):
+                continue
+            seconds, ok = run_one(strategy, entry, min_time)
+            groups.setdefault(entry.group, []).append((entry, seconds, ok, peak_bytes(strategy, entry)))
+        for group, rows in groups.items():
+            total_bytes = sum(len(entry.text.encode()) for entry, *_ in rows)
+            total_seconds = sum(seconds for _, seconds, _, _ in rows)
+            results[f"{strategy.name}/{group}"] = {
+                "entries": len(rows),
+                "us_per_parse": statistics.median(seconds for _, seconds, _, _ in rows) * 1e6,
+                "mb_per_s": total_bytes / total_seconds / 1e6 if total_seconds else 0.0,
+                "peak_kib": max(peak for *_, peak in rows) / 1024,
+                "failure_rate": sum(not ok for _, _, ok, _ in rows) / len(rows),
+                "failed": sorted({entry.variant for entry, _, ok, _ in rows if not ok}),
+            }
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if result["us_per_parse"] > before["us_per_parse"] * (1 + tolerance):
+            regressions.append(f"{key}: {before['us_per_parse']:.1f} -> {result['us_per_parse']:.1f} us/parse")
+        if result["failure_rate"] > before["failure_rate"]:
+            regressions.append(f"{key}: failure rate {before['failure_rate']:.0%} -> {result['failure_rate']:.0%}")
+    return regressions
+
+
+def report(results: Dict[str, dict]):
+    print(f"{'strategy/schema/size/format':<42} {'n':>3} {'us/parse':>10} {'MB/s':>8} {'peak KiB':>9} "
+          f"{'fail':>5}  failed variants")
+    for key, r in results.items():
+        print(f"{key:<42} {r['entries']:>3} {r['us_per_parse']:>10.1f} {r['mb_per_s']:>8.1f} {r['peak_kib']:>9.0f} "
+              f"{r['failure_rate']:>5.0%}  {', '.join(r['failed'])}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark every output-parsing strategy on one corpus")
+    arg_parser.add_argument("--corpus", action="append", default=[], help="extra JSONL corpus of recorded outputs")
+    arg_parser.add_argument("--dump-corpus", help="write the synthetic corpus as JSONL and exit")
+    arg_parser.add_argument("--only", help="comma-separated strategy names")
+    arg_parser.add_argument("--quick", action="store_true", help="shorter timing rounds")
+    arg_parser.add_argument("--baseline", default=str(BASELINE))
+    arg_parser.add_argument("--save-baseline", action="store_true")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    args = arg_parser.parse_args()
+
+    corpus = build_corpus()
+    if args.dump_corpus:
+        with open(args.dump_corpus, "w") as f:
+            for entry in corpus:
+                f.write(json.dumps(entry._asdict()) + "\n")
+        sys.exit(0)
+    for path in args.corpus:
+        corpus.extend(load_corpus(path))
+
+    selected, skipped = strategies()
+    if args.only:
+        names = set(args.only.split(","))
+        selected = [s for s in selected if s.name in names]
+    for label, reason in skipped.items():
+        print(f"skipped {label} strategies: {reason}")
+    print(f"{len(corpus)} corpus entries, {sum(len(e.text) for e in corpus) / 1e6:.1f}MB, "
+          f"strategies: {', '.join(s.name for s in selected)}\n")
+
+    results = bench(corpus, selected, min_time=0.02 if args.quick else 0.1)
+    report(results)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=1))
+        print(f"\nbaseline saved to {baseline_path}")
+    elif baseline_path.exists():
+        regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS against {baseline_path} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions against {baseline_path}")
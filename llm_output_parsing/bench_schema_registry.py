@@ -0,0 +1,61 @@
+"""
+Per-request schema + validator overhead for 10k extractions: rebuilding the
+schema in the prompt f-string and a validator per call, vs get_schema().
+
+    python bench_schema_registry.py
+"""
+import json
+import time
+from typing import Dict, List
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from schema_registry import get_schema
+
+N = 10_000
+
+
+class User(BaseModel):
+    """A user profile with contact details."""
+    name: str
+    surname: str
+    age: int
+    email: str
+    phone: str
+    social_accounts: Dict[str, str]
+
+
+class Person(BaseModel):
+    """Information about a person."""
+    name: str = Field(..., description="The name of the person")
+    height_in_meters: float = Field(..., description="The height of the person expressed in meters.")
+
+
+user_statement = "Ram kumar is a software engineer of 26 years old. His email is ram@social.com."
+OUTPUT = json.dumps({"name": "Ram", "surname": "kumar", "age": 26, "email": "ram@social.com",
+                     "phone": "1234567890", "social_accounts": {"bluesky": "ramkumar"}})
+PEOPLE = json.dumps([{"name": "Anna", "height_in_meters": 1.83}] * 3)
+
+
+def per_request():
+    prompt = f"Respond ONLY with valid JSON that matches this schema: {User.model_json_schema()}\nText:\n{user_statement}"
+    user = User.model_validate(json.loads(OUTPUT))
+    people = TypeAdapter(List[Person]).validate_json(PEOPLE)
+    return prompt, user, people
+
+
+def compiled():
+    schema = get_schema(User)
+    prompt = f"Respond ONLY with valid JSON that matches this schema: {schema.schema_text}\nText:\n{user_statement}"
+    user = schema.validate_json(OUTPUT)
+    people = get_schema(Person).list_adapter.validate_json(PEOPLE)
+    return prompt, user, people
+
+
+if __name__ == "__main__":
+    for name, fn in (("per request", per_request), ("schema registry", compiled)):
+        start = time.perf_counter()
+        for _ in range(N):
+            fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16} {elapsed:6.2f}s for {N} extractions, {elapsed / N * 1e6:7.1f} us each")
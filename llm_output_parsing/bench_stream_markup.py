@@ -0,0 +1,115 @@
+"""
+Streaming XML/YAML parsers vs whole-buffer parsing of a long filmography,
+fed as 4-character deltas.
+
+For each format: when the first film is available (chars of output read),
+total parse time, and peak parser memory (tracemalloc, measured in a
+separate run).  The whole-buffer baseline uses LangChain's XMLOutputParser /
+YamlOutputParser when langchain is installed, otherwise the same stdlib /
+PyYAML calls they make.
+
+    python bench_stream_markup.py [films]
+"""
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import yaml
+from pydantic import BaseModel
+
+from stream_markup import StreamingXmlParser, StreamingYamlParser, element_value
+
+DELTA = 4
+
+
+class Film(BaseModel):
+    name: str
+    genre: str
+
+
+def make_xml(films: int) -> str:
+    body = "".join(f"  <film>\n    <name>Film number {i}</name>\n    <genre>Drama</genre>\n  </film>\n"
+                   for i in range(films))
+    return f"Here is the filmography:\n```xml\n<movies>\n  <actor>Tom Hanks</actor>\n{body}</movies>\n```"
+
+
+def make_yaml(films: int) -> str:
+    body = "".join(f"- name: Film number {i}\n  genre: Drama\n" for i in range(films))
+    return f"```yaml\n{body}```"
+
+
+def whole_xml():
+    try:
+        from langchain_core.output_parsers import XMLOutputParser
+    except ImportError:
+        return "ElementTree.fromstring", lambda text: element_value(
+            ET.fromstring(text[text.index("<movies>"):text.index("</movies>") + len("</movies>")]))
+    parser = XMLOutputParser(tags=["movies", "actor", "film", "name", "genre"])
+    return "XMLOutputParser", parser.parse
+
+
+def whole_yaml():
+    try:
+        from langchain.output_parsers import YamlOutputParser
+    except ImportError:
+        return "yaml.safe_load", lambda text: [Film.model_validate(item) for item in
+                                              yaml.safe_load(text.split("```yaml\n", 1)[1].rsplit("```", 1)[0])]
+
+    class Filmography(BaseModel):
+        films: list[Film]
+
+    parser = YamlOutputParser(pydantic_object=Filmography)
+    return "YamlOutputParser", lambda text: parser.parse("```yaml\nfilms:\n" + text.split("```yaml\n", 1)[1])
+
+
+def run_streaming(text: str, make_parser, trace: bool = False) -> tuple:
+    parser = make_parser()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    first_at, items = None, 0
+    for offset in range(0, len(text), DELTA):
+        events = parser.feed(text[offset:offset + DELTA])
+        if events and first_at is None:
+            first_at = offset + DELTA
+        items += len(events)
+    items += len(parser.close())
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    tracemalloc.stop()
+    return first_at, elapsed, peak, items
+
+
+def run_whole(text: str, parse, trace: bool = False) -> tuple:
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    buffer = []
+    for offset in range(0, len(text), DELTA):
+        buffer.append(text[offset:offset + DELTA])
+    parse("".join(buffer))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    tracemalloc.stop()
+    return len(text), elapsed, peak
+
+
+def report(name: str, first_at: int, elapsed: float, peak: int, total: int):
+    print(f"  {name:<24} first film after {first_at:>8} of {total} chars, "
+          f"{elapsed * 1e3:8.1f} ms, peak {peak / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    films = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for label, text, streaming, (baseline, parse) in (
+        ("XML", make_xml(films), lambda: StreamingXmlParser(item_tags=("film",), model=Film), whole_xml()),
+        ("YAML", make_yaml(films), lambda: StreamingYamlParser(model=Film), whole_yaml()),
+    ):
+        print(f"{label}: {films} films, {len(text) / 1000:.0f}KB")
+        # time without tracemalloc, then a second run for the peak memory
+        first_at, elapsed, _, items = run_streaming(text, streaming)
+        assert items == films, items
+        report("streaming", first_at, elapsed, run_streaming(text, streaming, trace=True)[2], len(text))
+        first_at, elapsed, _ = run_whole(text, parse)
+        report(baseline, first_at, elapsed, run_whole(text, parse, trace=True)[2], len(text))
@@ -0,0 +1,507 @@
+"""
+Grammar-constrained decoding of JSON schemas for local generation.
+
+mlx_lm.generate runs with no output constraints, so a structured prompt to a
+local Qwen model can still come back with prose, a <think> block or a missing
+brace, and we are back to retry loops.  This compiles a Pydantic model (User,
+Invoice, ContentCompliance, ...) into a character-level JSON grammar and walks
+it over the tokenizer vocabulary to get, for each decoding state, the set of
+tokens that keep the output a valid prefix of a schema instance.  Masking the
+logits with that set means every local output parses on the first try.
+
+Output is compact JSON (no whitespace) with object properties in schema
+order.  Allowed-token sets are cached per (schema, vocabulary) and per
+grammar state, so after warm-up most steps are a dict lookup.
+
+The grammar enforces types, enums/consts, every property, string
+minLength/maxLength and array minItems/maxItems.  It does not enforce
+`pattern`, `format`, minimum/maximum, exclusiveMinimum/exclusiveMaximum or
+multipleOf: those are only checked when Pydantic validates the finished
+output, so a constrained generation can still fail validation on them
+(e.g. an out-of-range number).
+
+    index = get_index(Invoice, Vocabulary.from_tokenizer(tokenizer))
+    text = generate(model, tokenizer, prompt, logits_processors=[mlx_logits_processor(index)])
+
+For the vLLM server the same schemas go through `response_format`
+(`vllm_response_format(Invoice)`), which vLLM enforces with its own guided
+decoding backend.
+"""
+import json
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+from schema_registry import get_schema
+
+Stack = Tuple[tuple, ...]
+State = FrozenSet[Stack]
+
+_DIGITS = frozenset("0123456789")
+_HEX = frozenset("0123456789abcdefABCDEF")
+_ESCAPES = frozenset('"\\/bfnrt')
+# number phases in which the number may end
+_NUMBER_END = frozenset({"zero", "int", "frac", "exp_digits"})
+
+
+def _bump(count: int, low: int, high: Optional[int]) -> int:
+    """count + 1; without an upper bound only counts up to `low` matter, which keeps the states finite."""
+    return count + 1 if high is not None else min(count + 1, low)
+
+
+class JsonGrammar:
+    """A JSON schema compiled to a table of grammar nodes."""
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        self.nodes: List[tuple] = []
+        self._compiled: Dict[int, int] = {}
+        self._any: Optional[int] = None
+        self.root = self._compile(schema)
+        self.initial: State = frozenset({(("V", self.root),)})
+        self._steps: Dict[Tuple[State, str], State] = {}
+
+    # compilation
+
+    def _resolve(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        while "$ref" in schema:
+            ref = schema["$ref"]
+            if not ref.startswith("#/"):
+                raise ValueError(f"Unsupported $ref {ref!r}")
+            target = self.schema
+            for part in ref[2:].split("/"):
+                target = target[part]
+            schema = target
+        return schema
+
+    def _add(self, node: tuple) -> int:
+        self.nodes.append(node)
+        return len(self.nodes) - 1
+
+    def _compile(self, schema: Dict[str, Any]) -> int:
+        schema = self._resolve(schema)
+        key = id(schema)
+        if key in self._compiled:
+            return self._compiled[key]
+        node_id = self._add(("pending",))
+        self._compiled[key] = node_id
+        self.nodes[node_id] = self._compile_node(schema)
+        return node_id
+
+    def _compile_node(self, schema: Dict[str, Any]) -> tuple:
+        if "const" in schema:
+            return ("literal", (json.dumps(schema["const"], separators=(",", ":")),))
+        if "enum" in schema:
+            return ("literal", tuple(json.dumps(v, separators=(",", ":")) for v in schema["enum"]))
+        for combinator in ("anyOf", "oneOf"):
+            if combinator in schema:
+                return ("union", tuple(self._compile(option) for option in schema[combinator]))
+        if "allOf" in schema and len(schema["allOf"]) == 1:
+            return self.nodes[self._compile(schema["allOf"][0])]
+
+        kind = schema.get("type")
+        if isinstance(kind, list):
+            return ("union", tuple(self._compile({**schema, "type": k}) for k in kind))
+        if kind == "string":
+            return ("string", schema.get("minLength", 0), schema.get("maxLength"))
+        if kind == "integer" or kind == "number":
+            return (kind,)
+        if kind == "boolean":
+            return ("literal", ("true", "false"))
+        if kind == "null":
+            return ("literal", ("null",))
+        if kind == "array":
+            items = schema.get("items", {})
+            return ("array", self._compile(items), schema.get("minItems", 0), schema.get("maxItems"))
+        if kind == "object" or "properties" in schema:
+            properties = schema.get("properties")
+            if properties:
+                return ("object", tuple(
+                    (json.dumps(name) + ":", self._compile(sub)) for name, sub in properties.items()
+                ))
+            extra = schema.get("additionalProperties", True)
+            return ("dict", self._compile(extra if isinstance(extra, dict) else {}))
+        # no constraint: any JSON value
+        return ("union", (self._any_value(),))
+
+    def _any_value(self) -> int:
+        if self._any is None:
+            self._any = self._add(("pending",))
+            self.nodes[self._any] = ("union", (
+                self._add(("string", 0, None)), self._add(("number",)),
+                self._add(("literal", ("true", "false", "null"))),
+                self._add(("dict", self._any)), self._add(("array", self._any, 0, None)),
+            ))
+        return self._any
+
+    # character-level recognition
+
+    def _advance(self, stack: Stack, ch: str, out: List[Stack]):
+        if not stack:
+            return
+        top, rest = stack[-1], stack[:-1]
+        kind = top[0]
+
+        if kind == "V":
+            node = self.nodes[top[1]]
+            node_kind = node[0]
+            if node_kind == "union":
+                for option in node[1]:
+                    self._advance(rest + (("V", option),), ch, out)
+            elif node_kind == "string":
+                if ch == '"':
+                    out.append(rest + (("S", 0, 0, node[1], node[2]),))
+            elif node_kind == "literal":
+                for text in node[1]:
+                    if text[0] == ch:
+                        out.append(rest + ((("L", text, 1),) if len(text) > 1 else ()))
+            elif node_kind == "integer" or node_kind == "number":
+                integer = node_kind == "integer"
+                if ch == "-":
+                    out.append(rest + (("N", integer, "sign"),))
+                elif ch == "0":
+                    out.append(rest + (("N", integer, "zero"),))
+                elif ch in _DIGITS:
+                    out.append(rest + (("N", integer, "int"),))
+            elif node_kind == "object":
+                if ch == "{":
+                    properties = node[1]
+                    if properties:
+                        key, child = properties[0]
+                        out.append(rest + (("O", top[1], 1), ("V", child), ("L", key, 0)))
+                    else:
+                        out.append(rest + (("O", top[1], 0),))
+            elif node_kind == "dict":
+                if ch == "{":
+                    out.append(rest + (("D", node[1], 0),))
+            elif node_kind == "array":
+                if ch == "[":
+                    out.append(rest + (("A", node[1], 0, 0, node[2], node[3]),))
+
+        elif kind == "S":
+            # (S, escape phase, characters so far, minLength, maxLength); an escape counts as one character
+            escape, count, low, high = top[1], top[2], top[3], top[4]
+            if escape == 0:
+                if ch == '"':
+                    if count >= low:
+                        out.append(rest)
+                elif high is not None and count >= high:
+                    pass    # maxLength reached: only the closing quote
+                elif ch == "\\":
+                    out.append(rest + (("S", 1, _bump(count, low, high), low, high),))
+                elif ch >= " ":
+                    out.append(rest + (("S", 0, _bump(count, low, high), low, high),))
+            elif escape == 1:
+                if ch in _ESCAPES:
+                    out.append(rest + (("S", 0, count, low, high),))
+                elif ch == "u":
+                    out.append(rest + (("S", 5, count, low, high),))
+            elif ch in _HEX:
+                # 5..2: hex digits of \\uXXXX still to read
+                out.append(rest + (("S", 0 if escape == 2 else escape - 1, count, low, high),))
+
+        elif kind == "L":
+            text, pos = top[1], top[2]
+            if text[pos] == ch:
+                out.append(rest if pos + 1 == len(text) else rest + (("L", text, pos + 1),))
+
+        elif kind == "N":
+            integer, phase = top[1], top[2]
+            nxt = None
+            if ch in _DIGITS:
+                nxt = {"sign": "zero" if ch == "0" else "int", "int": "int", "dot": "frac", "frac": "frac",
+                       "exp": "exp_digits", "exp_sign": "exp_digits", "exp_digits": "exp_digits"}.get(phase)
+            elif ch == "." and not integer and phase in ("zero", "int"):
+                nxt = "dot"
+            elif ch in "eE" and not integer and phase in ("zero", "int", "frac"):
+                nxt = "exp"
+            elif ch in "+-" and phase == "exp":
+                nxt = "exp_sign"
+            if nxt is not None:
+                out.append(rest + (("N", integer, nxt),))
+            elif phase in _NUMBER_END:
+                self._advance(rest, ch, out)
+
+        elif kind == "O":
+            properties = self.nodes[top[1]][1]
+            done = top[2]
+            if done == len(properties):
+                if ch == "}":
+                    out.append(rest)
+            elif ch == ",":
+                key, child = properties[done]
+                out.append(rest + (("O", top[1], done + 1), ("V", child), ("L", key, 0)))
+
+        elif kind == "D":
+            value, phase = top[1], top[2]
+            if phase in (0, 3) and ch == '"':
+                out.append(rest + (("D", value, 1), ("S", 0, 0, 0, None)))
+            elif phase in (0, 2) and ch == "}":
+                out.append(rest)
+            elif phase == 1 and ch == ":":
+                out.append(rest + (("D", value, 2), ("V", value)))
+            elif phase == 2 and ch == ",":
+                out.append(rest + (("D", value, 3),))
+
+        elif kind == "A":
+            # (A, item node, phase, items so far, minItems, maxItems)
+            item, phase, count, low, high = top[1], top[2], top[3], top[4], top[5]
+            room = high is None or count < high
+            if phase in (0, 1) and ch == "]":
+                if count >= low:
+                    out.append(rest)
+            elif phase == 1 and ch == ",":
+                if room:
+                    out.append(rest + (("A", item, 2, count, low, high),))
+            elif phase in (0, 2) and room:
+                self._advance(rest + (("A", item, 1, _bump(count, low, high), low, high), ("V", item)), ch, out)
+
+    def step(self, state: State, ch: str) -> State:
+        """State after consuming `ch`; an empty state means `ch` is not allowed."""
+        key = (state, ch)
+        result = self._steps.get(key)
+        if result is None:
+            out: List[Stack] = []
+            for stack in state:
+                self._advance(stack, ch, out)
+            result = self._steps[key] = frozenset(out)
+        return result
+
+    def consume(self, state: State, text: str) -> State:
+        for ch in text:
+            state = self.step(state, ch)
+            if not state:
+                break
+        return state
+
+    @staticmethod
+    def _can_finish(stack: Stack) -> bool:
+        while stack:
+            top = stack[-1]
+            if top[0] != "N" or top[2] not in _NUMBER_END:
+                return False
+            stack = stack[:-1]
+        return True
+
+    def is_complete(self, state: State) -> bool:
+        """True when the text so far is a whole schema instance."""
+        return any(self._can_finish(stack) for stack in state)
+
+    def matches(self, text: str) -> bool:
+        return self.is_complete(self.consume(self.initial, text))
+
+
+class _TrieNode:
+    __slots__ = ("children", "token_ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.token_ids: List[int] = []
+
+
+class Vocabulary:
+    """Decoded text of every token id, plus the end-of-sequence ids."""
+
+    def __init__(self, tokens: Sequence[Optional[str]], eos_ids: Sequence[int]):
+        self.tokens = list(tokens)
+        self.eos_ids = list(eos_ids)
+        self._indexes: Dict[type, "GrammarIndex"] = {}    # get_index(), per schema model
+        self.trie = _TrieNode()
+        for token_id, text in enumerate(self.tokens):
+            if not text or token_id in self.eos_ids:
+                continue
+            node = self.trie
+            for ch in text:
+                node = node.children.setdefault(ch, _TrieNode())
+            node.token_ids.append(token_id)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer) -> "Vocabulary":
+        """From a HF / mlx_lm tokenizer; special tokens and partial UTF-8 pieces are never allowed."""
+        special = set(getattr(tokenizer, "all_special_ids", []) or [])
+        eos = tokenizer.eos_token_id
+        eos_ids = list(eos) if isinstance(eos, (list, tuple, set)) else [eos]
+        tokens = []
+        for token_id in range(len(tokenizer)):
+            if token_id in special:
+                tokens.append(None)
+                continue
+            text = tokenizer.decode([token_id])
+            tokens.append(None if "�" in text else text)
+        return cls(tokens, eos_ids)
+
+
+class GrammarIndex:
+    """Allowed-token sets of one grammar over one vocabulary, cached per grammar state."""
+
+    def __init__(self, grammar: JsonGrammar, vocab: Vocabulary):
+        self.grammar = grammar
+        self.vocab = vocab
+        self._allowed: Dict[State, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, state: State) -> List[int]:
+        allowed = self._allowed.get(state)
+        if allowed is None:
+            allowed = self._walk(state)
+            with self._lock:
+                self._allowed[state] = allowed
+        return allowed
+
+    def _walk(self, state: State) -> List[int]:
+        allowed = list(self.vocab.eos_ids) if self.grammar.is_complete(state) else []
+        pending = [(self.vocab.trie, state)]
+        step = self.grammar.step
+        while pending:
+            node, node_state = pending.pop()
+            for ch, child in node.children.items():
+                child_state = step(node_state, ch)
+                if child_state:
+                    allowed.extend(child.token_ids)
+                    if child.children:
+                        pending.append((child, child_state))
+        return allowed
+
+    @property
+    def cached_states(self) -> int:
+        return len(self._allowed)
+
+
+class TokenConstraint:
+    """Decoding state of one generation: which tokens may come next."""
+
+    def __init__(self, index: GrammarIndex):
+        self.index = index
+        self.state = index.grammar.initial
+        self.finished = False
+        self.text = []
+
+    def allowed_token_ids(self) -> List[int]:
+        if self.finished:
+            return list(self.index.vocab.eos_ids)
+        return self.index.allowed(self.state)
+
+    def advance(self, token_id: int):
+        if token_id in self.index.vocab.eos_ids:
+            if not self.index.grammar.is_complete(self.state):
+                raise ValueError("End of sequence before the JSON value was complete")
+            self.finished = True
+            return
+        text = self.index.vocab.tokens[token_id]
+        state = self.index.grammar.consume(self.state, text or "")
+        if not state or not text:
+            raise ValueError(f"Token {token_id} ({text!r}) is not allowed here")
+        self.state = state
+        self.text.append(text)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.index.grammar.is_complete(self.state)
+
+
+_GRAMMARS: Dict[type, JsonGrammar] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_grammar(schema_model: Type[BaseModel]) -> JsonGrammar:
+    grammar = _GRAMMARS.get(schema_model)
+    if grammar is None:
+        with _REGISTRY_LOCK:
+            grammar = _GRAMMARS.get(schema_model)
+            if grammar is None:
+                grammar = _GRAMMARS[schema_model] = JsonGrammar(get_schema(schema_model).json_schema)
+    return grammar
+
+
+def get_index(schema_model: Type[BaseModel], vocab: Vocabulary) -> GrammarIndex:
+    """Cached GrammarIndex per (model, vocabulary), kept on the vocabulary so it goes away with it."""
+    index = vocab._indexes.get(schema_model)
+    if index is None:
+        grammar = get_grammar(schema_model)
+        with _REGISTRY_LOCK:
+            index = vocab._indexes.get(schema_model)
+            if index is None:
+                index = vocab._indexes[schema_model] = GrammarIndex(grammar, vocab)
+    return index
+
+
+def mlx_logits_processor(index: GrammarIndex):
+    """
+    mlx_lm `logits_processors` entry enforcing the grammar.  mlx_lm passes the
+    prompt plus every generated token; the first call fixes the prompt length.
+    Use a fresh processor per generate() call.
+    """
+    import mlx.core as mx
+    import numpy as np
+
+    constraint = TokenConstraint(index)
+    seen = None
+    masks = {}
+
+    def processor(tokens, logits):
+        nonlocal seen
+        count = tokens.size
+        if seen is None:
+            seen = count
+        for token in tokens[seen:count].tolist():
+            constraint.advance(token)
+        seen = count
+        key = None if constraint.finished else constraint.state
+        mask = masks.get(key)
+        if mask is None:
+            allowed = np.zeros(logits.shape[-1], dtype=bool)
+            allowed[constraint.allowed_token_ids()] = True
+            mask = masks[key] = mx.array(allowed)
+        return mx.where(mask, logits, -float("inf"))
+
+    return processor
+
+
+def vllm_response_format(schema_model: Type[BaseModel]) -> Dict[str, Any]:
+    """`response_format` for a vLLM server; vLLM applies its guided decoding backend to it."""
+    return get_schema(schema_model).response_format
+
+
+if __name__ == "__main__":
+    # CPU-only check with a toy vocabulary: a "model" sampling uniformly from the
+    # allowed tokens still only produces valid ContentCompliance JSON
+    import random
+    from enum import Enum
+
+    class Category(str, Enum):
+        violence = "violence"
+        sexual = "sexual"
+        self_harm = "self_harm"
+
+    class ContentCompliance(BaseModel):
+        is_violating: bool
+        category: Optional[Category]
+        explanation_if_violating: Optional[str]
+
+    # like a real BPE vocabulary: every printable character plus some merged pieces
+    toy_tokens = [chr(c) for c in range(32, 127)] + [
+        'true', 'false', 'null', 'is', '_viol', 'ating', 'category', 'violence', 'sex', 'ual', 'self', '_harm',
+        'explanation', '_if', 'fight', 'ing', '"is_violating":', '":"', '","', 'Hello', '<think>', '\n']
+    vocab = Vocabulary(toy_tokens + ["</s>"], eos_ids=[len(toy_tokens)])
+    index = get_index(ContentCompliance, vocab)
+    rng = random.Random(0)
+    for trial in range(5):
+        constraint = TokenConstraint(index)
+        for _ in range(200):
+            allowed = constraint.allowed_token_ids()
+            # random sampling, with a taste for closing strings so the demo ends
+            closing = [t for t in allowed if vocab.tokens[t] == '"']
+            token = closing[0] if closing and rng.random() < 0.2 else rng.choice(allowed)
+            constraint.advance(token)
+            if constraint.finished:
+                break
+        text = "".join(constraint.text)
+        if constraint.finished:
+            print(ContentCompliance.model_validate_json(text))
+        else:
+            print(f"(stopped after 200 tokens) {text[:60]}...")
+    print(f"{index.cached_states} cached grammar states")
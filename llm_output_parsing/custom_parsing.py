@@ -17,34 +17,30 @@ client = Groq(
 from pydantic import BaseModel, Field
 from typing import Dict
 import json
-import re
 
+from parser_cascade import PARSER, ParseError
+from schema_registry import get_schema
 
-def extract_and_validate_json(completion, schema_model: BaseModel):
+
+def extract_and_validate_json(completion, schema_model: BaseModel, repairer=None):
     """
     Extracts JSON from an LLM response, cleans it, and validates against a Pydantic schema.
+    Parsing goes cheapest-first (plain json.loads, ```json fence, balanced-bracket scan,
+    tolerant repair), so <think> preambles, fences, extra brace blocks and trailing commas
+    do not matter; PARSER.stats shows which tier each model needed.
+    With a repair.Repairer, a candidate that fails validation gets only its failing
+    fields re-asked instead of a full re-extraction.
     """
     raw_output = completion.choices[0].message.content
 
-    # Step 1: Extract JSON block from the response
-    json_match = re.search(r"\{[\s\S]*\}", raw_output)
-    if not json_match:
-        raise ValueError("No JSON object found in the LLM output.")
-    json_str = json_match.group(0)
-
-    # Step 2: Parse JSON string into dict
+    # Step 1 + 2 + 3: decode candidates cheapest tier first, first one that fits the schema wins
     try:
-        parsed_data = json.loads(json_str)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Error decoding JSON: {e}\nRaw output was:\n{json_str}")
-
-    # Step 3: Validate using Pydantic
-    try:
-        validated_obj = schema_model.model_validate(parsed_data)
-    except Exception as e:
-        raise ValueError(f"Validation error: {e}\nParsed data was:\n{parsed_data}")
-
-    return validated_obj
+        return PARSER.parse(raw_output, validate=get_schema(schema_model).validate_python,
+                            model=getattr(completion, "model", None) or "unknown")
+    except ParseError as error:
+        if repairer is not None and isinstance(error.value, dict):
+            return repairer.validate(error.value)
+        raise
 
 class User(BaseModel):
     """A user profile with contact details."""
@@ -67,7 +63,7 @@ completion = client.chat.completions.create(
         {
             "role": "user",
             # "content": f"please extract from the following text the contact details of the user using below schema\n\n##schema {User.model_json_schema()}```text\n" + user_statement + "\n```",
-            "content": f"Extract the contact details from the text. Respond ONLY with valid JSON that matches this schema: {User.model_json_schema()}\nText:\n{user_statement}"
+            "content": f"Extract the contact details from the text. Respond ONLY with valid JSON that matches this schema: {get_schema(User).schema_text}\nText:\n{user_statement}"
 
         }
     ],
@@ -82,6 +78,12 @@ completion = client.chat.completions.create(
 print(completion.choices[0].message.content)
 # Example usage:
 validated_user = extract_and_validate_json(completion, User)
+# # fix only the invalid fields with a small follow-up call
+# from batch_extraction import openai_complete
+# from repair import Repairer
+# repairer = Repairer(openai_complete(client, "qwen/qwen3-32b", reasoning_effort="none"), User)
+# validated_user = extract_and_validate_json(completion, User, repairer=repairer)
+# print(repairer.stats)
 print(validated_user.model_dump_json(indent=2))
 
 # ```json
@@ -114,3 +116,28 @@ print(validated_user.model_dump_json(indent=2))
 
 
 
+
+
+## streaming: validate fields while tokens are still arriving
+# from partial_json import iter_stream_events
+
+# stream = client.chat.completions.create(
+#     model ="qwen/qwen3-32b",
+#     messages=[
+#         {
+#             "role": "user",
+#             "content": f"Extract the contact details from the text. Respond ONLY with valid JSON that matches this schema: {User.model_json_schema()}\nText:\n{user_statement}"
+#         }
+#     ],
+#     temperature=0.6,
+#     top_p=0.95,
+#     stream=True,
+#     reasoning_effort="none",
+# )
+# for event in iter_stream_events(stream, User):
+#     print(event)
+
+# ModelEvent(field='name', index=None, value='Ram')
+# ModelEvent(field='surname', index=None, value='kumar')
+# ModelEvent(field='age', index=None, value=26)
+# ...
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+
+
+class LineItem(BaseModel):
+    """A line item in an invoice."""
+
+    Description: str = Field(description="The description of this item")
+    price: float = Field(description="Total amount payable with IGST for this item")
+
+
+class Invoice(BaseModel):
+    """A representation of information from an invoice."""
+
+    invoice_id: str = Field(description="A unique identifier for this invoice, majorly the invoice number")
+    date: str = Field(description="The date this invoice was created")
+    line_items: list[LineItem] = Field(description="A list of all the items in this invoice")
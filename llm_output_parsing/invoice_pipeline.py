@@ -0,0 +1,371 @@
+"""
+Chunked, parallel invoice ingestion.
+
+llmind_parser_1.py reads uber_reciept.pdf with PDFReader, keeps only
+`documents[0].text` and sends it whole to `as_structured_llm(Invoice)`: later
+pages of a multi-page invoice are dropped and a large PDF blocks the caller
+while it parses.  InvoicePipeline instead
+
+  1. counts and reads pages in a process pool (a bounded window of pages in
+     flight),
+  2. splits each document into token-bounded chunks on line boundaries,
+  3. extracts the invoice header and LineItems of every chunk concurrently,
+  4. merges the chunks of a document into one Invoice, dropping items a chunk
+     repeats from the end of the previous one (a line cut by the chunk
+     boundary is read by both),
+
+and records busy time and throughput per stage in `stats`.  A document that
+cannot be read is left out of the result and its error kept in `errors`; one
+without pages gets an empty Invoice.
+
+    pipeline = InvoicePipeline(openai_complete(client, "moonshotai/kimi-k2-instruct"))
+    invoices = pipeline.run(["uber_reciept.pdf"])
+    print(pipeline.stats)
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from batch_extraction import response_text
+from invoice_models import Invoice, LineItem
+from json_extractor import extract_json
+from schema_registry import get_schema
+
+_PROMPT = """Extract invoice data from this part ({part} of {parts}) of a document.
+Return ONLY a JSON object that matches this JSON schema: {schema}
+Use null for the invoice id or date if they do not appear in this part.
+
+{text}"""
+
+
+class InvoiceChunk(BaseModel):
+    """The invoice fields found in one chunk of a document."""
+
+    invoice_id: Optional[str] = Field(None, description="A unique identifier for this invoice, majorly the invoice number")
+    date: Optional[str] = Field(None, description="The date this invoice was created")
+    line_items: List[LineItem] = Field(default_factory=list, description="The items of the invoice in this part")
+
+
+def page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+_readers: Dict[str, Any] = {}
+
+
+def read_page(path: str, page_number: int) -> Tuple[str, float]:
+    """(text, seconds) of one page; runs in a worker process, which keeps its open readers."""
+    from pypdf import PdfReader
+    start = time.perf_counter()
+    reader = _readers.get(path)
+    if reader is None:
+        if len(_readers) >= 8:
+            _readers.pop(next(iter(_readers)))
+        reader = _readers[path] = PdfReader(path)
+    text = reader.pages[page_number].extract_text() or ""
+    return text, time.perf_counter() - start
+
+
+def chunk_text(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Pack whole lines into chunks of at most `max_tokens`; an overlong line is split by characters."""
+    chunks, current, used = [], [], 0
+    for line in text.splitlines():
+        cost = count_tokens(line) + 1
+        if cost > max_tokens:
+            step = max(1, len(line) * max_tokens // cost)
+            pieces = [line[i:i + step] for i in range(0, len(line), step)]
+        else:
+            pieces = [line]
+        for piece in pieces:
+            cost = count_tokens(piece) + 1
+            if current and used + cost > max_tokens:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _item_key(item: LineItem) -> Tuple[str, float]:
+    return " ".join(item.Description.casefold().split()), round(item.price, 2)
+
+
+def _overlap(previous: Sequence[tuple], current: Sequence[tuple]) -> int:
+    """Length of the longest run of items at the end of `previous` that `current` starts with."""
+    for n in range(min(len(previous), len(current)), 0, -1):
+        if previous[-n:] == current[:n]:
+            return n
+    return 0
+
+
+def merge_chunks(chunks: Sequence[InvoiceChunk]) -> Invoice:
+    """
+    First non-empty invoice id and date, line items in document order.  Only
+    the items a chunk repeats from the end of the previous chunk are dropped:
+    the same item twice elsewhere (two identical rides) is two line items.
+    """
+    invoice_id = next((c.invoice_id for c in chunks if c.invoice_id), "")
+    date = next((c.date for c in chunks if c.date), "")
+    items, previous = [], []
+    for chunk in chunks:
+        keys = [_item_key(item) for item in chunk.line_items]
+        items.extend(chunk.line_items[_overlap(previous, keys):])
+        previous = keys
+    return Invoice(invoice_id=invoice_id, date=date, line_items=items)
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_s: float = 0.0     # summed over workers
+
+    @property
+    def per_s(self) -> float:
+        return self.items / self.busy_s if self.busy_s else 0.0
+
+
+@dataclass
+class PipelineStats:
+    read: StageStats = field(default_factory=lambda: StageStats("read pages"))
+    chunk: StageStats = field(default_factory=lambda: StageStats("chunk"))
+    extract: StageStats = field(default_factory=lambda: StageStats("extract chunks"))
+    merge: StageStats = field(default_factory=lambda: StageStats("merge"))
+    documents: int = 0
+    cached_documents: int = 0
+    failed_documents: int = 0
+    failed_chunks: int = 0
+    wall_s: float = 0.0
+
+    @property
+    def stages(self) -> List[StageStats]:
+        return [self.read, self.chunk, self.extract, self.merge]
+
+    def __str__(self):
+        busy = sum(stage.busy_s for stage in self.stages) or 1.0
+        lines = [f"{self.documents} documents ({self.cached_documents} from cache), {self.read.items} pages read "
+                 f"in {self.wall_s:.2f}s ({self.read.items / self.wall_s if self.wall_s else 0:.1f} pages/s end to end)"]
+        for stage in self.stages:
+            lines.append(f"  {stage.name:<15} {stage.items:>6} items {stage.busy_s:8.3f}s busy "
+                         f"{stage.per_s:10.1f}/s  {stage.busy_s / busy:6.1%} of busy time")
+        if self.failed_documents:
+            lines.append(f"  {self.failed_documents} documents could not be read")
+        if self.failed_chunks:
+            lines.append(f"  {self.failed_chunks} chunks failed extraction")
+        return "\n".join(lines)
+
+
+class InvoicePipeline:
+
+    def __init__(self, complete: Callable[[List[dict]], Any], max_chunk_tokens: int = 1500,
+                 count_tokens: Optional[Callable[[str], int]] = None, read_workers: Optional[int] = None,
+                 extract_workers: int = 8, cache=None, model: str = ""):
+        """`cache` is an optional pdf_cache.PdfCache; `model` names the LLM behind `complete` in its keys."""
+        self.complete = complete
+        self.cache = cache
+        self.model = model
+        self.invoice_schema = get_schema(Invoice)
+        self.max_chunk_tokens = max_chunk_tokens
+        self.count_tokens = count_tokens or (lambda text: (len(text) + 3) // 4)
+        self.read_workers = read_workers or os.cpu_count() or 2
+        self.extract_workers = extract_workers
+        self.schema = get_schema(InvoiceChunk)
+        self.stats = PipelineStats()
+        self.errors: Dict[str, str] = {}     # path -> why it could not be read
+
+    def _fail(self, path: str, error: BaseException):
+        if path not in self.errors:
+            self.errors[path] = f"{type(error).__name__}: {error}"
+            self.stats.failed_documents += 1
+
+    def iter_documents(self, paths: Sequence[str], pool: ProcessPoolExecutor) -> Iterator[Tuple[str, List[str]]]:
+        """
+        (path, page texts) per document, as soon as its pages are read; at most
+        2x workers pages in flight.  A document that fails to open or to read
+        is recorded in `errors` and skipped.
+        """
+        counts = deque((path, pool.submit(page_count, path)) for path in paths)
+        in_flight: deque = deque()
+        texts: Dict[str, List[Optional[str]]] = {}
+        ready: deque = deque()          # documents with every page back
+        window = self.read_workers * 2
+        current: List[Tuple[str, Iterator[int]]] = []
+
+        def next_page() -> Optional[Tuple[str, int]]:
+            while True:
+                if current:
+                    path, numbers = current[0]
+                    number = next(numbers, None)
+                    if number is not None:
+                        return path, number
+                    current.clear()
+                if not counts:
+                    return None
+                path, future = counts.popleft()
+                try:
+                    count = future.result()
+                except Exception as e:
+                    self._fail(path, e)
+                    continue
+                texts[path] = [None] * count
+                if count == 0:
+                    ready.append(path)
+                current.append((path, iter(range(count))))
+
+        def submit_next() -> bool:
+            page = next_page()
+            if page is None:
+                return False
+            path, number = page
+            in_flight.append((path, number, pool.submit(read_page, path, number)))
+            return True
+
+        while len(in_flight) < window and submit_next():
+            pass
+        while ready or in_flight:
+            while ready:
+                path = ready.popleft()
+                yield path, texts.pop(path)
+            if not in_flight:
+                break
+            path, number, future = in_flight.popleft()
+            try:
+                text, seconds = future.result()
+            except Exception as e:
+                # the rest of its pages are dropped as they come back
+                self._fail(path, e)
+                texts.pop(path, None)
+            else:
+                self.stats.read.items += 1
+                self.stats.read.busy_s += seconds
+                if path in texts:
+                    texts[path][number] = text
+                    if None not in texts[path]:
+                        ready.append(path)
+            submit_next()
+
+    def _extract(self, text: str, part: int, parts: int) -> Tuple[Optional[InvoiceChunk], float]:
+        start = time.perf_counter()
+        prompt = _PROMPT.format(part=part, parts=parts, schema=self.schema.schema_text, text=text)
+        try:
+            chunk = self.schema.validate_python(extract_json(response_text(self.complete(
+                [{"role": "user", "content": prompt}]))))
+        except Exception:
+            # a bad answer or a failed request: the chunk counts as failed and the invoice is not cached
+            chunk = None
+        return chunk, time.perf_counter() - start
+
+    def run(self, paths: Sequence[str]) -> Dict[str, Invoice]:
+        start = time.perf_counter()
+        invoices: Dict[str, Invoice] = {}
+        digests: Dict[str, str] = {}
+        cached_pages: Dict[str, List[str]] = {}
+        to_read = []
+        for path in paths:
+            if self.cache is not None:
+                try:
+                    digest = digests[path] = self.cache.file_hash(path)
+                except OSError as e:
+                    self._fail(path, e)
+                    continue
+                text = self.cache.get_invoice(digest, self.invoice_schema.version, self.model)
+                if text is not None:
+                    invoices[path] = self.invoice_schema.validate_json(text)
+                    self.stats.cached_documents += 1
+                    continue
+                pages = self.cache.get_pages(digest)
+                if pages is not None:
+                    cached_pages[path] = pages
+                    continue
+            to_read.append(path)
+
+        pending: Dict[str, List[Future]] = {}
+        failed: Dict[str, int] = {}
+        with ProcessPoolExecutor(self.read_workers) as readers, ThreadPoolExecutor(self.extract_workers) as extractors:
+            for path, pages in chain(cached_pages.items(), self.iter_documents(to_read, readers)):
+                if self.cache is not None and path not in cached_pages:
+                    self.cache.put_pages(digests[path], pages)
+                chunk_start = time.perf_counter()
+                chunks = chunk_text("\n".join(pages), self.max_chunk_tokens, self.count_tokens)
+                self.stats.chunk.items += len(chunks)
+                self.stats.chunk.busy_s += time.perf_counter() - chunk_start
+                pending[path] = [extractors.submit(self._extract, chunk, i + 1, len(chunks))
+                                 for i, chunk in enumerate(chunks)]
+
+            for path, futures in pending.items():
+                extracted = []
+                for future in futures:
+                    chunk, seconds = future.result()
+                    self.stats.extract.items += 1
+                    self.stats.extract.busy_s += seconds
+                    if chunk is None:
+                        self.stats.failed_chunks += 1
+                        failed[path] = failed.get(path, 0) + 1
+                    else:
+                        extracted.append(chunk)
+                merge_start = time.perf_counter()
+                invoices[path] = merge_chunks(extracted)
+                self.stats.merge.items += 1
+                self.stats.merge.busy_s += time.perf_counter() - merge_start
+                # an invoice missing chunks is not cached, so the next run retries it
+                if self.cache is not None and path not in failed:
+                    self.cache.put_invoice(digests[path], self.invoice_schema.version, self.model,
+                                           invoices[path].model_dump_json())
+        self.stats.documents += len(invoices)
+        self.stats.wall_s += time.perf_counter() - start
+        return invoices
+
+
+if __name__ == "__main__":
+    # offline run on the bundled receipt with a stub "LLM" that reads the fields with regexes;
+    # with --cache, run it twice to see the second pass served from the content-hash cache
+    import argparse
+    import json
+    import re
+
+    def stub_complete(messages):
+        text = messages[0]["content"].split("\n\n", 2)[-1]
+        time.sleep(0.05)
+        number = re.search(r"Invoice number:\s*\n?(\w+)", text)
+        date = re.search(r"Invoice date:\s*\n?([\w ]+\d{4})", text)
+        fare = re.search(r"Total amount payable\s*\n?₹\s*\n?([\d.,]+)", text)
+        items = [{"Description": "Transportation service fare", "price": float(fare.group(1).replace(",", ""))}] \
+            if fare else []
+        return json.dumps({"invoice_id": number and number.group(1), "date": date and date.group(1).strip(),
+                           "line_items": items})
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=["uber_reciept.pdf"], help="PDF files or directories")
+    parser.add_argument("--cache", help="pdf_cache SQLite file")
+    args = parser.parse_args()
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".pdf")))
+        else:
+            paths.append(path)
+
+    cache = None
+    if args.cache:
+        from pdf_cache import PdfCache
+        cache = PdfCache(args.cache)
+    for run in range(2 if cache else 1):
+        pipeline = InvoicePipeline(stub_complete, max_chunk_tokens=400, cache=cache, model="stub")
+        invoices = pipeline.run(paths)
+        if run == 0:
+            for path, invoice in list(invoices.items())[:5]:
+                print(path, invoice.model_dump_json())
+            for path, error in pipeline.errors.items():
+                print(path, error)
+        print(pipeline.stats)
+    if cache:
+        print(cache.stats)
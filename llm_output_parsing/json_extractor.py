@@ -0,0 +1,159 @@
+"""
+Single-pass extraction of JSON objects/arrays from free-form LLM output.
+
+Reasoning models wrap the JSON we want in <think> blocks, ```json fences and
+trailing chatter, and often emit more than one brace block.  A greedy
+`re.search(r"\\{[\\s\\S]*\\}")` grabs everything from the first "{" to the last
+"}", which is the wrong span as soon as there are two blocks.
+
+JsonExtractor walks the text once, tracking bracket depth and string/escape
+state, and yields every balanced object or array that decodes as JSON.  It can
+be fed a whole completion or streamed deltas.
+"""
+import json
+import re
+from typing import Any, Iterator, List
+
+# Outside a candidate we only care about where the next one (or a think block) starts.
+_START = re.compile(r"[{\[]|<think>")
+# Inside a candidate, everything except brackets and quotes is skipped in C.
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+# Inside a string only the closing quote and escapes matter.
+_STRING = re.compile(r'["\\]')
+
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JsonExtractor:
+    """
+    Incremental balanced-bracket scanner.
+
+    `feed(chunk)` returns the JSON values completed by that chunk; `values`
+    keeps everything found so far.  Text before a candidate is dropped as soon
+    as it has been scanned, so memory is bounded by the largest candidate.
+    Call `close()` at the end of the input: a bracket opened in prose and never
+    closed ("use a list [ like this") holds every later block inside its
+    candidate, and close() rescans from just after it.
+    """
+
+    def __init__(self, skip_think: bool = True):
+        self.skip_think = skip_think
+        self.values: List[Any] = []
+        self._buf = ""
+        self._pos = 0          # next index of _buf to scan
+        self._start = -1       # index of the opening bracket of the current candidate
+        self._stack: List[str] = []
+        self._in_string = False
+        self._in_think = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        self._buf += chunk
+        found = []
+        buf = self._buf
+        pos = self._pos
+        n = len(buf)
+
+        while pos < n:
+            if self._in_think:
+                end = buf.find(_THINK_CLOSE, pos)
+                if end < 0:
+                    # keep a tail in case "</think>" is split across chunks
+                    pos = max(pos, n - len(_THINK_CLOSE) + 1)
+                    break
+                self._in_think = False
+                pos = end + len(_THINK_CLOSE)
+
+            elif not self._stack:
+                m = _START.search(buf, pos)
+                if m is None:
+                    # keep a tail in case "<think>" is split across chunks
+                    pos = max(pos, n - len(_THINK_OPEN) + 1) if self.skip_think else n
+                    break
+                if m.group() == _THINK_OPEN:
+                    pos = m.end()
+                    self._in_think = self.skip_think
+                    continue
+                self._start = m.start()
+                self._stack.append(_CLOSERS[m.group()])
+                pos = m.end()
+
+            elif self._in_string:
+                m = _STRING.search(buf, pos)
+                if m is None:
+                    pos = n
+                    break
+                if m.group() == "\\":
+                    if m.end() >= n:
+                        # escaped character has not arrived yet
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                else:
+                    self._in_string = False
+                    pos = m.end()
+
+            else:
+                m = _STRUCTURE.search(buf, pos)
+                if m is None:
+                    pos = n
+                    break
+                ch = m.group()
+                pos = m.end()
+                if ch == '"':
+                    self._in_string = True
+                elif ch in _CLOSERS:
+                    self._stack.append(_CLOSERS[ch])
+                elif ch != self._stack.pop():
+                    # mismatched bracket: this was not JSON, rescan just after its start
+                    pos = self._start + 1
+                    self._reset_candidate()
+                elif not self._stack:
+                    try:
+                        value = json.loads(buf[self._start:pos])
+                    except ValueError:
+                        pass
+                    else:
+                        found.append(value)
+                    self._reset_candidate()
+
+        if self._stack:
+            # drop scanned prose before the open candidate
+            keep = self._start
+            self._start = 0
+        else:
+            keep = pos
+        self._buf = buf[keep:]
+        self._pos = pos - keep
+        self.values.extend(found)
+        return found
+
+    def close(self) -> List[Any]:
+        """Values found by rescanning past brackets that were still open at the end of the input."""
+        found = []
+        while self._stack:
+            # feed() trimmed the buffer to start at the open bracket
+            self._pos = self._start + 1
+            self._reset_candidate()
+            found.extend(self.feed(""))
+        return found
+
+    def _reset_candidate(self):
+        self._stack.clear()
+        self._in_string = False
+        self._start = -1
+
+
+def iter_json(text: str, skip_think: bool = True) -> Iterator[Any]:
+    """Yield every JSON object/array found in `text`, in order of appearance."""
+    extractor = JsonExtractor(skip_think=skip_think)
+    yield from extractor.feed(text)
+    yield from extractor.close()
+
+
+def extract_json(text: str, skip_think: bool = True) -> Any:
+    """Return the first JSON object/array in `text`."""
+    for value in iter_json(text, skip_think=skip_think):
+        return value
+    raise ValueError("No JSON object found in the LLM output.")
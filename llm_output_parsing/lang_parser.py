@@ -1,8 +1,9 @@
 from langchain_groq import ChatGroq
-from langchain_core.callbacks import StdOutCallbackHandler
-from langchain.globals import set_debug, set_verbose
-set_debug(True)
-set_verbose(True)
+import pathlib
+import sys
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "prompt_engineering"))
+from instrumentation import langchain_handler
+# set_debug(True)/set_verbose(True) printed every payload; each call is now one record in instrumentation.RECORDER
 import json
 with open("keys.json") as f:
     api_key = json.load(f)
@@ -13,7 +14,8 @@ groq_key_2 =api_key["grok_api_key_2"]
 groq_key_3 =api_key["grok_api_key_3"]
 llm = ChatGroq(model="qwen/qwen3-32b",
                api_key= groq_key_1,  
-               reasoning_effort = "none"
+               reasoning_effort = "none",
+               callbacks=[langchain_handler(provider="groq")],
                )
 
 
@@ -1,9 +1,10 @@
 # used this link https://python.langchain.com/docs/how_to/structured_output/ 
 from langchain_groq import ChatGroq
-from langchain_core.callbacks import StdOutCallbackHandler
-from langchain.globals import set_debug, set_verbose
-set_debug(True)
-set_verbose(True)
+import pathlib
+import sys
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "prompt_engineering"))
+from instrumentation import langchain_handler
+# set_debug(True)/set_verbose(True) printed every payload; each call is now one record in instrumentation.RECORDER
 import json
 with open("keys.json") as f:
     api_key = json.load(f)
@@ -17,6 +18,7 @@ llm = ChatGroq(
                 model="deepseek-r1-distill-llama-70b",
                api_key= groq_key_1,  
             #    reasoning_effort = "none"
+               callbacks=[langchain_handler(provider="groq")],
                )
 
 
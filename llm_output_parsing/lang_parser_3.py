@@ -1,10 +1,11 @@
 #using xml https://python.langchain.com/docs/how_to/output_parser_xml/
 #using yaml https://python.langchain.com/docs/how_to/output_parser_yaml/
 from langchain_groq import ChatGroq
-from langchain_core.callbacks import StdOutCallbackHandler
-from langchain.globals import set_debug, set_verbose
-set_debug(True)
-set_verbose(True)
+import pathlib
+import sys
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "prompt_engineering"))
+from instrumentation import langchain_handler
+# set_debug(True)/set_verbose(True) printed every payload; each call is now one record in instrumentation.RECORDER
 import json
 with open("keys.json") as f:
     api_key = json.load(f)
@@ -17,7 +18,8 @@ llm = ChatGroq(
                 model="qwen/qwen3-32b",
                 # model="deepseek-r1-distill-llama-70b",
                api_key= groq_key_1,  
-               reasoning_effort = "none"
+               reasoning_effort = "none",
+               callbacks=[langchain_handler(provider="groq")],
                )
 
 from langchain_core.output_parsers import XMLOutputParser
@@ -119,3 +121,12 @@ chain = prompt | llm | parser
 print(chain.invoke({"query": joke_query}))
 
 # setup='Why did the scarecrow win an award?' punchline='Because he was outstanding in his field!'
+
+## streaming: get each film / YAML key as soon as it is complete (see stream_markup.py)
+# from stream_markup import StreamingXmlParser
+# xml_parser = StreamingXmlParser(item_tags=("actor", "film"))
+# for chunk in (prompt | llm).stream({"query": actor_query}):
+#     for event in xml_parser.feed(chunk.content):
+#         print(event)
+# MarkupEvent(tag='actor', index=0, value='Tom Hanks')
+# MarkupEvent(tag='film', index=0, value={'name': 'Forrest Gump', 'genre': 'Drama'})
@@ -1,8 +1,9 @@
 from langchain_google_genai import GoogleGenerativeAI
-from langchain_core.callbacks import StdOutCallbackHandler
-from langchain.globals import set_debug, set_verbose
-set_debug(True)
-set_verbose(True)
+import pathlib
+import sys
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "prompt_engineering"))
+from instrumentation import langchain_handler
+# set_debug(True)/set_verbose(True) printed every payload; each call is now one record in instrumentation.RECORDER
 import json 
 
 with open("keys.json") as f:
@@ -14,7 +15,8 @@ gemini_key_2 =api_key["google_api_key_2"]
 gemini_key_3 =api_key["google_api_key_3"]
 
 
-llm = GoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=gemini_key_1)
+llm = GoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=gemini_key_1,
+                         callbacks=[langchain_handler(provider="google")])
 # print(
 #     llm.invoke(
 #         "What are some of the pros and cons of Python as a programming language?"
@@ -31,5 +33,5 @@ prompt = PromptTemplate.from_template(template)
 chain = prompt | llm
 
 question = "How much is 2+2?"
-value = chain.invoke({"question": question},callbacks=[StdOutCallbackHandler()],)
-print("-----------------------\n\n",value)
\ No newline at end of file
+value = chain.invoke({"question": question})
+print("-----------------------\n\n",value)
@@ -1,3 +1,6 @@
+import pathlib
+import sys
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent / "prompt_engineering"))
 import json
 with open("../keys.json") as f:
     api_key = json.load(f)
@@ -12,36 +15,15 @@ from llama_index.llms.groq import Groq
 llm = Groq(model="moonshotai/kimi-k2-instruct", api_key=groq_key_1)
 
 
-from llama_index.core.callbacks import LlamaDebugHandler, CallbackManager
+from llama_index.core.callbacks import CallbackManager
 from llama_index.core import Settings
 
-# Initialize the debug handler
-debug_handler = LlamaDebugHandler(print_trace_on_end=True)
-
-# Set the callback manager
-Settings.callback_manager = CallbackManager([debug_handler])
-
-import logging
-import sys
-
-logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
-logging.getLogger().addHandler(logging.StreamHandler(stream=sys.stdout))
+from instrumentation import llama_index_handler
 
-from typing import List
-from pydantic import BaseModel, Field
+# one record per LLM call (latency, tokens) instead of LlamaDebugHandler traces and DEBUG logging on stdout
+Settings.callback_manager = CallbackManager([llama_index_handler(provider="groq")])
 
-class LineItem(BaseModel):
-    """A line item in an invoice."""
-
-    Description: str = Field(description="The description of this item")
-    price: float = Field(description="Total amount payable with IGST for this item")
-
-class Invoice(BaseModel):
-    """A representation of information from an invoice."""
-
-    invoice_id: str = Field(description="A unique identifier for this invoice, majorly the invoice number")
-    date: str = Field(description="The date this invoice was created")
-    line_items: list[LineItem] = Field(description="A list of all the items in this invoice")
+from invoice_models import Invoice, LineItem
 
 from llama_index.readers.file import PDFReader
 from pathlib import Path
@@ -56,6 +38,15 @@ print(response)
 json_response = json.loads(response.text)
 print(json.dumps(json_response, indent=2))
 
+# All pages, chunked and extracted concurrently (see invoice_pipeline.py)
+# from invoice_pipeline import InvoicePipeline
+# from pdf_cache import PdfCache
+# pipeline = InvoicePipeline(lambda messages: llm.complete(messages[0]["content"]).text,
+#                            cache=PdfCache("pdf_cache.sqlite"), model="moonshotai/kimi-k2-instruct")
+# invoices = pipeline.run(["uber_reciept.pdf"])
+# print(invoices["uber_reciept.pdf"].model_dump_json())
+# print(pipeline.stats)
+
 # {"invoice_id":"HCJFJIJI25156289","date":"12 Aug 2025","line_items":[{"Description":"Transportation service fare","price":165.0}]}
 # {
 #   "invoice_id": "HCJFJIJI25156289",
@@ -72,7 +63,6 @@ print(json.dumps(json_response, indent=2))
 
 from pydantic import BaseModel
 from llama_index.core.prompts import RichPromptTemplate
-from llama_index.llms.openai import OpenAI
 from typing import Dict
 
 template_str = "Please extract from the following XML code the contact details of the user:\n\n```xml\n{{ user | to_xml }}\n```\n\n"
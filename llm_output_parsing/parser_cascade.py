@@ -0,0 +1,306 @@
+"""
+Cheapest-first JSON parsing of LLM output.
+
+Each extraction path does one fixed thing: extract_and_validate_json scans for
+brace blocks, lang_parser_2.extract_json slices ```json fences, and the
+LangChain parsers do their own cleanup.  Most completions are already clean
+JSON, so ParserCascade tries the strategies in order of cost and stops at the
+first one that works:
+
+  1. direct  - json.loads (orjson when installed) of the stripped text
+  2. fence   - the body of the first ``` fence
+  3. scan    - balanced-bracket scan of the whole text (json_extractor)
+  4. repair  - tolerant fix-up: trailing commas, single quotes, Python
+               literals, bare keys and truncated output
+
+`stats` records, per tier, the attempts, the successes and the time spent,
+and per model which tier its outputs needed, so it is easy to see which
+model needs repair and what that costs.
+
+    value = PARSER.parse(completion.choices[0].message.content, model="qwen/qwen3-32b")
+    print(PARSER.stats)
+"""
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from json_extractor import iter_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TIERS = ("direct", "fence", "scan", "repair")
+
+_THINK = re.compile(r"<think>.*?(?:</think>|$)", re.DOTALL)
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_NUMBER = re.compile(r"-?[0-9.eE+\-]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]+$")
+_LITERALS = {"True": "true", "False": "false", "None": "null", "true": "true", "false": "false",
+             "null": "null", "NaN": "null", "Infinity": "null"}
+_MISSING = object()
+
+
+class ParseError(ValueError):
+    """No tier produced an acceptable value; `value` is the last decoded one, if any."""
+
+    def __init__(self, message: str, value: Any = _MISSING):
+        super().__init__(message)
+        self.value = value
+
+    @property
+    def decoded(self) -> bool:
+        return self.value is not _MISSING
+
+
+@dataclass
+class TierStats:
+    attempts: int = 0
+    successes: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class CascadeStats:
+    tiers: Dict[str, TierStats] = field(default_factory=lambda: {tier: TierStats() for tier in TIERS})
+    failures: int = 0
+    by_model: Dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+
+    def __str__(self):
+        lines = [f"{'tier':<8} {'attempts':>9} {'successes':>10} {'total ms':>9} {'us/attempt':>11}"]
+        for name, tier in self.tiers.items():
+            per = tier.seconds / tier.attempts * 1e6 if tier.attempts else 0.0
+            lines.append(f"{name:<8} {tier.attempts:>9} {tier.successes:>10} {tier.seconds * 1e3:>9.2f} {per:>11.1f}")
+        lines.append(f"failures: {self.failures}")
+        for model, tiers in self.by_model.items():
+            lines.append(f"{model}: " + ", ".join(f"{tier}={count}" for tier, count in tiers.most_common()))
+        return "\n".join(lines)
+
+
+def fence_body(text: str) -> Optional[str]:
+    """Body of the first ``` fence (language tag dropped), or None."""
+    start = text.find("```")
+    if start < 0:
+        return None
+    body_start = text.find("\n", start + 3)
+    if body_start < 0:
+        return None
+    end = text.find("```", body_start)
+    return text[body_start + 1:end if end >= 0 else len(text)]
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort rewrite of almost-JSON into JSON: text before the first bracket
+    and <think> blocks dropped, single-quoted strings, Python literals and bare
+    keys converted, trailing commas removed, and truncated output closed.
+    """
+    text = _THINK.sub("", text)
+    body = fence_body(text)
+    if body is not None:
+        text = body
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("No JSON object found in the LLM output.")
+    text = text[min(starts):]
+
+    out: List[str] = []
+    # one frame per open bracket: [closer, state]; object states key/colon/value/after, array value/after
+    stack: List[List[str]] = []
+    quote = None
+    escape = False
+    i, n = 0, len(text)
+
+    def value_done():
+        if stack:
+            stack[-1][1] = "after" if stack[-1][1] in ("value", "after") else "colon"
+
+    def drop_trailing_comma():
+        j = len(out) - 1
+        while j >= 0 and out[j].isspace():
+            j -= 1
+        if j >= 0 and out[j] == ",":
+            del out[j]
+
+    while i < n:
+        ch = text[i]
+        if quote is not None:
+            if escape:
+                escape = False
+                if ch == "'":
+                    out[-1] = "'"       # \' is not a JSON escape
+                else:
+                    out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == quote:
+                quote = None
+                out.append('"')
+                value_done()
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            out.append(ch)
+            stack.append(["}" if ch == "{" else "]", "key" if ch == "{" else "value"])
+        elif ch in "}]":
+            if not stack:
+                break
+            drop_trailing_comma()
+            out.append(stack.pop()[0])
+            value_done()
+            if not stack:
+                break
+        elif ch == ",":
+            out.append(ch)
+            if stack:
+                stack[-1][1] = "key" if stack[-1][0] == "}" else "value"
+        elif ch == ":":
+            out.append(ch)
+            if stack:
+                stack[-1][1] = "value"
+        elif ch.isalpha() or ch == "_":
+            word = _WORD.match(text, i).group()
+            if stack and stack[-1][0] == "}" and stack[-1][1] == "key":
+                out.append(json.dumps(word))
+                stack[-1][1] = "colon"
+            else:
+                out.append(_LITERALS.get(word, json.dumps(word)))
+                value_done()
+            i += len(word)
+            continue
+        elif ch in "-0123456789":
+            number = _NUMBER.match(text, i).group()
+            out.append(number)
+            value_done()
+            i += len(number)
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # truncated output: finish the open string / scalar / key, then close every bracket
+    if quote is not None:
+        if escape:
+            out.pop()
+        out.append('"')
+        value_done()
+    result = "".join(out).rstrip()
+    tail = _NUMBER_TAIL.search(result)
+    if tail and stack and tail.group()[0] in "-0123456789":
+        token = tail.group()
+        fixed = token.rstrip(".eE+-")
+        result = result[:len(result) - len(token)] + (fixed if fixed and fixed != "-" else "null")
+    result = result.rstrip().rstrip(",")
+    if stack:
+        state = stack[-1][1]
+        if state == "colon":
+            result += ":null"
+        elif state == "value" and stack[-1][0] == "}" and result.endswith(":"):
+            result += "null"
+    for closer, _ in reversed(stack):
+        result += closer
+    return result
+
+
+class ParserCascade:
+
+    def __init__(self, use_orjson: bool = True):
+        self._loads = orjson.loads if (use_orjson and orjson is not None) else json.loads
+        self.stats = CascadeStats()
+        self.last_tier: Optional[str] = None   # tier of the latest parse() (None if it failed)
+
+    def _direct(self, text: str) -> Iterator[Any]:
+        stripped = text.strip()
+        if stripped[:1] in ("{", "[") and stripped[-1:] in ("}", "]"):
+            try:
+                yield self._loads(stripped)
+            except ValueError:
+                pass
+
+    def _fence(self, text: str) -> Iterator[Any]:
+        body = fence_body(text)
+        if body is not None:
+            try:
+                yield self._loads(body.strip())
+            except ValueError:
+                pass
+
+    def _scan(self, text: str) -> Iterator[Any]:
+        return iter_json(text)
+
+    def _repair(self, text: str) -> Iterator[Any]:
+        try:
+            yield json.loads(repair_json(text))
+        except ValueError:
+            pass
+
+    def candidates(self, text: str) -> Iterator[Tuple[str, Any]]:
+        """(tier, value) for every decodable candidate, cheapest tier first."""
+        for tier, strategy in zip(TIERS, (self._direct, self._fence, self._scan, self._repair)):
+            stats = self.stats.tiers[tier]
+            stats.attempts += 1
+            start = time.perf_counter()
+            for value in strategy(text):
+                stats.seconds += time.perf_counter() - start
+                yield tier, value
+                start = time.perf_counter()
+            stats.seconds += time.perf_counter() - start
+
+    def parse(self, text: str, validate: Optional[Callable[[Any], Any]] = None, model: str = "unknown") -> Any:
+        """
+        First value that decodes (and passes `validate`, whose return value is
+        returned).  Raises ParseError, carrying the last decoded value, when
+        every tier fails.
+        """
+        last, error = _MISSING, None
+        self.last_tier = None
+        for tier, value in self.candidates(text):
+            if validate is not None:
+                try:
+                    value = validate(value)
+                except ValueError as e:
+                    last, error = value, e
+                    continue
+            self.stats.tiers[tier].successes += 1
+            self.stats.by_model[model][tier] += 1
+            self.last_tier = tier
+            return value
+        self.stats.failures += 1
+        self.stats.by_model[model]["failed"] += 1
+        if last is _MISSING:
+            raise ParseError("No JSON object found in the LLM output.")
+        raise ParseError(f"Validation error: {error}\nParsed data was:\n{last}", last) from error
+
+
+# shared instance so stats accumulate across calls
+PARSER = ParserCascade()
+
+
+if __name__ == "__main__":
+    samples = [
+        '{"name": "Ram", "age": 26}',
+        'Sure!\n```json\n{"name": "Ram", "age": 26}\n```',
+        '<think>{maybe}</think> The answer is {"name": "Ram", "age": 26}. Hope this helps',
+        "{'name': 'Ram', 'age': 26, 'tags': ['a', 'b',], 'ok': True,}",
+        '{name: "Ram", age: 26}',
+        '{"name": "Ram", "age": 26, "social_accounts": {"bluesky": "ramk',
+        '{"name": "Ram", "items": [1, 2.',
+    ]
+    for sample in samples:
+        print(f"{sample[:45]!r:<50} -> {PARSER.parse(sample)}")
+    print(PARSER.stats)
@@ -0,0 +1,332 @@
+"""
+Streaming partial-JSON parsing.
+
+Structured-output calls normally wait for the last token before anything is
+parsed.  StreamingJsonParser consumes the delta chunks of a streamed
+completion, keeps a best-effort partial object (completed fields only), and
+emits an event every time a value closes - so the first LineItem of an
+Invoice can be processed while the model is still writing the second one.
+
+StreamingModelParser adds Pydantic on top: top-level fields and items of
+top-level list fields are validated as soon as they close.
+"""
+import json
+import re
+import typing
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel, TypeAdapter
+
+_START = re.compile(r"[{\[]|<think>")
+_STRING = re.compile(r'["\\]')
+_LITERAL_CHARS = frozenset("0123456789+-.eEtrufalsn")
+_WHITESPACE = frozenset(" \t\r\n")
+
+
+class JsonEvent(NamedTuple):
+    """A value that just closed, with its path from the root (keys and list indices)."""
+    path: Tuple[Any, ...]
+    value: Any
+
+
+class ModelEvent(NamedTuple):
+    """A validated top-level field, or (index is not None) one item of a list field."""
+    field: str
+    index: Optional[int]
+    value: Any
+
+
+class _Frame:
+    __slots__ = ("container", "path", "expect", "key")
+
+    def __init__(self, container, path):
+        self.container = container
+        self.path = path
+        self.expect = "key" if isinstance(container, dict) else "value"
+        self.key = None
+
+
+class StreamingJsonParser:
+    """
+    Incremental JSON parser for LLM deltas.
+
+    Text before the root value (including <think> blocks, ```json fences and
+    prose with stray brackets) and everything after it closes is ignored.  A
+    "{" or "[" that turns out not to start JSON is skipped and the scan goes
+    on from the next one, as in JsonExtractor.  A candidate is only committed
+    to once its first event has been returned, so an error before that is
+    treated as prose too ("see [1): {...}").
+
+    Prose can also hold valid JSON ("per step [1], the answer: {...}").  When
+    the expected shape is known, pass `accept`: it gets the first event of
+    each candidate, and False skips that candidate the same way.
+    """
+
+    def __init__(self, accept: Optional[Callable[[JsonEvent], bool]] = None):
+        self.accept = accept
+        self._reset()
+
+    def _reset(self):
+        self.root = None
+        self.done = False
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._pending = ""
+        self._in_think = False
+        self._tok: Optional[List[str]] = None
+        self._tok_kind = None   # "key", "str" or "lit"
+        self._escape = False
+        # text of the current root candidate until it produces its first event,
+        # so a "{" in prose can be given up on and the scan restarted after it
+        self._candidate: Optional[str] = ""
+
+    @property
+    def partial(self) -> Any:
+        """Best-effort view of the object so far; containers are filled in place."""
+        return self.root
+
+    def feed(self, chunk: str) -> List[JsonEvent]:
+        events: List[JsonEvent] = []
+        if self.done or not chunk:
+            return events
+        while True:
+            if not self._started:
+                chunk = self._skip_preamble(chunk)
+                if chunk is None:
+                    return events
+            if self._candidate is None:
+                self._parse(chunk, events)
+                return events
+            self._candidate += chunk
+            try:
+                self._parse(chunk, events)
+                rejected = bool(events) and self.accept is not None and not self.accept(events[0])
+            except ValueError:
+                # not JSON after all (e.g. "use {name} here"); nothing has been returned from it yet
+                rejected = True
+            if rejected:
+                # rescan just after its opener
+                chunk = self._candidate[1:]
+                events.clear()
+                self._reset()
+                continue
+            if events:
+                self._candidate = None
+            return events
+
+    def _parse(self, chunk: str, events: List[JsonEvent]):
+        i, n = 0, len(chunk)
+        while i < n and not self.done:
+            kind = self._tok_kind
+            if kind == "key" or kind == "str":
+                if self._escape:
+                    self._tok.append(chunk[i])
+                    self._escape = False
+                    i += 1
+                    continue
+                m = _STRING.search(chunk, i)
+                if m is None:
+                    self._tok.append(chunk[i:])
+                    break
+                j = m.start()
+                self._tok.append(chunk[i:j + 1])
+                i = j + 1
+                if chunk[j] == "\\":
+                    self._escape = True
+                    continue
+                value = json.loads("".join(self._tok))
+                self._tok = self._tok_kind = None
+                if kind == "key":
+                    frame = self._stack[-1]
+                    frame.key = value
+                    frame.expect = "colon"
+                else:
+                    self._add_value(value, events)
+                continue
+
+            ch = chunk[i]
+            if kind == "lit":
+                if ch in _LITERAL_CHARS:
+                    self._tok.append(ch)
+                    i += 1
+                    continue
+                value = json.loads("".join(self._tok))
+                self._tok = self._tok_kind = None
+                self._add_value(value, events)
+                continue  # re-process ch as structure
+
+            i += 1
+            if ch in _WHITESPACE:
+                continue
+            self._structure(ch, events)
+
+    def close(self) -> Any:
+        """Flush a trailing literal and return the root value; raises if it never closed."""
+        if self._tok_kind == "lit":
+            events: List[JsonEvent] = []
+            value = json.loads("".join(self._tok))
+            self._tok = self._tok_kind = None
+            self._add_value(value, events)
+        if not self.done:
+            raise ValueError(f"Incomplete JSON in stream, partial object was:\n{self.root}")
+        return self.root
+
+    def _skip_preamble(self, chunk: str) -> Optional[str]:
+        text = self._pending + chunk
+        pos = 0
+        while True:
+            if self._in_think:
+                end = text.find("</think>", pos)
+                if end < 0:
+                    self._pending = text[-7:]
+                    return None
+                self._in_think = False
+                pos = end + len("</think>")
+            m = _START.search(text, pos)
+            if m is None:
+                self._pending = text[-6:]
+                return None
+            if m.group() == "<think>":
+                self._in_think = True
+                pos = m.end()
+                continue
+            self._pending = ""
+            self._started = True
+            return text[m.start():]
+
+    def _structure(self, ch: str, events: List[JsonEvent]):
+        frame = self._stack[-1] if self._stack else None
+        expect = frame.expect if frame is not None else "value"
+
+        if expect == "value":
+            if ch == "{" or ch == "[":
+                self._open({} if ch == "{" else [])
+            elif ch == '"':
+                self._tok, self._tok_kind = ['"'], "str"
+            elif ch in _LITERAL_CHARS:
+                self._tok, self._tok_kind = [ch], "lit"
+            elif ch == "]" and frame is not None and isinstance(frame.container, list):
+                self._close(events)
+            else:
+                raise ValueError(f"Unexpected {ch!r} where a JSON value was expected")
+        elif expect == "key":
+            if ch == '"':
+                self._tok, self._tok_kind = ['"'], "key"
+            elif ch == "}":
+                self._close(events)
+            else:
+                raise ValueError(f"Unexpected {ch!r} where an object key was expected")
+        elif expect == "colon":
+            if ch != ":":
+                raise ValueError(f"Unexpected {ch!r} where ':' was expected")
+            frame.expect = "value"
+        else:  # comma
+            if ch == ",":
+                frame.expect = "key" if isinstance(frame.container, dict) else "value"
+            elif ch in "}]":
+                self._close(events)
+            else:
+                raise ValueError(f"Unexpected {ch!r} where ',' was expected")
+
+    def _child_path(self):
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            return frame.path + (frame.key,)
+        return frame.path + (len(frame.container),)
+
+    def _attach(self, value):
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+        else:
+            frame.container.append(value)
+        frame.expect = "comma"
+
+    def _open(self, container):
+        if self._stack:
+            path = self._child_path()
+            self._attach(container)
+        else:
+            path = ()
+            self.root = container
+        self._stack.append(_Frame(container, path))
+
+    def _close(self, events: List[JsonEvent]):
+        frame = self._stack.pop()
+        events.append(JsonEvent(frame.path, frame.container))
+        if not self._stack:
+            self.done = True
+
+    def _add_value(self, value, events: List[JsonEvent]):
+        if not self._stack:
+            raise ValueError("Scalar JSON root values are not supported")
+        path = self._child_path()
+        self._attach(value)
+        events.append(JsonEvent(path, value))
+
+
+def _object_root(event: JsonEvent) -> bool:
+    """First event of a candidate whose root is an object (a model), not an array."""
+    return isinstance(event.path[0], str) if event.path else isinstance(event.value, dict)
+
+
+def _list_item_type(annotation) -> Optional[Any]:
+    if typing.get_origin(annotation) in (list, List):
+        args = typing.get_args(annotation)
+        return args[0] if args else Any
+    return None
+
+
+class StreamingModelParser:
+    """
+    Validates a Pydantic model field-by-field while its JSON is streaming.
+
+    Top-level fields are emitted (validated) when their value closes; items of
+    list-typed fields, e.g. Invoice.line_items -> LineItem, are emitted one by one.
+    """
+
+    def __init__(self, schema_model: type[BaseModel]):
+        self.schema_model = schema_model
+        self.parser = StreamingJsonParser(accept=_object_root)
+        self._fields = {}
+        self._items = {}
+        for name, field in schema_model.model_fields.items():
+            key = field.alias or name
+            self._fields[key] = (name, TypeAdapter(field.annotation))
+            item_type = _list_item_type(field.annotation)
+            if item_type is not None:
+                self._items[key] = TypeAdapter(item_type)
+
+    @property
+    def partial(self) -> Optional[dict]:
+        return self.parser.partial
+
+    def feed(self, chunk: str) -> List[ModelEvent]:
+        events = []
+        for path, value in self.parser.feed(chunk):
+            if len(path) == 1 and path[0] in self._fields:
+                name, adapter = self._fields[path[0]]
+                events.append(ModelEvent(name, None, adapter.validate_python(value)))
+            elif len(path) == 2 and path[0] in self._items:
+                name = self._fields[path[0]][0]
+                events.append(ModelEvent(name, path[1], self._items[path[0]].validate_python(value)))
+        return events
+
+    def close(self) -> BaseModel:
+        """Validate the finished object against the whole model."""
+        return self.schema_model.model_validate(self.parser.close())
+
+
+def iter_stream_events(stream: Iterable, schema_model: type[BaseModel]) -> Iterator[ModelEvent]:
+    """
+    Drive a StreamingModelParser from an OpenAI/Groq `stream=True` completion.
+    Yields ModelEvents as they close; `StopIteration.value` is the validated model.
+    """
+    parser = StreamingModelParser(schema_model)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield from parser.feed(content)
+    return parser.close()
@@ -0,0 +1,127 @@
+"""
+Content-hash cache for PDF text and extracted invoices.
+
+Every run of llmind_parser_1.py re-parses uber_reciept.pdf and re-runs the LLM
+extraction although the file has not changed.  PdfCache keys everything on
+the sha256 of the file contents, in one SQLite file:
+
+  - files:    path -> (size, mtime_ns, sha256), so an unchanged file is
+              recognised from a stat() without reading it again
+  - pages:    sha256 -> zlib-compressed page text (level one)
+  - invoices: (sha256, schema version, model) -> validated Invoice JSON (level two)
+
+A renamed or copied file hits on its hash; editing the Invoice model changes
+its schema version (schema_registry) and only invalidates level two.  The
+database is read through SQLite's mmap, so re-processing a directory of
+unchanged receipts is a stat and an indexed lookup per file.
+
+    cache = PdfCache("pdf_cache.sqlite")
+    pipeline = InvoicePipeline(complete, cache=cache, model="moonshotai/kimi-k2-instruct")
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional
+
+_PAGE_BREAK = "\f"
+
+
+@dataclass
+class PdfCacheStats:
+    stat_hits: int = 0
+    hashed: int = 0
+    page_hits: int = 0
+    page_misses: int = 0
+    invoice_hits: int = 0
+    invoice_misses: int = 0
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PdfCache:
+
+    def __init__(self, path: str = "pdf_cache.sqlite", mmap_size: int = 256 << 20):
+        self.stats = PdfCacheStats()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "sha256 TEXT PRIMARY KEY, page_count INTEGER NOT NULL, text BLOB NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS invoices ("
+            "sha256 TEXT NOT NULL, schema_version TEXT NOT NULL, model TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (sha256, schema_version, model));"
+        )
+        self._db.commit()
+
+    def file_hash(self, path: str) -> str:
+        """sha256 of the file, read again only when its size or mtime changed."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self.stats.stat_hits += 1
+            return row[2]
+        digest = file_sha256(path)
+        self.stats.hashed += 1
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                             (path, stat.st_size, stat.st_mtime_ns, digest))
+            self._db.commit()
+        return digest
+
+    def get_pages(self, digest: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._db.execute("SELECT text FROM pages WHERE sha256 = ?", (digest,)).fetchone()
+        if row is None:
+            self.stats.page_misses += 1
+            return None
+        self.stats.page_hits += 1
+        return zlib.decompress(row[0]).decode().split(_PAGE_BREAK)
+
+    def put_pages(self, digest: str, pages: List[str]):
+        # form feeds separate the pages; any inside the page text become spaces
+        blob = zlib.compress(_PAGE_BREAK.join(p.replace(_PAGE_BREAK, " ") for p in pages).encode(), 6)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO pages (sha256, page_count, text) VALUES (?, ?, ?)",
+                             (digest, len(pages), blob))
+            self._db.commit()
+
+    def get_invoice(self, digest: str, schema_version: str, model: str) -> Optional[str]:
+        """Validated invoice JSON, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM invoices WHERE sha256 = ? AND schema_version = ? AND model = ?",
+                (digest, schema_version, model),
+            ).fetchone()
+        if row is None:
+            self.stats.invoice_misses += 1
+            return None
+        self.stats.invoice_hits += 1
+        return row[0]
+
+    def put_invoice(self, digest: str, schema_version: str, model: str, value: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO invoices (sha256, schema_version, model, value) VALUES (?, ?, ?, ?)",
+                (digest, schema_version, model, value),
+            )
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
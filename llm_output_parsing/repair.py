@@ -0,0 +1,190 @@
+"""
+Targeted repair of invalid structured output.
+
+When model_validate fails (a bad email, a missing field, or the
+question_ends_with_question_mark validator on Joke), re-running the whole
+extraction re-sends the source text and regenerates every field.  Repairer
+turns the ValidationError into a short correction prompt that only lists the
+failing paths, their current values and the errors, asks for a JSON object of
+{path: corrected value}, merges that into the partial object and validates
+again.  A patch with a path that does not fit the data (PatchError) is
+dropped whole and the next round sends the same errors back.  Retries and
+the tokens spent on repair are counted in `stats`.
+
+    repairer = Repairer(openai_complete(client, "qwen/qwen3-32b"), Joke)
+    joke = repairer.validate(parsed_data)
+"""
+import copy
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError
+
+from batch_extraction import response_text, response_usage, usage_counts
+from json_extractor import extract_json
+from schema_registry import get_schema
+
+ROOT = "$"
+
+_PROMPT = """{what} failed validation:
+{data}
+
+Errors:
+{errors}
+{schemas}
+Return ONLY a JSON object mapping each failing path to its corrected value, e.g. {{"{example}": ...}}.
+Use "{root}" as the path to replace the whole object. Do not include fields that are already valid."""
+
+
+class PatchError(ValueError):
+    """A patch path that does not fit the data (indexing a scalar, a non-numeric list index, a gap in a list)."""
+
+
+@dataclass
+class RepairStats:
+    validations: int = 0
+    repair_calls: int = 0
+    repaired: int = 0
+    failed: int = 0
+    rejected_patches: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def error_path(loc: Tuple) -> str:
+    return ".".join(str(part) for part in loc) if loc else ROOT
+
+
+def failing_paths(error: ValidationError) -> List[Tuple[str, str]]:
+    """(dotted path, message) for every error; model-level validator errors map to "$"."""
+    seen = {}
+    for item in error.errors():
+        seen.setdefault(error_path(item["loc"]), item["msg"])
+    return list(seen.items())
+
+
+def _get(data: Any, path: str) -> Any:
+    if path == ROOT:
+        return data
+    for part in path.split("."):
+        if isinstance(data, list):
+            data = data[int(part)]
+        elif isinstance(data, dict):
+            data = data.get(part)
+        else:
+            return None
+    return data
+
+
+def _index(target: list, part: str, path: str, extend: bool = False) -> int:
+    if not part.isdigit() or int(part) > len(target) or (int(part) == len(target) and not extend):
+        raise PatchError(f"{path}: no list item {part!r}")
+    return int(part)
+
+
+def apply_patch(data: Any, patch: Dict[str, Any]) -> Any:
+    """
+    Set each dotted path of `patch` in `data` (creating missing dict levels); "$" merges into the root.
+    A list index may be one past the end to append.  Raises PatchError for a path that does not fit.
+    """
+    for path, value in patch.items():
+        if path == ROOT:
+            if isinstance(data, dict) and isinstance(value, dict):
+                data.update(value)
+            else:
+                data = value
+            continue
+        parts = path.split(".")
+        target = data
+        for part, following in zip(parts, parts[1:]):
+            if isinstance(target, list):
+                target = target[_index(target, part, path)]
+            elif isinstance(target, dict):
+                target = target.setdefault(part, [] if following.isdigit() else {})
+            else:
+                raise PatchError(f"{path}: {part!r} is inside a {type(target).__name__}")
+        last = parts[-1]
+        if isinstance(target, list):
+            index = _index(target, last, path, extend=True)
+            if index < len(target):
+                target[index] = value
+            else:
+                target.append(value)
+        elif isinstance(target, dict):
+            target[last] = value
+        else:
+            raise PatchError(f"{path}: {last!r} is inside a {type(target).__name__}")
+    return data
+
+
+class Repairer:
+
+    def __init__(self, complete: Callable[[List[dict]], Any], schema_model: Type[BaseModel], max_rounds: int = 2):
+        self.complete = complete
+        self.schema = get_schema(schema_model)
+        self.max_rounds = max_rounds
+        self.stats = RepairStats()
+
+    def _field_schemas(self, paths: List[str]) -> str:
+        properties = self.schema.json_schema.get("properties", {})
+        lines = []
+        for name in dict.fromkeys(path.split(".")[0] for path in paths):
+            if name in properties:
+                lines.append(f"{name}: {json.dumps(properties[name], separators=(',', ':'))}")
+        return ("\nSchema of the failing fields:\n" + "\n".join(lines) + "\n") if lines else ""
+
+    def build_prompt(self, data: Any, errors: List[Tuple[str, str]]) -> str:
+        paths = [path for path, _ in errors]
+        if ROOT in paths:
+            shown = data
+        else:
+            shown = {path: _get(data, path) for path in paths}
+        return _PROMPT.format(
+            what="This JSON object" if ROOT in paths else "These fields of a JSON object",
+            data=json.dumps(shown, ensure_ascii=False, default=str),
+            errors="\n".join(f"- {path}: {message}" for path, message in errors),
+            schemas=self._field_schemas([p for p in paths if p != ROOT]),
+            example=paths[0],
+            root=ROOT,
+        )
+
+    def validate(self, data: Union[str, Dict[str, Any]]) -> BaseModel:
+        """Validate `data`, repairing only the failing paths; raises the last ValidationError if that fails."""
+        if isinstance(data, str):
+            data = json.loads(data)
+        self.stats.validations += 1
+        for round_ in range(self.max_rounds + 1):
+            try:
+                value = self.schema.validate_python(data)
+            except ValidationError as error:
+                if round_ == self.max_rounds:
+                    self.stats.failed += 1
+                    raise
+                data = self._repair(data, failing_paths(error))
+                continue
+            if round_:
+                self.stats.repaired += 1
+            return value
+
+    def _repair(self, data: Any, errors: List[Tuple[str, str]]) -> Any:
+        response = self.complete([{"role": "user", "content": self.build_prompt(data, errors)}])
+        self.stats.repair_calls += 1
+        prompt_tokens, completion_tokens, _ = usage_counts(response_usage(response))
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.completion_tokens += completion_tokens
+        try:
+            patch = extract_json(response_text(response))
+        except ValueError:
+            return data
+        if not isinstance(patch, dict):
+            return data
+        # accept a bare corrected object for root-level errors
+        if errors[0][0] == ROOT and len(errors) == 1 and ROOT not in patch:
+            patch = {ROOT: patch}
+        try:
+            return apply_patch(copy.deepcopy(data), patch)
+        except PatchError:
+            # nothing applied; the next round sends the same errors back
+            self.stats.rejected_patches += 1
+            return data
@@ -0,0 +1,79 @@
+"""
+Compile-once registry for response models.
+
+`User.model_json_schema()` inside the prompt f-string, and
+`parser.get_format_instructions()` per prompt template, regenerate the same
+JSON schema on every request.  get_schema(Model) builds everything a
+structured-output request needs exactly once per model class and caches it:
+the JSON schema, its minified text for prompts, LangChain-style format
+instructions, and prebuilt TypeAdapter validators.
+
+    schema = get_schema(User)
+    prompt = f"Respond ONLY with valid JSON that matches this schema: {schema.schema_text}\\n..."
+    user = schema.validate_json(completion.choices[0].message.content)
+"""
+import hashlib
+import json
+import threading
+from functools import cached_property
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+# same wording as langchain_core's PydanticOutputParser.get_format_instructions()
+_FORMAT_INSTRUCTIONS = """The output should be formatted as a JSON instance that conforms to the JSON schema below.
+
+As an example, for the schema {{"properties": {{"foo": {{"title": "Foo", "description": "a list of strings", "type": "array", "items": {{"type": "string"}}}}}}, "required": ["foo"]}}
+the object {{"foo": ["bar", "baz"]}} is a well-formatted instance of the schema. The object {{"properties": {{"foo": ["bar", "baz"]}}}} is not well-formatted.
+
+Here is the output schema:
+```
+{schema}
+```"""
+
+
+class CompiledSchema:
+    """Everything derived from one response model, computed once."""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.json_schema: Dict[str, Any] = model.model_json_schema()
+        self.schema_text = json.dumps(self.json_schema, separators=(",", ":"), ensure_ascii=False)
+        self.version = hashlib.sha256(self.schema_text.encode()).hexdigest()[:12]
+        self.adapter = TypeAdapter(model)
+
+    @cached_property
+    def format_instructions(self) -> str:
+        reduced = {k: v for k, v in self.json_schema.items() if k not in ("title", "type")}
+        return _FORMAT_INSTRUCTIONS.format(schema=json.dumps(reduced, ensure_ascii=False))
+
+    @cached_property
+    def list_adapter(self) -> TypeAdapter:
+        """Validator for a JSON array of the model (batch extraction)."""
+        return TypeAdapter(List[self.model])
+
+    @cached_property
+    def response_format(self) -> Dict[str, Any]:
+        """OpenAI/Groq `response_format` for json_schema structured output."""
+        return {"type": "json_schema", "json_schema": {"name": self.model.__name__, "schema": self.json_schema}}
+
+    def validate_json(self, text: str) -> BaseModel:
+        return self.adapter.validate_json(text)
+
+    def validate_python(self, data: Any) -> BaseModel:
+        return self.adapter.validate_python(data)
+
+
+_REGISTRY: Dict[type, CompiledSchema] = {}
+_LOCK = threading.Lock()
+
+
+def get_schema(model: Type[BaseModel]) -> CompiledSchema:
+    """Compiled schema for `model`, keyed by the class object itself."""
+    compiled = _REGISTRY.get(model)
+    if compiled is None:
+        with _LOCK:
+            compiled = _REGISTRY.get(model)
+            if compiled is None:
+                compiled = _REGISTRY[model] = CompiledSchema(model)
+    return compiled
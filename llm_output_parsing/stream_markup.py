@@ -0,0 +1,254 @@
+"""
+Incremental XML and YAML parsing of streamed LLM output.
+
+lang_parser_3.py runs XMLOutputParser(tags=["movies", "actor", "film", "name",
+"genre"]) and YamlOutputParser(pydantic_object=Joke) on whole completions, so
+a long filmography is only usable once the last token has arrived and the
+full text is held (and parsed) at once.  The parsers here consume token
+deltas and emit every completed item while the stream continues:
+
+  - StreamingXmlParser sits on xml.etree's XMLPullParser; each closed
+    `<film>` (or any of `item_tags`) becomes an event and is then cut out of
+    the tree, so memory stays at one item however long the output is.
+  - StreamingYamlParser is line-oriented: a top-level list item ("- name: ...")
+    or a top-level key is complete as soon as the next line starts at column 0
+    (except the "- " lines of a list under that key, which yaml.safe_dump
+    writes without indentation), and only that item's lines are handed to
+    yaml.safe_load.
+
+With a Pydantic `model` the item values are validated into typed objects.
+
+    parser = StreamingXmlParser(item_tags=("film",), model=Film)
+    for delta in deltas:
+        for event in parser.feed(delta):
+            print(event.value)
+"""
+import re
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Type, Union
+
+from pydantic import BaseModel
+
+_TAG_START = re.compile(r"<[A-Za-z_?]")
+_FENCE = "```"
+
+
+class MarkupEvent(NamedTuple):
+    """
+    One completed item.  XML: `tag` is the element tag and `index` counts
+    items of that tag.  YAML: list items have `index`, top-level keys have
+    `tag`; close() emits the whole document with neither.
+    """
+    tag: Optional[str]
+    index: Optional[int]
+    value: Any
+
+
+def element_value(element: ET.Element) -> Union[str, Dict[str, Any]]:
+    """Text of a leaf; otherwise {child tag: value}, repeated tags collected into lists."""
+    if len(element) == 0:
+        return (element.text or "").strip()
+    value: Dict[str, Any] = {}
+    for child in element:
+        child_value = element_value(child)
+        if child.tag in value:
+            if not isinstance(value[child.tag], list):
+                value[child.tag] = [value[child.tag]]
+            value[child.tag].append(child_value)
+        else:
+            value[child.tag] = child_value
+    return value
+
+
+class StreamingXmlParser:
+    """
+    `feed(delta)` returns a MarkupEvent for every element of `item_tags` that
+    closed in that delta.  Text before the first tag (prose, ```xml fences) and
+    anything after the root element closes are ignored.
+    """
+
+    def __init__(self, item_tags: Sequence[str] = ("film",), model: Optional[Type[BaseModel]] = None):
+        self.item_tags = frozenset(item_tags)
+        self.model = model
+        self.done = False
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._started = False
+        self._pending = ""
+        self._path: List[ET.Element] = []
+        self._counts: Dict[str, int] = {}
+
+    def feed(self, delta: str) -> List[MarkupEvent]:
+        if self.done:
+            return []
+        if not self._started:
+            self._pending += delta
+            match = _TAG_START.search(self._pending)
+            if match is None:
+                # keep a possible "<" at the end for the next delta
+                self._pending = self._pending[-1:]
+                return []
+            delta, self._pending = self._pending[match.start():], ""
+            self._started = True
+        self._parser.feed(delta)
+        if ">" not in delta:
+            # no tag can have closed
+            return []
+        return self._events()
+
+    def close(self) -> List[MarkupEvent]:
+        if self.done or not self._started:
+            return []
+        try:
+            self._parser.close()
+        except ET.ParseError:
+            pass
+        return self._events()
+
+    def _events(self) -> List[MarkupEvent]:
+        events = []
+        try:
+            for kind, element in self._parser.read_events():
+                if kind == "start":
+                    self._path.append(element)
+                    continue
+                self._path.pop()
+                if element.tag in self.item_tags:
+                    value = element_value(element)
+                    if self.model is not None:
+                        value = self.model.model_validate(value)
+                    index = self._counts.get(element.tag, 0)
+                    self._counts[element.tag] = index + 1
+                    events.append(MarkupEvent(element.tag, index, value))
+                    # drop the finished item so the tree never holds more than one
+                    if self._path:
+                        self._path[-1].remove(element)
+                    element.clear()
+                if not self._path:
+                    self.done = True
+                    break
+        except ET.ParseError:
+            if not self.done and self._path:
+                raise
+            self.done = True
+        return events
+
+
+_TOP_LEVEL_KEY = re.compile(r"[^\s#-][^:]*:(\s|$)")
+
+
+class StreamingYamlParser:
+    """
+    Line-oriented YAML for the two shapes LLMs produce: a top-level list of
+    items, or a top-level mapping (like Joke).  List items are emitted with
+    their index, mapping keys with their name; `close()` emits the last item
+    and, for a mapping with a `model`, the validated document.
+    """
+
+    def __init__(self, model: Optional[Type[BaseModel]] = None):
+        self.model = model
+        self._line = ""
+        self._item: List[str] = []
+        self._kind: Optional[str] = None     # "list" or "mapping"
+        self._fenced = False
+        self._done = False
+        self._index = 0
+        self._document: Dict[str, Any] = {}
+
+    def feed(self, delta: str) -> List[MarkupEvent]:
+        events = []
+        self._line += delta
+        while not self._done:
+            newline = self._line.find("\n")
+            if newline < 0:
+                break
+            line, self._line = self._line[:newline], self._line[newline + 1:]
+            events.extend(self._feed_line(line))
+        return events
+
+    def close(self) -> List[MarkupEvent]:
+        events = []
+        if self._line and not self._done:
+            events.extend(self._feed_line(self._line))
+        self._line = ""
+        events.extend(self._flush())
+        if self._kind == "mapping" and self.model is not None and not self._done:
+            events.append(MarkupEvent(None, None, self.model.model_validate(self._document)))
+        self._done = True
+        return events
+
+    def _feed_line(self, line: str) -> List[MarkupEvent]:
+        stripped = line.strip()
+        if stripped.startswith(_FENCE) and not self._fenced and self._index == 0 and not self._document:
+            # opening fence: whatever came before it was prose
+            self._fenced = True
+            self._item, self._kind = [], None
+            return []
+        if stripped.startswith(_FENCE):
+            events = self._flush()
+            if self._kind == "mapping" and self.model is not None:
+                events.append(MarkupEvent(None, None, self.model.model_validate(self._document)))
+            self._done = True
+            return events
+        dash = line.startswith("- ") or line == "-"
+        if line[:1] in (" ", "\t") or not stripped or stripped.startswith("#") or (dash and self._kind == "mapping"):
+            # continuation of the current item (or nothing); in a mapping a "- " at column 0
+            # is an indentless sequence under the current key, as yaml.safe_dump writes lists
+            if self._item:
+                self._item.append(line)
+            return []
+        # a new item starts at column 0
+        events = self._flush()
+        if dash:
+            self._kind = self._kind or "list"
+        elif _TOP_LEVEL_KEY.match(line):
+            self._kind = self._kind or "mapping"
+        self._item = [line]
+        return events
+
+    def _flush(self) -> List[MarkupEvent]:
+        if not self._item:
+            return []
+        import yaml
+
+        text = "\n".join(self._item)
+        self._item = []
+        # libyaml's loader when PyYAML was built with it: items are parsed one by one, so per-call cost matters
+        loaded = yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        if self._kind == "list":
+            events = []
+            for value in loaded or []:
+                if self.model is not None:
+                    value = self.model.model_validate(value)
+                events.append(MarkupEvent(None, self._index, value))
+                self._index += 1
+            return events
+        if isinstance(loaded, dict):
+            self._document.update(loaded)
+            return [MarkupEvent(key, None, value) for key, value in loaded.items()]
+        return [MarkupEvent(None, None, loaded)]
+
+
+if __name__ == "__main__":
+    class Film(BaseModel):
+        name: str
+        genre: str
+
+    class Joke(BaseModel):
+        setup: str
+        punchline: str
+
+    xml_output = ("Here is the filmography:\n```xml\n<movies>\n  <actor>Tom Hanks</actor>\n"
+                  "  <film>\n    <name>Forrest Gump</name>\n    <genre>Drama</genre>\n  </film>\n"
+                  "  <film>\n    <name>Cast Away</name>\n    <genre>Adventure/Drama</genre>\n  </film>\n"
+                  "</movies>\n```")
+    xml_parser = StreamingXmlParser(item_tags=("actor", "film"))
+    for start in range(0, len(xml_output), 7):
+        for event in xml_parser.feed(xml_output[start:start + 7]):
+            print(f"after {start + 7:>3} chars: {event}")
+
+    yaml_output = "```yaml\nsetup: Why did the scarecrow win an award?\npunchline: Because he was outstanding in his field!\n```"
+    yaml_parser = StreamingYamlParser(model=Joke)
+    for start in range(0, len(yaml_output), 5):
+        for event in yaml_parser.feed(yaml_output[start:start + 5]):
+            print(f"after {start + 5:>3} chars: {event}")
+    print(yaml_parser.close())
@@ -0,0 +1,81 @@
+import json
+import re
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+
+from batch_extraction import BatchExtractor
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+
+
+TEXTS = [f"Person{i} is {20 + i} years old" for i in range(4)]
+
+
+def completion(items, finish_reason="stop", completion_tokens=40):
+    message = SimpleNamespace(content=json.dumps(items))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)],
+                           usage=SimpleNamespace(prompt_tokens=100, completion_tokens=completion_tokens))
+
+
+def records(messages):
+    return [(int(i), name, int(age))
+            for i, name, age in re.findall(r"\[(\d+)\] (\w+) is (\d+) years old", messages[0]["content"])]
+
+
+def test_unhashable_or_bogus_indexes_are_ignored():
+    def complete(messages):
+        items = [{"index": [0], "data": {}}, {"index": {"a": 1}, "data": {}}, {"index": True, "data": {}}, "junk"]
+        items += [{"index": i, "data": {"name": name, "age": age}} for i, name, age in records(messages)]
+        return completion(items)
+
+    results = BatchExtractor(complete, Person, "Extract.").extract(TEXTS)
+    assert [r.value.name for r in results] == [f"Person{i}" for i in range(4)]
+    assert all(r.attempts == 1 for r in results)
+
+
+def test_missing_records_are_resubmitted_without_shrinking_batches():
+    dropped = set()
+
+    def complete(messages):
+        items = []
+        for i, name, age in records(messages):
+            if i == 2 and i not in dropped:
+                dropped.add(i)
+                continue
+            items.append({"index": i, "data": {"name": name, "age": age}})
+        return completion(items, completion_tokens=10 * len(items))
+
+    extractor = BatchExtractor(complete, Person, "Extract.", output_tokens_per_record=10)
+    results = extractor.extract(TEXTS)
+    assert all(r.ok for r in results) and results[2].attempts == 2
+    assert extractor.stats.truncated == 0
+    assert extractor._out_per_record == 10.0
+
+
+def test_truncated_response_plans_smaller_batches():
+    def complete(messages):
+        items = [{"index": i, "data": {"name": name, "age": age}} for i, name, age in records(messages)]
+        return completion(items, finish_reason="length", completion_tokens=10 * len(items))
+
+    extractor = BatchExtractor(complete, Person, "Extract.", output_tokens_per_record=10, max_attempts=1)
+    extractor.extract(TEXTS)
+    assert extractor.stats.truncated == 1
+    assert extractor._out_per_record == 15.0
+    assert extractor.stats.prompt_tokens == 100 and extractor.stats.completion_tokens == 40
+
+
+def test_index_echoed_before_the_array_is_not_the_answer():
+    def complete(messages):
+        items = [{"index": i, "data": {"name": name, "age": age}} for i, name, age in records(messages)]
+        text = "Record [0] is first, see [1): " + json.dumps(items)
+        message = SimpleNamespace(content=text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+    extractor = BatchExtractor(complete, Person, "Extract.")
+    results = extractor.extract(TEXTS)
+    assert [r.value.name for r in results] == [f"Person{i}" for i in range(4)]
+    assert extractor.stats.resubmitted == 0 and extractor.stats.requests == 1
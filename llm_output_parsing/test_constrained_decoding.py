@@ -0,0 +1,154 @@
+import random
+from enum import Enum
+from typing import Dict, List, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from constrained_decoding import GrammarIndex, JsonGrammar, TokenConstraint, Vocabulary, get_grammar, get_index
+
+
+class Category(str, Enum):
+    violence = "violence"
+    self_harm = "self_harm"
+
+
+class Verdict(BaseModel):
+    is_violating: bool
+    category: Optional[Category]
+    score: float
+
+
+class Tagged(BaseModel):
+    name: str = Field(min_length=2, max_length=4)
+    tags: List[int] = Field(min_length=1, max_length=2)
+
+
+class Profile(BaseModel):
+    name: str
+    social_accounts: Dict[str, str]
+
+
+# every printable character, some merged pieces, and the end-of-sequence token last
+TOY_TOKENS = [chr(c) for c in range(32, 127)] + ["true", "false", "null", '{"', '":', '","', "violence", "Hello"]
+EOS = len(TOY_TOKENS)
+
+
+@pytest.fixture(scope="module")
+def vocab():
+    return Vocabulary(TOY_TOKENS + ["</s>"], eos_ids=[EOS])
+
+
+def token_id(text: str) -> int:
+    return TOY_TOKENS.index(text)
+
+
+@pytest.mark.parametrize("text, ok", [
+    ('{"is_violating":true,"category":"violence","score":0.5}', True),
+    ('{"is_violating":false,"category":null,"score":-1e3}', True),
+    ('{"is_violating":false,"category":null,"score":01}', False),          # leading zero
+    ('{"is_violating":true,"category":"sexual","score":1}', False),       # not in the enum
+    ('{"category":null,"is_violating":true,"score":1}', False),           # properties out of order
+    ('{"is_violating": true,"category":null,"score":1}', False),          # whitespace
+    ('{"is_violating":true,"category":null', False),                      # incomplete
+])
+def test_grammar_matches(text, ok):
+    assert get_grammar(Verdict).matches(text) is ok
+
+
+@pytest.mark.parametrize("text, ok", [
+    ('{"name":"ab","tags":[1]}', True),
+    ('{"name":"abcd","tags":[1,2]}', True),
+    ('{"name":"a\\"","tags":[1]}', True),       # an escape is one character
+    ('{"name":"a","tags":[1]}', False),         # minLength
+    ('{"name":"abcde","tags":[1]}', False),     # maxLength
+    ('{"name":"ab","tags":[]}', False),         # minItems
+    ('{"name":"ab","tags":[1,2,3]}', False),    # maxItems
+])
+def test_length_and_item_bounds(text, ok):
+    assert get_grammar(Tagged).matches(text) is ok
+
+
+@pytest.mark.parametrize("text, ok", [
+    ('{"name":"a","social_accounts":{}}', True),
+    ('{"name":"a","social_accounts":{"x":"y"}}', True),
+    ('{"name":"a","social_accounts":{"bluesky":"ram","x\\n":""}}', True),
+    ('{"name":"a","social_accounts":{"x":1}}', False),           # values are strings
+    ('{"name":"a","social_accounts":{"x":"y",}}', False),        # trailing comma
+])
+def test_dict_field(text, ok):
+    assert get_grammar(Profile).matches(text) is ok
+
+
+def test_unbounded_string_keeps_states_finite():
+    grammar = JsonGrammar({"type": "string"})
+    state = grammar.consume(grammar.initial, '"ab')
+    assert grammar.consume(state, "c" * 50) == state
+
+
+def test_allowed_tokens_at_start_and_end(vocab):
+    index = get_index(Verdict, vocab)
+    first = {vocab.tokens[t] for t in index.allowed(index.grammar.initial)}
+    assert first == {"{", '{"'}
+    state = index.grammar.consume(index.grammar.initial, '{"is_violating":true,"category":null,"score":1')
+    allowed = index.allowed(state)
+    assert EOS not in allowed                               # the object is still open
+    assert {token_id("0"), token_id("."), token_id("}")} <= set(allowed)
+    assert token_id('"') not in allowed
+    assert index.allowed(state) is allowed                  # cached per state
+    state = index.grammar.consume(state, "}")
+    assert index.allowed(state) == [EOS]
+
+
+def test_allowed_respects_max_length(vocab):
+    index = GrammarIndex(get_grammar(Tagged), vocab)
+    state = index.grammar.consume(index.grammar.initial, '{"name":"abcd')
+    assert {vocab.tokens[t] for t in index.allowed(state)} == {'"', '","'}
+    state = index.grammar.consume(index.grammar.initial, '{"name":"a')
+    assert token_id('"') not in index.allowed(state)       # minLength not reached yet
+
+
+def test_constraint_advance_and_complete(vocab):
+    constraint = TokenConstraint(get_index(Verdict, vocab))
+    with pytest.raises(ValueError):
+        constraint.advance(token_id("Hello"))
+    for piece in ['{"', "is_violating", '":', "true", ",", '"', "category", '":', "null", ",", '"', "score", '":',
+                  "7"]:
+        ids = [token_id(piece)] if piece in TOY_TOKENS else [token_id(ch) for ch in piece]
+        for t in ids:
+            constraint.advance(t)
+    assert constraint.is_complete is False                  # the object is still open
+    with pytest.raises(ValueError):
+        constraint.advance(EOS)
+    constraint.advance(token_id("}"))
+    assert constraint.is_complete
+    constraint.advance(EOS)
+    assert constraint.finished and constraint.allowed_token_ids() == [EOS]
+    assert Verdict.model_validate_json("".join(constraint.text)).score == 7
+
+
+@pytest.mark.parametrize("model", [Verdict, Tagged, Profile])
+def test_random_sampling_only_produces_valid_instances(vocab, model):
+    index = get_index(model, vocab)
+    rng = random.Random(0)
+    finished = 0
+    for _ in range(20):
+        constraint = TokenConstraint(index)
+        for _ in range(300):
+            allowed = constraint.allowed_token_ids()
+            assert allowed
+            # lean towards closing strings and containers so most samples end
+            closing = [t for t in allowed if t == EOS or vocab.tokens[t] in ('"', "}", "]")]
+            constraint.advance(rng.choice(closing) if closing and rng.random() < 0.3 else rng.choice(allowed))
+            if constraint.finished:
+                break
+        if constraint.finished:
+            finished += 1
+            model.model_validate_json("".join(constraint.text))
+    assert finished
+
+
+def test_index_cache_is_per_vocabulary_object(vocab):
+    other = Vocabulary(TOY_TOKENS + ["</s>"], eos_ids=[EOS])
+    assert get_index(Verdict, vocab) is get_index(Verdict, vocab)
+    assert get_index(Verdict, other) is not get_index(Verdict, vocab)
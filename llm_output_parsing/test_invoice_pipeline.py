@@ -0,0 +1,61 @@
+import json
+
+from invoice_models import LineItem
+from invoice_pipeline import InvoiceChunk, InvoicePipeline, merge_chunks
+from pdf_cache import PdfCache
+
+
+def item(description, price):
+    return LineItem(Description=description, price=price)
+
+
+def test_merge_keeps_repeated_items_and_drops_chunk_overlap():
+    ride = item("Transportation service fare", 165.0)
+    toll = item("Toll", 20.0)
+    chunks = [
+        InvoiceChunk(invoice_id="INV-1", line_items=[ride, ride, toll]),
+        InvoiceChunk(date="12 Aug 2025", line_items=[item("  toll ", 20.0), ride]),   # toll cut by the boundary
+        InvoiceChunk(line_items=[toll]),
+    ]
+    invoice = merge_chunks(chunks)
+    assert (invoice.invoice_id, invoice.date) == ("INV-1", "12 Aug 2025")
+    assert [(i.Description, i.price) for i in invoice.line_items] == [
+        ("Transportation service fare", 165.0), ("Transportation service fare", 165.0), ("Toll", 20.0),
+        ("Transportation service fare", 165.0), ("Toll", 20.0)]
+
+
+def test_unreadable_documents_are_reported_not_raised(tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    pipeline = InvoicePipeline(lambda messages: "{}", read_workers=1)
+    invoices = pipeline.run([str(tmp_path / "missing.pdf"), str(broken)])
+    assert invoices == {}
+    assert set(pipeline.errors) == {str(tmp_path / "missing.pdf"), str(broken)}
+    assert pipeline.stats.failed_documents == 2
+
+
+def test_empty_document_gets_an_empty_invoice(tmp_path):
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"%PDF-1.4 no pages")
+    cache = PdfCache(str(tmp_path / "cache.sqlite"))
+    cache.put_pages(cache.file_hash(str(empty)), [])
+    answer = json.dumps({"invoice_id": None, "date": None, "line_items": []})
+    pipeline = InvoicePipeline(lambda messages: answer, read_workers=1, cache=cache, model="stub")
+    invoices = pipeline.run([str(empty), str(tmp_path / "missing.pdf")])
+    assert invoices[str(empty)].line_items == []
+    assert list(pipeline.errors) == [str(tmp_path / "missing.pdf")]
+
+
+def no_pages(path):
+    return 0
+
+
+def test_zero_page_document_read_from_disk(tmp_path, monkeypatch):
+    import invoice_pipeline
+    monkeypatch.setattr(invoice_pipeline, "page_count", no_pages)
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"%PDF-1.4 no pages")
+    pipeline = InvoicePipeline(lambda messages: "{}", read_workers=1)
+    invoices = pipeline.run([str(empty)])
+    assert invoices[str(empty)].model_dump() == {"invoice_id": "", "date": "", "line_items": []}
+    assert pipeline.errors == {}
@@ -0,0 +1,47 @@
+import pytest
+
+from json_extractor import JsonExtractor, extract_json, iter_json
+
+
+@pytest.mark.parametrize("text, values", [
+    ('{"a": 1}', [{"a": 1}]),
+    ('<think>maybe {"draft": true}</think>\n```json\n{"a": 1}\n```', [{"a": 1}]),
+    ('first {"a": 1} then [2, 3] and {"b": "}"}', [{"a": 1}, [2, 3], {"b": "}"}]),
+    ('{"s": "a \\" [ { quote"}', [{"s": 'a " [ { quote'}]),
+    ('set {a, b} then {"a": 1}', [{"a": 1}]),                      # braces that are not JSON
+    ('mismatched [1} then {"a": 1}', [{"a": 1}]),
+    ('no json here', []),
+])
+def test_iter_json(text, values):
+    assert list(iter_json(text)) == values
+
+
+@pytest.mark.parametrize("text, values", [
+    ('Use a list [ like this. Result: {"name": "x"}', [{"name": "x"}]),
+    ('Note (see [1): {"name": "x", "age": 3}', [{"name": "x", "age": 3}]),
+    ('[ [ {"a": [1]} and then {"b": 2', [{"a": [1]}]),
+])
+def test_unclosed_prose_bracket_is_rescanned_at_the_end(text, values):
+    assert list(iter_json(text)) == values
+
+
+def test_think_blocks_can_be_kept():
+    assert list(iter_json('<think>{"draft": 1}</think>{"a": 2}', skip_think=False)) == [{"draft": 1}, {"a": 2}]
+
+
+def test_streamed_chunks_match_whole_text():
+    text = '<think>plan {"x": [</think> Answer (see [1): {"name": "x\\"y", "tags": [1, 2]} and [3]'
+    for size in (1, 2, 5, 13):
+        extractor = JsonExtractor()
+        found = []
+        for i in range(0, len(text), size):
+            found.extend(extractor.feed(text[i:i + size]))
+        found.extend(extractor.close())
+        assert found == list(iter_json(text)) == [{"name": 'x"y', "tags": [1, 2]}, [3]]
+        assert extractor.values == found
+
+
+def test_extract_json():
+    assert extract_json('x {"a": 1} {"b": 2}') == {"a": 1}
+    with pytest.raises(ValueError):
+        extract_json("nothing")
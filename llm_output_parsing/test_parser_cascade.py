@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from parser_cascade import ParseError, ParserCascade, fence_body, repair_json
+
+
+@pytest.mark.parametrize("text, value", [
+    ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}),                              # trailing commas
+    ("{'name': 'Ram', 'quote': 'it\\'s \"fine\"'}", {"name": "Ram", "quote": "it's \"fine\""}),
+    ("{'ok': True, 'missing': None, 'no': False}", {"ok": True, "missing": None, "no": False}),
+    ('{name: "Ram", age: 26}', {"name": "Ram", "age": 26}),                          # bare keys
+    ('<think>{draft}</think>Sure: ```json\n{"a": 1,}\n```', {"a": 1}),
+])
+def test_repair_json(text, value):
+    assert json.loads(repair_json(text)) == value
+
+
+@pytest.mark.parametrize("text, value", [
+    ('{"name": "Ram", "social": {"bluesky": "ramk', {"name": "Ram", "social": {"bluesky": "ramk"}}),
+    ('{"items": [1, 2.', {"items": [1, 2]}),
+    ('{"items": [1, -', {"items": [1, None]}),
+    ('{"name": "Ram", "age":', {"name": "Ram", "age": None}),
+    ('{"name": "Ram", "age"', {"name": "Ram", "age": None}),
+    ('{"name": "Ram", ', {"name": "Ram"}),
+    ('["a\\', ["a"]),
+])
+def test_repair_closes_truncated_output(text, value):
+    assert json.loads(repair_json(text)) == value
+
+
+def test_repair_without_brackets_fails():
+    with pytest.raises(ValueError):
+        repair_json("no json here")
+
+
+def test_fence_body():
+    assert fence_body('x\n```json\n{"a": 1}\n```\ny') == '{"a": 1}\n'
+    assert fence_body('```\n[1]') == "[1]"
+    assert fence_body("no fence") is None
+
+
+@pytest.mark.parametrize("text, tier", [
+    ('  {"name": "x"}  ', "direct"),
+    ('Sure!\n```json\n{"name": "x"}\n```', "fence"),
+    ('<think>{draft}</think> The answer is {"name": "x"}. Hope this helps', "scan"),
+    ('Use a list [ like this. Result: {"name": "x"}', "scan"),                    # unclosed prose bracket
+    ('Note (see [1): {"name": "x", "age": 3}', "scan"),
+    ("{'name': 'x',}", "repair"),
+    ('{"name": "x", "age": 3', "repair"),
+])
+def test_tier_that_succeeds_is_counted(text, tier):
+    parser = ParserCascade(use_orjson=False)
+    assert parser.parse(text)["name"] == "x"
+    assert parser.last_tier == tier
+    assert [name for name, stats in parser.stats.tiers.items() if stats.successes] == [tier]
+    assert parser.stats.by_model["unknown"] == {tier: 1}
+    # tiers before the winning one were tried, later ones were not
+    attempted = [name for name, stats in parser.stats.tiers.items() if stats.attempts]
+    assert attempted[-1] == tier
+
+
+def test_validation_moves_on_to_later_candidates():
+    def validate(value):
+        if "name" not in value:
+            raise ValueError("name is required")
+        return value["name"]
+
+    parser = ParserCascade()
+    assert parser.parse('first {"other": 1} then {"name": "x"}', validate=validate, model="m") == "x"
+    assert parser.stats.by_model["m"] == {"scan": 1}
+
+
+def test_parse_error_carries_the_last_decoded_value():
+    def validate(value):
+        raise ValueError("never valid")
+
+    parser = ParserCascade()
+    with pytest.raises(ParseError) as info:
+        parser.parse('{"a": 1}', validate=validate, model="m")
+    assert info.value.decoded and info.value.value == {"a": 1}
+    assert parser.last_tier is None
+    assert parser.stats.failures == 1 and parser.stats.by_model["m"] == {"failed": 1}
+
+    with pytest.raises(ParseError) as info:
+        parser.parse("no json here")
+    assert not info.value.decoded
+    assert "tier" in str(parser.stats)
@@ -0,0 +1,94 @@
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from partial_json import StreamingJsonParser, StreamingModelParser
+
+
+class Item(BaseModel):
+    name: str
+    price: float
+
+
+class Order(BaseModel):
+    customer: str
+    items: List[Item]
+
+
+ORDER = '{"customer": "ACME", "items": [{"name": "bolt", "price": 0.5}, {"name": "nut", "price": 0.25}]}'
+
+
+def feed_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_events_as_values_close(size):
+    parser = StreamingModelParser(Order)
+    events = feed_chunks(parser, ORDER, size)
+    assert [(e.field, e.index) for e in events] == [("customer", None), ("items", 0), ("items", 1), ("items", None)]
+    assert parser.close().items[1].name == "nut"
+
+
+@pytest.mark.parametrize("preamble", [
+    "Sure! Fill in {name} and [price] below.\n```json\n",
+    "<think>the shape is {customer, items}; maybe [a, b]?</think>\n",
+    "Reply as {\"customer\": str, items: [...]}:\n",
+])
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_brackets_in_preamble_are_skipped(preamble, size):
+    parser = StreamingJsonParser()
+    feed_chunks(parser, preamble + ORDER + "\n```", size)
+    assert parser.close()["items"][0] == {"name": "bolt", "price": 0.5}
+
+
+def test_errors_after_the_root_started_still_raise():
+    parser = StreamingJsonParser()
+    parser.feed('{"customer": "ACME", "items": [')
+    with pytest.raises(ValueError):
+        parser.feed("oops]}")
+
+
+def test_incomplete_stream_raises_on_close():
+    parser = StreamingJsonParser()
+    parser.feed('{"customer": "ACME", "items": [{"name": "bo')
+    assert parser.partial == {"customer": "ACME", "items": [{}]}
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_error_before_the_first_returned_event_is_prose(size):
+    parser = StreamingJsonParser()
+    feed_chunks(parser, 'Note (see [1): {"a": 1}', size)
+    assert parser.close() == {"a": 1}
+
+
+@pytest.mark.parametrize("preamble", [
+    "Per step [1], the answer: ",
+    "Note (see [1): ",
+    "Options are [] or [\"a\", \"b\"]. ",
+    "Use a list [ like this. ",
+])
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_model_parser_skips_valid_json_of_the_wrong_shape(preamble, size):
+    parser = StreamingModelParser(Order)
+    events = feed_chunks(parser, preamble + ORDER, size)
+    assert [(e.field, e.index) for e in events][0] == ("customer", None)
+    assert parser.close().customer == "ACME"
+
+
+def test_accept_sees_the_first_event_of_each_candidate():
+    seen = []
+
+    def accept(event):
+        seen.append(event)
+        return event.value != 1
+
+    parser = StreamingJsonParser(accept=accept)
+    parser.feed('[1] then ["a", 2]')
+    assert parser.close() == ["a", 2] and [e.value for e in seen] == [1, "a"]
@@ -0,0 +1,94 @@
+import json
+from typing import List
+
+import pytest
+from pydantic import BaseModel, ValidationError, field_validator
+
+from repair import ROOT, PatchError, Repairer, apply_patch, failing_paths
+
+
+class Item(BaseModel):
+    name: str
+    qty: int
+
+
+class Order(BaseModel):
+    email: str
+    items: List[Item]
+
+    @field_validator("email")
+    @classmethod
+    def has_at(cls, value):
+        if "@" not in value:
+            raise ValueError("not an email")
+        return value
+
+
+class Scripted:
+    """complete(messages) that answers with the next scripted reply and keeps the prompts."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def __call__(self, messages):
+        self.prompts.append(messages[-1]["content"])
+        return self.replies.pop(0)
+
+
+@pytest.mark.parametrize("data, patch, result", [
+    ({"a": 1}, {"b.c": 2}, {"a": 1, "b": {"c": 2}}),
+    ({"items": [{"qty": 1}]}, {"items.0.qty": 2}, {"items": [{"qty": 2}]}),
+    ({"items": [1]}, {"items.1": 2}, {"items": [1, 2]}),                 # one past the end appends
+    ({}, {"items.0": 1}, {"items": [1]}),
+    ({"a": 1}, {ROOT: {"b": 2}}, {"a": 1, "b": 2}),
+    ({"a": 1}, {ROOT: [1]}, [1]),
+])
+def test_apply_patch(data, patch, result):
+    assert apply_patch(data, patch) == result
+
+
+@pytest.mark.parametrize("data, patch", [
+    ({"name": "Ram"}, {"name.first": "R"}),          # path goes through a string
+    ({"items": [1]}, {"items.foo": 2}),              # non-numeric list index
+    ({"items": []}, {"items.3.x": 2}),               # index past the end
+    ({"items": []}, {"items.3": 2}),
+    ({"items": [1]}, {"items.-1": 2}),
+])
+def test_apply_patch_rejects_unusable_paths(data, patch):
+    with pytest.raises(PatchError):
+        apply_patch(data, patch)
+
+
+def test_failing_paths():
+    with pytest.raises(ValidationError) as info:
+        Order.model_validate({"email": "x", "items": [{"name": "a", "qty": "many"}]})
+    assert [path for path, _ in failing_paths(info.value)] == ["email", "items.0.qty"]
+
+
+def test_repair_sends_only_the_failing_fields():
+    complete = Scripted('{"email": "ram@example.com", "items.0.qty": 2}')
+    repairer = Repairer(complete, Order)
+    order = repairer.validate({"email": "ram", "items": [{"name": "apple", "qty": "two"}]})
+    assert order.email == "ram@example.com" and order.items[0].qty == 2
+    assert '"email": "ram"' in complete.prompts[0] and "apple" not in complete.prompts[0]
+    assert (repairer.stats.repair_calls, repairer.stats.repaired, repairer.stats.failed) == (1, 1, 0)
+
+
+def test_malformed_patch_is_a_failed_round():
+    complete = Scripted('{"email.first": "ram@example.com"}', '{"email": "ram@example.com"}')
+    repairer = Repairer(complete, Order)
+    data = {"email": "ram", "items": []}
+    order = repairer.validate(data)
+    assert order.email == "ram@example.com"
+    assert complete.prompts[0] == complete.prompts[1]      # the same errors went back to the model
+    assert repairer.stats.rejected_patches == 1 and repairer.stats.repair_calls == 2
+    assert data == {"email": "ram", "items": []}
+
+
+def test_gives_up_after_max_rounds():
+    complete = Scripted('{"items.3.x": 2}', "not json")
+    repairer = Repairer(complete, Order, max_rounds=2)
+    with pytest.raises(ValidationError):
+        repairer.validate(json.dumps({"email": "ram", "items": []}))
+    assert repairer.stats.failed == 1 and repairer.stats.repair_calls == 2
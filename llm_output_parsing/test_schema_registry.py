@@ -0,0 +1,84 @@
+import json
+import threading
+from typing import Dict
+
+import pytest
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from schema_registry import get_schema
+
+
+class User(BaseModel):
+    name: str
+    age: int = Field(ge=0)
+    social_accounts: Dict[str, str] = {}
+
+    @field_validator("name")
+    @classmethod
+    def capitalised(cls, value):
+        if not value[:1].isupper():
+            raise ValueError("name must be capitalised")
+        return value
+
+
+def test_compiled_once_per_class():
+    schema = get_schema(User)
+    assert get_schema(User) is schema
+    assert schema.format_instructions is schema.format_instructions
+    assert schema.list_adapter is schema.list_adapter
+
+    class Other(BaseModel):
+        name: str
+
+    assert get_schema(Other) is not schema
+
+
+def test_concurrent_first_use_builds_one():
+    class Fresh(BaseModel):
+        value: int
+
+    schemas = []
+    threads = [threading.Thread(target=lambda: schemas.append(get_schema(Fresh))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(schema is schemas[0] for schema in schemas)
+
+
+def test_schema_text_and_response_format():
+    schema = get_schema(User)
+    assert json.loads(schema.schema_text) == User.model_json_schema()
+    assert schema.schema_text == json.dumps(User.model_json_schema(), separators=(",", ":"))
+    assert schema.response_format["json_schema"] == {"name": "User", "schema": User.model_json_schema()}
+    assert '"social_accounts"' in schema.format_instructions and '"title": "User"' not in schema.format_instructions
+    assert len(schema.version) == 12
+
+
+@pytest.mark.parametrize("data", [
+    {"name": "Ram", "age": 26, "social_accounts": {"bluesky": "ramkumar"}},
+    {"name": "Ram", "age": "26"},                     # lax mode coerces, like model_validate
+    {"name": "ram", "age": 26},                       # field validator
+    {"name": "Ram", "age": -1},                       # constraint
+    {"name": "Ram"},                                  # missing field
+    {"name": "Ram", "age": 26, "social_accounts": {"x": 1}},
+])
+def test_validation_matches_model_validate(data):
+    schema = get_schema(User)
+    try:
+        expected = User.model_validate(data)
+    except ValidationError as error:
+        for validate, value in ((schema.validate_python, data), (schema.validate_json, json.dumps(data))):
+            with pytest.raises(ValidationError) as info:
+                validate(value)
+            assert [e["loc"] for e in info.value.errors()] == [e["loc"] for e in error.errors()]
+    else:
+        assert schema.validate_python(data) == expected
+        assert schema.validate_json(json.dumps(data)) == User.model_validate_json(json.dumps(data))
+
+
+def test_list_adapter():
+    users = get_schema(User).list_adapter.validate_python([{"name": "A", "age": 1}, {"name": "B", "age": 2}])
+    assert [u.name for u in users] == ["A", "B"]
+    with pytest.raises(ValidationError):
+        get_schema(User).list_adapter.validate_python([{"name": "a", "age": 1}])
@@ -0,0 +1,53 @@
+from typing import List
+
+import pytest
+import yaml
+from pydantic import BaseModel
+
+from stream_markup import StreamingXmlParser, StreamingYamlParser
+
+
+class Film(BaseModel):
+    name: str
+    genre: str
+
+
+class Filmography(BaseModel):
+    actor: str
+    films: List[Film]
+
+
+FILMS = [{"name": "Forrest Gump", "genre": "Drama"}, {"name": "Cast Away", "genre": "Adventure/Drama"}]
+
+
+def feed(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_xml_items_as_they_close(size):
+    text = "Here you go:\n```xml\n<movies><actor>Tom Hanks</actor>" + "".join(
+        f"<film><name>{f['name']}</name><genre>{f['genre']}</genre></film>" for f in FILMS) + "</movies>\n```"
+    events = feed(StreamingXmlParser(item_tags=("film",), model=Film), text, size)
+    assert [(e.tag, e.index, e.value) for e in events] == [("film", i, Film(**f)) for i, f in enumerate(FILMS)]
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_yaml_top_level_list(size):
+    text = "```yaml\n" + yaml.safe_dump(FILMS, sort_keys=False) + "```"
+    events = feed(StreamingYamlParser(model=Film), text, size)
+    assert [e.value for e in events] == [Film(**f) for f in FILMS]
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+def test_yaml_indentless_sequence_under_a_key(size):
+    # yaml.safe_dump writes "films:\n- name: ..." with the dashes at column 0
+    document = {"actor": "Tom Hanks", "films": FILMS}
+    text = yaml.safe_dump(document, sort_keys=False)
+    assert "\n- name" in text
+    events = feed(StreamingYamlParser(model=Filmography), text, size)
+    assert [(e.tag, e.value) for e in events[:-1]] == [("actor", "Tom Hanks"), ("films", FILMS)]
+    assert events[-1].value == Filmography(**document)
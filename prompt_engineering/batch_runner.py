@@ -0,0 +1,107 @@
+"""
+Async batch runner for chat completions.
+
+Runs a list of prompts concurrently against any OpenAI-compatible endpoint
+(Groq, Gemini's OpenAI endpoint, a local vLLM server) with a bound on requests
+in flight and a per-request timeout.  Results come back in input order, and a
+prompt set takes about as long as its slowest call instead of the sum of all.
+With a rate_limiter.RateLimiter each prompt also waits for request and token
+quota before it is sent, and the limiter learns from the response headers.
+
+    results = asyncio.run(run_batch(client, [prompt_1, prompt_2], model="openai/gpt-oss-20b"))
+    results = asyncio.run(run_batch(client, prompts, limiter=RateLimiter(30, 6000), model="qwen/qwen3-32b"))
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Union
+
+
+@dataclass
+class BatchResult:
+    index: int
+    response: Any = None
+    error: Optional[BaseException] = None
+    latency: float = 0.0
+    queue_wait: float = 0.0     # seconds waiting for the rate limiter, not part of latency
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def content(self) -> Optional[str]:
+        if self.response is None:
+            return None
+        return self.response.choices[0].message.content
+
+
+def _messages(prompt: Union[str, Sequence[dict]]) -> List[dict]:
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return list(prompt)
+
+
+def _error_headers(error: BaseException) -> Optional[Any]:
+    """Response headers of an SDK error (openai / groq APIStatusError), if it has any."""
+    return getattr(getattr(error, "response", None), "headers", None)
+
+
+async def run_batch(client, prompts: Sequence[Union[str, Sequence[dict]]], max_concurrency: int = 8,
+                    timeout: Optional[float] = 60.0, limiter=None, priority: int = 0,
+                    **settings) -> List[BatchResult]:
+    """
+    Send every prompt (a string or a messages list) with the same model settings.
+
+    `client` is an openai.AsyncOpenAI / groq.AsyncGroq, or anything with an
+    awaitable chat.completions.create.
+    `limiter` (a rate_limiter.RateLimiter) admits each prompt at `priority`;
+    responses are read through with_raw_response when the client has it, so
+    the limiter sees the x-ratelimit-* headers (build the client with
+    max_retries=0, or its own retries hide the 429s from the limiter).
+    Failures and timeouts are returned as BatchResult.error, not raised.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    raw = getattr(client.chat.completions, "with_raw_response", None) if limiter is not None else None
+    max_tokens = settings.get("max_completion_tokens") or settings.get("max_tokens")
+
+    async def call(messages):
+        if raw is None:
+            return await client.chat.completions.create(messages=messages, **settings), None
+        response = await raw.create(messages=messages, **settings)
+        return response.parse(), response.headers
+
+    async def one(index, prompt):
+        messages = _messages(prompt)
+        permit, queue_wait = None, 0.0
+        if limiter is not None:
+            # wait for quota before taking a slot, so the limiter's priority order decides who goes next
+            try:
+                permit = await limiter.aacquire(messages, max_tokens=max_tokens, priority=priority)
+            except Exception as e:
+                return BatchResult(index, error=e)
+            queue_wait = permit.waited
+        response = headers = error = None
+        try:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response, headers = await asyncio.wait_for(call(messages), timeout)
+                except Exception as e:
+                    error = e
+                latency = time.perf_counter() - start
+        finally:
+            # also when the task is cancelled, or the permit would count as in flight for good
+            if permit is not None and error is not None:
+                rate_limited = getattr(error, "status_code", None) == 429
+                limiter.complete(permit, headers=_error_headers(error), rate_limited=rate_limited)
+            elif permit is not None:
+                limiter.complete(permit, response, headers)
+        return BatchResult(index, response=response, error=error, latency=latency, queue_wait=queue_wait)
+
+    return list(await asyncio.gather(*(one(i, p) for i, p in enumerate(prompts))))
+
+
+def run_batch_sync(client, prompts, **kwargs) -> List[BatchResult]:
+    """run_batch for plain scripts that are not already inside an event loop."""
+    return asyncio.run(run_batch(client, prompts, **kwargs))
@@ -0,0 +1,49 @@
+"""
+Sequential calls vs run_batch against a local fake OpenAI-compatible server.
+
+Every request sleeps for a fixed per-prompt latency on the server, so the
+sequential loop takes the sum of the latencies and the batch runner about the
+slowest one.
+
+    python bench_batch_runner.py
+"""
+import asyncio
+import time
+
+from openai import AsyncOpenAI, OpenAI
+
+from batch_runner import run_batch
+from fake_openai_server import FakeOpenAIServer, FakeReply, FakeServerConfig
+from pe_v1 import PROMPTS
+
+LATENCIES = [0.20, 0.35, 0.15, 0.50, 0.25, 0.30, 0.40]
+
+
+def latency(rng, request):
+    return LATENCIES[PROMPTS.index(request["messages"][-1]["content"]) % len(LATENCIES)]
+
+
+def echo(request):
+    return FakeReply(content=request["messages"][-1]["content"][:20])
+
+
+if __name__ == "__main__":
+    server = FakeOpenAIServer(FakeServerConfig(latency=latency, responder=echo)).start()
+    base_url = server.base_url
+
+    client = OpenAI(api_key="EMPTY", base_url=base_url)
+    start = time.perf_counter()
+    for prompt in PROMPTS:
+        client.chat.completions.create(model="fake", messages=[{"role": "user", "content": prompt}])
+    sequential = time.perf_counter() - start
+
+    aclient = AsyncOpenAI(api_key="EMPTY", base_url=base_url)
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(aclient, PROMPTS, max_concurrency=8, model="fake"))
+    batched = time.perf_counter() - start
+    assert all(r.ok for r in results), [r.error for r in results if not r.ok]
+    assert [r.content for r in results] == [p[:20] for p in PROMPTS]
+
+    print(f"sum of latencies {sum(LATENCIES):.2f}s, slowest {max(LATENCIES):.2f}s")
+    print(f"sequential {sequential:.2f}s | run_batch {batched:.2f}s | speedup {sequential / batched:.1f}x")
+    server.stop()
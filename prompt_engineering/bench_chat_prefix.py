@@ -0,0 +1,64 @@
+"""
+Tokenizer CPU time per turn: full apply_chat_template + encode every turn vs
+IncrementalChatPrompt, with a ChatML toy tokenizer (no model download needed).
+
+    python bench_chat_prefix.py
+"""
+import re
+import time
+
+from chat_prefix import IncrementalChatPrompt
+
+TURNS = 300
+
+
+class ToyChatMLTokenizer:
+    """Just enough of the HF tokenizer API: a ChatML template and a regex word tokenizer."""
+    _pieces = re.compile(r"<\|im_start\|>|<\|im_end\|>|\w+|[^\w\s]|\s+")
+
+    def __init__(self):
+        self.vocab = {}
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=False):
+        text = "".join(f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages)
+        if add_generation_prompt:
+            text += "<|im_start|>assistant\n"
+        return text if not tokenize else self.encode(text)
+
+    def encode(self, text, add_special_tokens=True):
+        return [self.vocab.setdefault(piece, len(self.vocab)) for piece in self._pieces.findall(text)]
+
+
+def full_render(tokenizer, messages):
+    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    return tokenizer.encode(text)
+
+
+if __name__ == "__main__":
+    tokenizer = ToyChatMLTokenizer()
+    prompt = IncrementalChatPrompt(tokenizer)
+    assert prompt.incremental
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    full_times, incremental_times, shared_tokens = [], [], []
+
+    for turn in range(1, TURNS + 1):
+        messages.append({"role": "user", "content": f"Turn {turn}: how many 'r's are in strawberries? " * 3})
+
+        start = time.perf_counter()
+        expected = full_render(tokenizer, messages)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        ids, shared = prompt.render(messages)
+        incremental_times.append(time.perf_counter() - start)
+        assert ids == expected
+        shared_tokens.append(shared)
+
+        messages.append({"role": "assistant", "content": f"There are 3 'r's in strawberries (turn {turn}). " * 4})
+
+    print(f"{'turn':>5} | {'full us':>9} | {'incremental us':>14} | {'shared prefix':>13}")
+    for turn in (1, 10, 50, 100, 200, TURNS):
+        i = turn - 1
+        print(f"{turn:>5} | {full_times[i] * 1e6:>9.0f} | {incremental_times[i] * 1e6:>14.0f} | {shared_tokens[i]:>13}")
+    print(f"messages rendered: incremental {prompt.rendered_messages}, "
+          f"full {sum(range(2, 2 * TURNS + 1, 2))}")
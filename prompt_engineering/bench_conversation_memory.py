@@ -0,0 +1,51 @@
+"""
+Per-turn prompt size over a long conversation: full history replay (the old
+QwenChatbot behaviour) vs ConversationMemory with a token budget.
+
+    python bench_conversation_memory.py
+"""
+import time
+
+from conversation_memory import ConversationMemory, make_token_counter
+
+TURNS = 150
+BUDGET = 2048
+
+
+def user_message(turn):
+    return f"Question {turn}: how many 'r's are in strawberries, blueberries and raspberries? " * 2
+
+
+def assistant_message(turn):
+    thinking = "<think>\n" + "Let me count the letters one by one. " * 30 + "\n</think>\n\n"
+    return thinking + f"Answer {turn}: strawberries has 3, blueberries has 2 and raspberries has 3."
+
+
+def summarize(summary, evicted):
+    # stand-in for an LLM call: keep only the last few answers
+    answers = [m["content"].split(":")[0] for m in evicted if m["role"] == "assistant"]
+    return (summary + " " + ", ".join(answers)).strip()[-400:]
+
+
+if __name__ == "__main__":
+    count_tokens = make_token_counter()
+    memory = ConversationMemory(count_tokens, token_budget=BUDGET,
+                                system_prompt="You are a helpful assistant.", summarizer=summarize)
+    history = []
+    full_sizes, bounded_sizes = [], []
+
+    start = time.perf_counter()
+    for turn in range(1, TURNS + 1):
+        history.append({"role": "user", "content": user_message(turn)})
+        memory.add("user", user_message(turn))
+        full_sizes.append(sum(count_tokens(m["content"]) + 4 for m in history))
+        bounded_sizes.append(memory.prompt_tokens)
+        history.append({"role": "assistant", "content": assistant_message(turn)})
+        memory.add("assistant", assistant_message(turn))
+    elapsed = time.perf_counter() - start
+
+    print(f"{'turn':>5} | {'full history':>12} | {'memory':>6}")
+    for turn in (1, 10, 25, 50, 100, TURNS):
+        print(f"{turn:>5} | {full_sizes[turn - 1]:>12} | {bounded_sizes[turn - 1]:>6}")
+    print(f"max prompt tokens with memory: {max(bounded_sizes)} (budget {BUDGET}), "
+          f"evicted {memory.evicted} messages, {elapsed / TURNS * 1e6:.0f} us/turn bookkeeping")
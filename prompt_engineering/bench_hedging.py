@@ -0,0 +1,128 @@
+"""
+Tail latency of streamed calls with and without hedging, on fake backends.
+
+Three fake servers stand in for Groq, Gemini's OpenAI endpoint and vLLM.  The
+time to first token is lognormal (median --median, spread --sigma), and a
+share of calls (--stall-rate) stalls for --stall seconds, like a request
+queued behind a busy replica.  Each server has its own seed, so a call that
+is slow on one is usually not slow on the others.
+
+  primary  every call streamed from the first backend (LLMClient.astream)
+  hedged   Hedger over the three: a backup is sent when the first token is
+           later than the p95 deadline, within a 10% budget
+
+Both runs send the same prompts with the same concurrency to fresh servers,
+so the primary sees the same latency sequence.  The table shows time to
+first token and total time per call; below it are the hedge rate, how often
+the backup won, the first-token time the backups saved (Hedger.stats) and
+how many extra requests the servers saw.
+
+    python bench_hedging.py [--calls 400] [--concurrency 16] [--budget 0.1]
+"""
+import argparse
+import asyncio
+import math
+import time
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig
+from hedging import Hedger
+from llm_client import LLMClient
+
+BACKENDS = ("groq", "gemini", "vllm")
+
+
+def stalling(median: float, sigma: float, stall_rate: float, stall: float):
+    def latency(rng, request):
+        if rng.random() < stall_rate:
+            return stall
+        return rng.lognormvariate(math.log(median), sigma)
+    return latency
+
+
+def percentiles(values):
+    values = sorted(values)
+    return [values[min(len(values) - 1, int(q * len(values)))] for q in (0.5, 0.95, 0.99)]
+
+
+def start_servers(args):
+    return [FakeOpenAIServer(FakeServerConfig(
+        latency=stalling(args.median, args.sigma, args.stall_rate, args.stall),
+        tokens_per_second=args.tps, seed=seed)).start() for seed in range(len(BACKENDS))]
+
+
+def clients(servers):
+    return [LLMClient(name, model="fake", base_url=server.base_url, api_key="EMPTY", max_retries=0)
+            for name, server in zip(BACKENDS, servers)]
+
+
+async def timed(stream):
+    start = time.perf_counter()
+    ttft = None
+    async for chunk in stream:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+
+async def run(calls: int, concurrency: int, open_stream):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await timed(open_stream([{"role": "user", "content": f"question {i}"}]))
+
+    return await asyncio.gather(*(one(i) for i in range(calls)))
+
+
+async def main(args):
+    servers = start_servers(args)
+    primary = clients(servers)[0]
+    baseline = await run(args.calls, args.concurrency, primary.astream)
+    for server in servers:
+        server.stop()
+
+    servers = start_servers(args)
+    hedger = Hedger(clients(servers), percentile=args.percentile, budget=args.budget)
+    hedged = await run(args.calls, args.concurrency, hedger.astream)
+    await hedger.drain()          # losers closed, watched primaries answered
+    sent = [server.stats.requests for server in servers]
+    for server in servers:
+        server.stop()
+    return baseline, hedged, hedger, sent
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hedged vs single-backend streaming tail latency")
+    arg_parser.add_argument("--calls", type=int, default=400)
+    arg_parser.add_argument("--concurrency", type=int, default=16)
+    arg_parser.add_argument("--median", type=float, default=0.08, help="median seconds to first token")
+    arg_parser.add_argument("--sigma", type=float, default=0.5)
+    arg_parser.add_argument("--stall-rate", type=float, default=0.02)
+    arg_parser.add_argument("--stall", type=float, default=1.5, help="seconds a stalled call waits")
+    arg_parser.add_argument("--tps", type=float, default=100.0, help="tokens per second once streaming")
+    arg_parser.add_argument("--percentile", type=float, default=0.95, help="hedge deadline percentile")
+    arg_parser.add_argument("--budget", type=float, default=0.1, help="max share of calls hedged")
+    args = arg_parser.parse_args()
+
+    baseline, hedged, hedger, sent = asyncio.run(main(args))
+    print(f"{args.calls} streamed calls, concurrency {args.concurrency}, first token lognormal("
+          f"{args.median}s, {args.sigma}) with {args.stall_rate:.0%} stalls of {args.stall}s\n")
+    print(f"{'':<8} {'ttft p50':>9} {'p95':>7} {'p99':>7}   {'total p50':>9} {'p95':>7} {'p99':>7}")
+    for name, results in (("primary", baseline), ("hedged", hedged)):
+        ttft = percentiles([r[0] for r in results])
+        total = percentiles([r[1] for r in results])
+        print(f"{name:<8} " + " ".join(f"{v * 1e3:7.0f}ms" for v in ttft) + "  "
+              + " ".join(f"{v * 1e3:7.0f}ms" for v in total))
+    saved = [b - h for b, h in zip(percentiles([r[1] for r in baseline]), percentiles([r[1] for r in hedged]))]
+    stats = hedger.stats()
+    print(f"\nsaved: p50 {saved[0] * 1e3:.0f}ms, p95 {saved[1] * 1e3:.0f}ms, p99 {saved[2] * 1e3:.0f}ms")
+    print(f"hedge rate {stats['hedge_rate']:.1%} (deadline now {stats['deadline_s'] * 1e3:.0f}ms), "
+          f"backup won {stats['backup_wins']}/{stats['hedged']}, budget refusals {stats['budget_denied']}, "
+          f"failovers {stats['failovers']}")
+    print(f"first token saved by hedging: {stats['saved_total_s']:.2f}s in all, "
+          f"{stats['saved_per_hedge_s'] * 1e3:.0f}ms per hedged call, backup wins p50 "
+          f"{stats['saved_p50_s'] * 1e3:.0f}ms / p95 {stats['saved_p95_s'] * 1e3:.0f}ms "
+          f"({stats['saved_lower_bounds']} lower bounds)")
+    print(f"requests per server {dict(zip(BACKENDS, sent))}: "
+          f"{sum(sent) - args.calls} extra ({(sum(sent) - args.calls) / args.calls:.1%}), "
+          f"~{stats['extra_prompt_tokens']} extra prompt tokens")
@@ -0,0 +1,118 @@
+"""
+Cost of InstrumentedClient per call.
+
+  1. in-process: a fake client whose create() returns a prebuilt completion,
+     raw vs instrumented, so the difference is the recording itself (us/call)
+  2. end to end: OpenAI client against a local fake server that answers after
+     LATENCY seconds, raw vs instrumented, as a share of the call time
+  3. the record of one call per client shape (sync, async, sync stream, async
+     stream): each must cover the server latency and carry the token counts
+
+then exports the records to JSONL and prints the Prometheus text.
+
+    python bench_instrumentation.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletion
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig, fixed
+from instrumentation import CallRecorder, InstrumentedClient, JsonlExporter
+
+LATENCY = 0.05
+IN_PROCESS_CALLS = 200_000
+SERVER_CALLS = 40
+
+COMPLETION = {
+    "id": "chatcmpl-fake",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "fake",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15,
+              "completion_tokens_details": {"reasoning_tokens": 2}},
+}
+
+
+def fake_client():
+    response = ChatCompletion.model_validate(COMPLETION)
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: response)))
+
+
+def check_shapes(base_url: str, recorder: CallRecorder):
+    messages = [{"role": "user", "content": "hi"}]
+    stream_options = {"include_usage": True}
+    sync = InstrumentedClient(OpenAI(api_key="EMPTY", base_url=base_url), provider="fake", recorder=recorder)
+    asynchronous = InstrumentedClient(AsyncOpenAI(api_key="EMPTY", base_url=base_url), provider="fake",
+                                      recorder=recorder)
+
+    async def async_calls():
+        await asynchronous.chat.completions.create(model="fake", messages=messages)
+        yield asynchronous.last_record
+        stream = await asynchronous.chat.completions.create(model="fake", messages=messages, stream=True,
+                                                            stream_options=stream_options)
+        async for _ in stream:
+            pass
+        yield asynchronous.last_record
+
+    async def collect():
+        return [rec async for rec in async_calls()]
+
+    sync.chat.completions.create(model="fake", messages=messages)
+    records = {"sync": sync.last_record}
+    for _ in sync.chat.completions.create(model="fake", messages=messages, stream=True, stream_options=stream_options):
+        pass
+    records["sync stream"] = sync.last_record
+    records["async"], records["async stream"] = asyncio.run(collect())
+    for shape, rec in records.items():
+        ttft = f", ttft {rec.ttft_s * 1e3:.1f} ms" if rec.ttft_s is not None else ""
+        print(f"  {shape:<13} latency {rec.latency_s * 1e3:6.1f} ms{ttft}, "
+              f"{rec.prompt_tokens} prompt / {rec.completion_tokens} completion tokens")
+        assert rec.latency_s >= LATENCY and rec.completion_tokens > 0, (shape, rec)
+        assert ("stream" in shape) == (rec.ttft_s is not None), (shape, rec)
+
+
+def time_calls(client, calls: int) -> float:
+    messages = [{"role": "user", "content": "hi"}]
+    start = time.perf_counter()
+    for _ in range(calls):
+        client.chat.completions.create(model="fake", messages=messages)
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == "__main__":
+    recorder = CallRecorder()
+    raw = fake_client()
+    raw_call = time_calls(raw, IN_PROCESS_CALLS)
+    instrumented_call = time_calls(InstrumentedClient(raw, provider="fake", recorder=recorder), IN_PROCESS_CALLS)
+    print(f"in-process: raw {raw_call * 1e6:.2f} us/call, instrumented {instrumented_call * 1e6:.2f} us/call, "
+          f"overhead {(instrumented_call - raw_call) * 1e6:.2f} us/call")
+
+    server = FakeOpenAIServer(FakeServerConfig(latency=fixed(LATENCY), reasoning_tokens=2)).start()
+    client = OpenAI(api_key="EMPTY", base_url=server.base_url)
+    instrumented = InstrumentedClient(client, provider="fake", recorder=recorder)
+    time_calls(client, 3)    # warm up the connection
+    raw_call = time_calls(client, SERVER_CALLS)
+    instrumented_call = time_calls(instrumented, SERVER_CALLS)
+    print(f"{LATENCY * 1e3:.0f}ms server: raw {raw_call * 1e3:.2f} ms/call, instrumented {instrumented_call * 1e3:.2f} "
+          f"ms/call ({(instrumented_call - raw_call) / raw_call:+.2%}; noise dominates, the recording itself "
+          f"is the in-process figure)")
+    print("one record per client shape:")
+    check_shapes(server.base_url, recorder)
+    server.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "calls.jsonl")
+        exporter = JsonlExporter(path)
+        start = time.perf_counter()
+        exported = exporter.export(recorder)
+        print(f"jsonl: {exported} records in {(time.perf_counter() - start) * 1e3:.1f} ms, "
+              f"{exporter.dropped} dropped from the ring (capacity {recorder.capacity})")
+        with open(path) as f:
+            print(f"  last: {f.readlines()[-1].strip()}")
+    print(recorder.prometheus_text())
@@ -0,0 +1,148 @@
+"""
+Blind retries vs RateLimiter against a fake server with request and token quotas.
+
+The fake server enforces requests_per_minute / tokens_per_minute per key over
+a sliding window; the window is shortened to --window seconds so a run takes
+seconds instead of minutes, and both the server and the limiter use it.
+
+  blind    AsyncOpenAI(max_retries=2), as ChatGroq(max_retries=2) behaves:
+           everything is sent at once and 429s are retried after backoff
+  limited  AsyncOpenAI(max_retries=0) through run_batch(limiter=...), with a
+           burst of interactive prompts at priority -1 arriving while the bulk
+           batch (priority 0) is queued
+
+For each run: wall time, 429s, failures, the busiest window seen by the server
+against the limit, and for the limited run the steady-state request and
+token rates (after the first window) as a share of the limits and the queue
+wait per priority.
+
+    python bench_rate_limiter.py [--rpm 120] [--tpm 3000] [--window 6] [--prompts 80]
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+from openai import AsyncOpenAI
+
+from batch_runner import run_batch
+from fake_openai_server import WORDS, FakeOpenAIServer, FakeReply, FakeServerConfig, count_tokens, fixed
+from rate_limiter import RateLimiter
+
+INTERACTIVE = 12
+
+
+def make_prompts(count: int, seed: int) -> list:
+    """Prompts of about 20-120 tokens, so the token quota binds before the request quota."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 90))) for _ in range(count)]
+
+
+class Stamps:
+    """Admission time and prompt tokens of every request the server answered."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def responder(self, request):
+        with self._lock:
+            self.calls.append((time.monotonic(), count_tokens(request["messages"])))
+        return FakeReply(content="ok")
+
+    def peak_window(self, window: float):
+        """Most requests and most tokens admitted within any `window` seconds."""
+        calls = sorted(self.calls)
+        peak_requests = peak_tokens = tokens = first = 0
+        for last, (at, cost) in enumerate(calls):
+            tokens += cost
+            while calls[first][0] <= at - window:
+                tokens -= calls[first][1]
+                first += 1
+            peak_requests = max(peak_requests, last - first + 1)
+            peak_tokens = max(peak_tokens, tokens)
+        return peak_requests, peak_tokens
+
+    def steady_rates(self, since: float):
+        """Requests and tokens per second admitted after `since`."""
+        calls = sorted(c for c in self.calls if c[0] >= since)
+        if len(calls) < 2:
+            return 0.0, 0.0
+        span = calls[-1][0] - calls[0][0]
+        return (len(calls) - 1) / span, sum(cost for _, cost in calls[1:]) / span
+
+
+async def blind(base_url: str, prompts: list, concurrency: int):
+    client = AsyncOpenAI(api_key="EMPTY", base_url=base_url, max_retries=2)
+    return await run_batch(client, prompts, max_concurrency=concurrency, model="fake")
+
+
+async def limited(base_url: str, prompts: list, interactive: list, concurrency: int, limiter: RateLimiter,
+                  delay: float):
+    client = AsyncOpenAI(api_key="EMPTY", base_url=base_url, max_retries=0)
+
+    async def late():
+        await asyncio.sleep(delay)
+        return await run_batch(client, interactive, max_concurrency=concurrency, limiter=limiter, priority=-1,
+                               model="fake")
+
+    bulk, urgent = await asyncio.gather(
+        run_batch(client, prompts, max_concurrency=concurrency, limiter=limiter, model="fake"), late())
+    return bulk + urgent
+
+
+def run(name: str, args, coroutine_factory):
+    stamps = Stamps()
+    config = FakeServerConfig(latency=fixed(args.latency), responder=stamps.responder, requests_per_minute=args.rpm,
+                              tokens_per_minute=args.tpm, rate_limit_window=args.window)
+    with FakeOpenAIServer(config) as server:
+        start = time.monotonic()
+        results = asyncio.run(coroutine_factory(server.base_url))
+        elapsed = time.monotonic() - start
+        rate_limited = server.stats.rate_limited
+    failed = sum(not r.ok for r in results)
+    latencies = sorted(r.latency for r in results if r.ok)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+    peak_requests, peak_tokens = stamps.peak_window(args.window)
+    print(f"{name:<8} {elapsed:6.2f}s  {len(results) - failed}/{len(results)} ok  {rate_limited:4d} x 429  "
+          f"call p95 {p95:5.2f}s  busiest window: {peak_requests}/{args.rpm} requests, "
+          f"{peak_tokens}/{args.tpm} tokens")
+    return stamps, start, rate_limited
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Blind retries vs client-side rate limiting")
+    arg_parser.add_argument("--rpm", type=int, default=120, help="requests per window per key")
+    arg_parser.add_argument("--tpm", type=int, default=3000, help="prompt tokens per window per key")
+    arg_parser.add_argument("--window", type=float, default=6.0, help="quota window in seconds (60 on real APIs)")
+    arg_parser.add_argument("--prompts", type=int, default=80)
+    arg_parser.add_argument("--concurrency", type=int, default=16)
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="server seconds per call")
+    args = arg_parser.parse_args()
+
+    prompts = make_prompts(args.prompts, seed=0)
+    interactive = make_prompts(INTERACTIVE, seed=1)
+    print(f"{args.prompts} bulk + {INTERACTIVE} interactive prompts, "
+          f"{sum(count_tokens([{'role': 'user', 'content': p}]) for p in prompts + interactive)} prompt tokens; "
+          f"limits {args.rpm} requests / {args.tpm} tokens per {args.window:g}s\n")
+
+    run("blind", args, lambda url: blind(url, prompts + interactive, args.concurrency))
+
+    # the fake server counts prompt tokens only
+    limiter = RateLimiter(args.rpm, args.tpm, window=args.window, count_completion=False)
+    stamps, start, rate_limited = run("limited", args, lambda url: limited(
+        url, prompts, interactive, args.concurrency, limiter, delay=args.window / 2))
+    requests_per_s, tokens_per_s = stamps.steady_rates(start + args.window)
+    print(f"\nlimited, after the first window: {requests_per_s:.2f} requests/s "
+          f"({requests_per_s * args.window / args.rpm:.0%} of the limit), {tokens_per_s:.0f} tokens/s "
+          f"({tokens_per_s * args.window / args.tpm:.0%} of the limit)")
+    stats = limiter.stats()
+    for priority, waits in stats["by_priority"].items():
+        label = "interactive" if priority < 0 else "bulk"
+        print(f"  queue wait {label:<11} (priority {priority:2d}): p50 {waits['wait_p50_s']:.2f}s  "
+              f"p95 {waits['wait_p95_s']:.2f}s  over {waits['granted']} calls")
+    print(f"  limiter: {stats['granted']} granted, {stats['queued']} queued, {stats['rate_limited']} x 429, "
+          f"max wait {stats['wait_max_s']:.2f}s")
+    if rate_limited:
+        raise SystemExit(1)
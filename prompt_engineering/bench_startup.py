@@ -0,0 +1,132 @@
+"""
+Cold start to the first answer, per client path, in fresh interpreters.
+
+Each path runs in a new `python` process against a local FakeOpenAIServer
+(zero latency), timed from spawn to exit, best of ROUNDS:
+
+  bare          - `python -c pass`, the interpreter floor
+  raw           - LLMClient.raw_chat: stdlib http.client, no openai / httpx import
+  llm_client    - LLMClient.chat through the openai SDK
+  openai        - openai.OpenAI(...).chat.completions.create, as the scripts do
+
+then one more run of each under `python -X importtime` for the modules that
+dominate it.  The raw path has to stay within --budget-ms (default 300)
+and must not import openai or httpx (lazy_imports.loaded()); exit status 1
+when it does not.
+
+With --scripts the LangChain / LlamaIndex scripts in llm_output_parsing are
+timed the same way, once each, from their own directory.  They call the live
+APIs with the keys in keys.json, so they are opt-in; a script whose framework
+is not installed is skipped.
+
+    python bench_startup.py [--budget-ms 300] [--scripts]
+"""
+import argparse
+import importlib.util
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from fake_openai_server import FakeOpenAIServer
+
+ROUNDS = 5
+HERE = Path(__file__).resolve().parent
+SCRIPTS_DIR = HERE.parent / "llm_output_parsing"
+
+PATHS = {
+    "bare": "pass",
+    "raw": (
+        "from llm_client import LLMClient\n"
+        "LLMClient('vllm', model='fake', base_url='{url}', api_key='EMPTY').raw_chat('hi')\n"
+        "from lazy_imports import loaded\n"
+        "assert not loaded(('openai', 'httpx')), f'raw path imported {{loaded()}}'\n"
+    ),
+    "llm_client": (
+        "from llm_client import LLMClient\n"
+        "LLMClient('vllm', model='fake', base_url='{url}', api_key='EMPTY').chat('hi')\n"
+    ),
+    "openai": (
+        "from openai import OpenAI\n"
+        "OpenAI(api_key='EMPTY', base_url='{url}').chat.completions.create("
+        "model='fake', messages=[{{'role': 'user', 'content': 'hi'}}])\n"
+    ),
+}
+
+# script -> the framework it needs
+SCRIPTS = {
+    "lang_parser.py": "langchain_groq",
+    "lang_parser_2.py": "langchain_groq",
+    "lang_parser_3.py": "langchain_groq",
+    "langchain_gemini.py": "langchain_google_genai",
+    "llmind_parser_1.py": "llama_index",
+}
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run(*args: str, cwd: Path = HERE) -> tuple:
+    """(seconds, stderr) of `python *args` in a fresh process."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=cwd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return elapsed, result.stderr
+
+
+def top_imports(stderr: str, count: int = 5) -> list:
+    """Top-level imports (direct children of the script) by cumulative microseconds."""
+    top = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            top.append((int(match.group(2)), match.group(4)))
+    return sorted(top, reverse=True)[:count]
+
+
+def report(name: str, best: float, bare: float, stderr: str):
+    imports = ", ".join(f"{module} {us / 1000:.0f}ms" for us, module in top_imports(stderr))
+    print(f"{name:<19} {best * 1e3:7.0f} ms  (+{(best - bare) * 1e3:5.0f} ms over bare)  {imports}")
+
+
+def time_scripts(bare: float):
+    print()
+    for script, framework in SCRIPTS.items():
+        if importlib.util.find_spec(framework) is None:
+            print(f"{script:<19} skipped, {framework} is not installed")
+            continue
+        try:
+            elapsed, _ = run(script, cwd=SCRIPTS_DIR)
+            _, stderr = run("-X", "importtime", script, cwd=SCRIPTS_DIR)
+        except RuntimeError as e:
+            print(f"{script:<19} failed: {e}")
+            continue
+        report(script, elapsed, bare, stderr)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Cold-start time to the first answer per client path")
+    arg_parser.add_argument("--budget-ms", type=float, default=300.0, help="limit for the raw path")
+    arg_parser.add_argument("--scripts", action="store_true", help="also time the LangChain / LlamaIndex scripts "
+                            "(live API calls, needs keys.json)")
+    args = arg_parser.parse_args()
+
+    with FakeOpenAIServer() as server:
+        results = {}
+        for name, template in PATHS.items():
+            code = template.format(url=server.base_url)
+            best = min(run("-c", code)[0] for _ in range(ROUNDS))
+            _, stderr = run("-X", "importtime", "-c", code)
+            results[name] = best
+            report(name, best, results["bare"], stderr)
+    if args.scripts:
+        time_scripts(results["bare"])
+
+    raw = results["raw"] * 1e3
+    print(f"\nraw path {raw:.0f} ms, budget {args.budget_ms:.0f} ms; "
+          f"openai SDK path {results['openai'] * 1e3:.0f} ms")
+    if raw > args.budget_ms:
+        print("OVER BUDGET")
+        sys.exit(1)
@@ -0,0 +1,79 @@
+"""
+Multi-tool turn against a local fake streaming server: wait for the whole
+response and run the tools one by one, vs ToolRuntime dispatching each call as
+its arguments close and running the calls concurrently.
+
+The fake model streams three get_weather calls (arguments in small pieces,
+CHUNK_DELAY apart), then answers once it gets the tool results.  Each tool
+call takes TOOL_LATENCY (a slow weather API).
+
+    python bench_tool_runtime.py
+"""
+import asyncio
+import json
+import time
+
+from openai import AsyncOpenAI
+
+from fake_openai_server import FakeOpenAIServer, FakeReply, FakeServerConfig
+from tool_runtime import ToolCallAccumulator, ToolRegistry, ToolRuntime
+
+CITIES = ["San Francisco", "Paris", "Tokyo"]
+CHUNK_DELAY = 0.03
+TOOL_LATENCY = 0.3
+
+registry = ToolRegistry()
+
+
+@registry.register
+def get_weather(location: str, unit: str = "celsius") -> dict:
+    """Get the current weather in a given location"""
+    time.sleep(TOOL_LATENCY)
+    return {"location": location, "temperature": 21, "unit": unit}
+
+
+def weather_model(request):
+    """Three get_weather calls, then an answer built from the tool results."""
+    messages = request["messages"]
+    if messages[-1]["role"] != "tool":
+        return FakeReply(tool_calls=[("get_weather", {"location": city, "unit": "celsius"}) for city in CITIES])
+    results = [json.loads(m["content"]) for m in messages if m["role"] == "tool"]
+    return FakeReply(content="".join(f"{r['location']}: {r['temperature']} degrees. " for r in results))
+
+
+async def sequential(client, messages):
+    """Baseline: read the whole stream, then call the tools one after another."""
+    start = time.perf_counter()
+    stream = await client.chat.completions.create(model="fake", messages=messages, tools=registry.tools,
+                                                  stream=True)
+    accumulator = ToolCallAccumulator()
+    calls = []
+    async for chunk in stream:
+        calls.extend(accumulator.feed(chunk))
+    calls.extend(accumulator.close())
+    first_tool = time.perf_counter() - start
+    results = [registry[call["name"]](**call["arguments"]) for call in calls]
+    return first_tool, time.perf_counter() - start, len(results)
+
+
+async def main(base_url):
+    client = AsyncOpenAI(api_key="EMPTY", base_url=base_url)
+    messages = [{"role": "user", "content": "What's the weather like in San Francisco, Paris and Tokyo?"}]
+
+    first_tool, tools_done, calls = await sequential(client, messages)
+    print(f"{'sequential':<12} first tool at {first_tool:5.2f}s, {calls} tools done at {tools_done:5.2f}s")
+
+    runtime = ToolRuntime(registry)
+    start = time.perf_counter()
+    result = await runtime.run(client, list(messages), model="fake")
+    total = time.perf_counter() - start
+    turn = result.turns[0]
+    print(f"{'streaming':<12} first tool at {turn.first_tool_start_s:5.2f}s, {turn.tool_calls} tools done at "
+          f"{turn.tools_done_s:5.2f}s (stream ended {turn.stream_end_s:.2f}s)")
+    print(f"end to end with the answer turn: {total:.2f}s -> {result.answer!r}")
+    runtime.close()
+
+
+if __name__ == "__main__":
+    with FakeOpenAIServer(FakeServerConfig(tokens_per_second=1 / CHUNK_DELAY, responder=weather_model)) as server:
+        asyncio.run(main(server.base_url))
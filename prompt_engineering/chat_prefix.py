@@ -0,0 +1,112 @@
+"""
+Incremental chat-template rendering with a cached, tokenized prefix.
+
+apply_chat_template over the whole conversation re-renders and re-tokenizes
+every earlier turn on every call.  IncrementalChatPrompt renders each message
+once, keeps its token ids, and on the next call only renders/tokenizes the
+messages that changed since the previous call.  `render` also reports how many
+leading tokens are shared with the previous prompt, so a backend with prompt
+(KV) caching can skip prefill for them.
+
+This relies on the template rendering a conversation as the concatenation of
+its messages (true for ChatML templates such as Qwen's); that is checked once
+on a probe conversation and the class falls back to full re-rendering if not.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+_PROBE = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "How many 'r's are in strawberries?"},
+    {"role": "assistant", "content": "There are three 'r's in strawberries."},
+    {"role": "user", "content": "Then, how many 'r's are in blueberries?"},
+]
+
+
+class IncrementalChatPrompt:
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self._keys: List[Tuple[str, str]] = []
+        self._offsets: List[int] = []      # start of each message in _prefix_ids
+        self._prefix_ids: List[int] = []
+        self._pending_generation = 0       # generation-prompt tokens currently appended to _prefix_ids
+        self.rendered_messages = 0
+        self.incremental = self._check_incremental()
+        self._generation_ids = self._encode(self._generation_prompt()) if self.incremental else []
+
+    def _template(self, messages, add_generation_prompt=False) -> str:
+        return self.tokenizer.apply_chat_template(
+            list(messages), tokenize=False, add_generation_prompt=add_generation_prompt
+        )
+
+    def _encode(self, text: str) -> List[int]:
+        return list(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _generation_prompt(self) -> str:
+        last = _PROBE[-1:]
+        return self._template(last, add_generation_prompt=True)[len(self._template(last)):]
+
+    def _check_incremental(self) -> bool:
+        try:
+            full = self._template(_PROBE)
+            pieces = [self._template([message]) for message in _PROBE]
+        except Exception:
+            return False
+        if "".join(pieces) != full:
+            return False
+        return sum((self._encode(piece) for piece in pieces), []) == self._encode(full)
+
+    @property
+    def prefix_ids(self) -> List[int]:
+        """Token ids of the messages rendered so far (without the generation prompt)."""
+        return self._prefix_ids[:len(self._prefix_ids) - self._pending_generation]
+
+    def render(self, messages: Sequence[Dict]) -> Tuple[List[int], int]:
+        """
+        Token ids for `messages` plus the generation prompt, and the number of
+        leading tokens identical to the previous call's prompt.  The returned
+        list is reused by the next call; copy it if it has to outlive that.
+        """
+        if not self.incremental:
+            ids = self._encode(self._template(messages, add_generation_prompt=True))
+            shared = 0
+            for a, b in zip(ids, self._prefix_ids):
+                if a != b:
+                    break
+                shared += 1
+            self._prefix_ids = ids
+            self.rendered_messages += len(messages)
+            return list(ids), shared
+
+        if self._pending_generation:
+            del self._prefix_ids[-self._pending_generation:]
+            self._pending_generation = 0
+
+        keys = [(m["role"], m["content"]) for m in messages]
+        common = 0
+        for old, new in zip(self._keys, keys):
+            if old != new:
+                break
+            common += 1
+
+        if common < len(self._keys):
+            del self._prefix_ids[self._offsets[common]:]
+            del self._offsets[common:]
+            del self._keys[common:]
+        shared = len(self._prefix_ids)
+
+        for message, key in zip(messages[common:], keys[common:]):
+            self._offsets.append(len(self._prefix_ids))
+            self._prefix_ids.extend(self._encode(self._template([message])))
+            self._keys.append(key)
+            self.rendered_messages += 1
+
+        self._prefix_ids.extend(self._generation_ids)
+        self._pending_generation = len(self._generation_ids)
+        return self._prefix_ids, shared
+
+    def reset(self):
+        self._keys.clear()
+        self._offsets.clear()
+        self._prefix_ids = []
+        self._pending_generation = 0
@@ -0,0 +1,128 @@
+"""
+Bounded-context conversation memory.
+
+Replaying the whole history every turn makes per-turn prompt cost and latency
+grow linearly with the conversation.  ConversationMemory keeps the prompt
+under a token budget: the system prompt is pinned, recent turns are kept in a
+sliding window, and turns that fall out of the window can be folded into a
+running summary.  <think> blocks are dropped from stored assistant turns -
+Qwen3's chat template discards them from history anyway, so there is no point
+counting them.
+"""
+import re
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+THINK_BLOCK = re.compile(r"<think>.*?</think>\s*", re.DOTALL)
+
+
+def strip_think(text: str) -> str:
+    """Remove <think>...</think> blocks (and an unterminated trailing one)."""
+    text = THINK_BLOCK.sub("", text)
+    start = text.find("<think>")
+    if start >= 0:
+        text = text[:start]
+    return text.strip()
+
+
+def make_token_counter(tokenizer=None) -> Callable[[str], int]:
+    """Token counter from a HF/MLX tokenizer, or a ~4 characters per token estimate without one."""
+    if tokenizer is None:
+        return lambda text: (len(text) + 3) // 4
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+class ConversationMemory:
+    """
+    Sliding window of chat messages under `token_budget` prompt tokens.
+
+    When the window overflows, the oldest messages are evicted down to
+    `evict_to` * budget (so eviction, and the optional `summarizer`, runs
+    once every few turns rather than every turn).  `summarizer(summary,
+    evicted_messages) -> str` returns the new running summary, which is sent
+    as a system message right after the pinned system prompt.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], token_budget: int = 4096,
+                 system_prompt: Optional[str] = None, max_messages: Optional[int] = None,
+                 summarizer: Optional[Callable[[str, List[Dict]], str]] = None,
+                 evict_to: float = 0.75, message_overhead: int = 4):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summarizer = summarizer
+        self.evict_to = evict_to
+        self.message_overhead = message_overhead
+        self.system_prompt = system_prompt
+        self.summary = ""
+        self._system_tokens = self._cost(system_prompt) if system_prompt else 0
+        self._summary_tokens = 0
+        self._window = deque()      # (message, tokens)
+        self._window_tokens = 0
+        self.evicted = 0
+
+    def _cost(self, content: str) -> int:
+        return self.count_tokens(content) + self.message_overhead
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Estimated tokens of messages() (before the chat template's generation prompt)."""
+        return self._system_tokens + self._summary_tokens + self._window_tokens
+
+    def add(self, role: str, content: str):
+        if role == "assistant":
+            content = strip_think(content)
+        message = {"role": role, "content": content}
+        tokens = self._cost(content)
+        self._window.append((message, tokens))
+        self._window_tokens += tokens
+        self._fit()
+
+    def add_turn(self, user: str, assistant: str):
+        self.add("user", user)
+        self.add("assistant", assistant)
+
+    def messages(self) -> List[Dict]:
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend(message for message, _ in self._window)
+        return messages
+
+    def clear(self):
+        self._window.clear()
+        self._window_tokens = 0
+        self.summary = ""
+        self._summary_tokens = 0
+
+    def _overflowing(self) -> bool:
+        if self.max_messages is not None and len(self._window) > self.max_messages:
+            return True
+        return self.prompt_tokens > self.token_budget
+
+    def _fit(self):
+        if not self._overflowing():
+            return
+        target = int(self.token_budget * self.evict_to)
+        evicted = []
+        # always keep the newest message, even if it alone is over budget
+        while len(self._window) > 1 and (self._overflowing() or self.prompt_tokens > target):
+            message, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            evicted.append(message)
+        # don't start the window with an orphaned assistant reply
+        while len(self._window) > 1 and self._window[0][0]["role"] == "assistant":
+            message, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            evicted.append(message)
+        self.evicted += len(evicted)
+        if self.summarizer is not None and evicted:
+            self.summary = self.summarizer(self.summary, evicted)
+            self._summary_tokens = self._cost(self.summary) if self.summary else 0
+            # a long summary eats into the window budget
+            while len(self._window) > 1 and self.prompt_tokens > self.token_budget:
+                message, tokens = self._window.popleft()
+                self._window_tokens -= tokens
+                self.evicted += 1
@@ -0,0 +1,440 @@
+"""
+Deterministic fake of an OpenAI-compatible chat server, for benchmarks and CI.
+
+Every script here needs live keys from keys.json or the vLLM GPU box at
+localhost:8000.  FakeOpenAIServer speaks the same protocol on 127.0.0.1:
+
+  - POST /v1/chat/completions, plain JSON or SSE (`stream=True`, with the
+    usage chunk for stream_options={"include_usage": True})
+  - reasoning_content (or `reasoning`, as Groq names it) before the answer
+  - tool_calls, with the arguments streamed in pieces, when the request has
+    `tools` and the last message is not a tool result
+  - response_format json_object / json_schema: the content is an instance of
+    the schema (enums, $ref/$defs, anyOf, arrays and nested objects)
+  - GET /v1/models
+
+Replies depend only on the request body and `seed`, so the same request gets
+the same answer.  Latency before the first token comes from a distribution
+(fixed / uniform / lognormal / empirical) and tokens then arrive at
+`tokens_per_second`.  The x-ratelimit-* headers count requests and tokens per
+API key against requests_per_minute / tokens_per_minute (over a sliding
+`rate_limit_window`, 60 s unless a benchmark shortens it) and answer 429 with
+retry-after once a key is over; `error_rate` / `fail_every` inject extra 429s.
+
+    with FakeOpenAIServer(FakeServerConfig(latency=lognormal(0.3, 0.5), tokens_per_second=80)) as server:
+        client = OpenAI(api_key="EMPTY", base_url=server.base_url)
+
+    python fake_openai_server.py --port 8000 --latency 0.2 --tps 50   # stands in for vllm_code.py's server
+"""
+import hashlib
+import json
+import math
+import random
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+WORDS = ("the", "model", "returns", "a", "short", "answer", "about", "tokens", "latency", "and", "json",
+         "parsing", "with", "one", "more", "word", "for", "each", "step", "of", "output")
+
+Latency = Callable[[random.Random, dict], float]
+
+
+def fixed(seconds: float) -> Latency:
+    return lambda rng, request: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    return lambda rng, request: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float) -> Latency:
+    """Long right tail, like real provider latency; `median` in seconds."""
+    return lambda rng, request: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+def empirical(samples: Sequence[float]) -> Latency:
+    """Resample measured latencies (e.g. the latency_s column of an instrumentation JSONL export)."""
+    samples = list(samples)
+    return lambda rng, request: rng.choice(samples)
+
+
+@dataclass
+class FakeReply:
+    content: str = ""
+    reasoning: str = ""
+    tool_calls: List[Tuple[str, dict]] = field(default_factory=list)   # (function name, arguments)
+
+
+@dataclass
+class FakeServerConfig:
+    latency: Latency = fixed(0.0)             # before the first token
+    tokens_per_second: float = 0.0            # 0: no per-token delay
+    completion_tokens: int = 24               # words in a default text reply
+    reasoning_tokens: int = 0                 # words of reasoning before the answer
+    reasoning_field: str = "reasoning_content"
+    tool_calls_per_turn: int = 1
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    rate_limit_window: float = 60.0           # seconds the "per minute" quotas cover; shorter speeds up benchmarks
+    error_rate: float = 0.0                   # probability of an injected 429
+    fail_every: int = 0                       # every n-th request gets a 429
+    retry_after: float = 1.0                  # seconds, for injected 429s
+    models: Sequence[str] = ("fake",)
+    seed: int = 0
+    responder: Optional[Callable[[dict], FakeReply]] = None   # overrides the generated reply
+
+
+@dataclass
+class FakeServerStats:
+    requests: int = 0
+    streamed: int = 0
+    rate_limited: int = 0
+    injected_errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def count_tokens(messages: List[dict]) -> int:
+    """About four characters per token, like the providers' own estimates."""
+    return max(1, len(json.dumps(messages)) // 4)
+
+
+def schema_instance(schema: dict, rng: random.Random, defs: Optional[dict] = None) -> Any:
+    """A value that validates against a (Pydantic-generated) JSON schema."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return schema_instance(defs[schema["$ref"].rsplit("/", 1)[-1]], rng, defs)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "const" in schema:
+        return schema["const"]
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return schema_instance(options[0], rng, defs)
+    if "allOf" in schema:
+        return schema_instance(schema["allOf"][0], rng, defs)
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        return {name: schema_instance(sub, rng, defs) for name, sub in properties.items()}
+    if kind == "array":
+        count = max(schema.get("minItems", 1), min(schema.get("maxItems", 3), rng.randint(1, 3)))
+        return [schema_instance(schema.get("items", {"type": "string"}), rng, defs) for _ in range(count)]
+    if kind in ("integer", "number"):
+        low = schema.get("minimum", 0)
+        high = schema.get("maximum", low + 100)
+        if kind == "integer":
+            return rng.randint(math.ceil(low), math.floor(high))
+        return round(rng.uniform(low, high), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def default_reply(request: dict, config: FakeServerConfig, rng: random.Random) -> FakeReply:
+    reply = FakeReply(reasoning=_words(rng, config.reasoning_tokens) if config.reasoning_tokens else "")
+    messages = request.get("messages", [])
+    tools = request.get("tools") or []
+    choice = request.get("tool_choice", "auto")
+    if tools and choice != "none" and (not messages or messages[-1].get("role") != "tool"):
+        if isinstance(choice, dict):
+            tools = [t for t in tools if t["function"]["name"] == choice["function"]["name"]]
+        for i in range(config.tool_calls_per_turn):
+            function = tools[i % len(tools)]["function"]
+            reply.tool_calls.append((function["name"], schema_instance(function.get("parameters", {}), rng)))
+        return reply
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        reply.content = json.dumps(schema_instance(response_format["json_schema"]["schema"], rng))
+    elif response_format.get("type") == "json_object":
+        reply.content = json.dumps({"answer": _words(rng, config.completion_tokens)})
+    else:
+        reply.content = _words(rng, config.completion_tokens)
+    return reply
+
+
+def _pieces(text: str, size: int = 8) -> List[str]:
+    """Stream units: words for prose, fixed-size slices for JSON / tool arguments."""
+    if text[:1] in ("{", "["):
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    words = text.split(" ")
+    return [word if i == 0 else " " + word for i, word in enumerate(words)] if text else []
+
+
+class _Quota:
+    """Requests and tokens of one API key over the last `window` seconds."""
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.events: Deque[Tuple[float, int]] = deque()
+
+    def usage(self, now: float) -> Tuple[int, int, float]:
+        while self.events and self.events[0][0] <= now - self.window:
+            self.events.popleft()
+        reset = self.events[0][0] + self.window - now if self.events else 0.0
+        return len(self.events), sum(tokens for _, tokens in self.events), reset
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver's default backlog of 5 drops concurrent connects, which retry a second later
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # clients closing keep-alive connections are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeOpenAIServer:
+
+    def __init__(self, config: Optional[FakeServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeServerConfig()
+        self.stats = FakeServerStats()
+        self._lock = threading.Lock()
+        self._quotas: Dict[str, _Quota] = {}
+        self._counter = 0
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _admit(self, api_key: str, tokens: int) -> Tuple[Optional[str], Dict[str, str], int]:
+        """(429 reason or None, x-ratelimit headers, request number) for one request of `tokens` tokens."""
+        config = self.config
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+            self.stats.requests += 1
+            now = time.monotonic()
+            quota = self._quotas.setdefault(api_key, _Quota(config.rate_limit_window))
+            requests, used, reset = quota.usage(now)
+            headers = {}
+            over = None
+            if config.requests_per_minute is not None:
+                headers["x-ratelimit-limit-requests"] = str(config.requests_per_minute)
+                headers["x-ratelimit-remaining-requests"] = str(max(0, config.requests_per_minute - requests - 1))
+                headers["x-ratelimit-reset-requests"] = f"{reset:.2f}s"
+                if requests >= config.requests_per_minute:
+                    over = "requests"
+            if config.tokens_per_minute is not None:
+                headers["x-ratelimit-limit-tokens"] = str(config.tokens_per_minute)
+                headers["x-ratelimit-remaining-tokens"] = str(max(0, config.tokens_per_minute - used - tokens))
+                headers["x-ratelimit-reset-tokens"] = f"{reset:.2f}s"
+                if used + tokens > config.tokens_per_minute:
+                    over = over or "tokens"
+            if over is not None:
+                self.stats.rate_limited += 1
+                headers["retry-after"] = f"{max(reset, 0.01):.2f}"
+                return f"Rate limit reached for {over} per minute", headers, counter
+            injected = (config.fail_every and counter % config.fail_every == 0) or \
+                (config.error_rate and random.Random(f"{config.seed}:429:{counter}").random() < config.error_rate)
+            if injected:
+                self.stats.rate_limited += 1
+                self.stats.injected_errors += 1
+                headers["retry-after"] = f"{config.retry_after:.2f}"
+                return "Rate limit reached (injected)", headers, counter
+            quota.events.append((now, tokens))
+        return None, headers, counter
+
+    def _rng(self, body: bytes) -> random.Random:
+        return random.Random(f"{self.config.seed}:{hashlib.sha256(body).hexdigest()}")
+
+    def _latency(self, request: dict, counter: int) -> float:
+        """Seeded by the request number `_admit` gave this request, not by whatever the counter is now."""
+        return max(0.0, self.config.latency(random.Random(f"{self.config.seed}:latency:{counter}"), request))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # headers and body go out in separate writes; without this Nagle adds a delayed-ACK wait to each reply
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, code: str, headers: Optional[Dict[str, str]] = None):
+        self._json(status, {"error": {"message": message, "type": code, "code": code}}, headers)
+
+    def do_GET(self):
+        fake = self.server.fake
+        if self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "created": 0, "owned_by": "fake"} for model in fake.config.models
+            ]})
+        else:
+            self._error(404, f"Unknown path {self.path}", "not_found")
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = self.rfile.read(int(self.headers.get("content-length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._error(404, f"Unknown path {self.path}", "not_found")
+            return
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._error(400, "Request body is not JSON", "invalid_request_error")
+            return
+        config = fake.config
+        prompt_tokens = count_tokens(request.get("messages", []))
+        api_key = self.headers.get("authorization", "").removeprefix("Bearer ")
+        rejected, headers, counter = fake._admit(api_key, prompt_tokens)
+        if rejected is not None:
+            self._error(429, rejected, "rate_limit_exceeded", headers)
+            return
+        rng = fake._rng(body)
+        reply = config.responder(request) if config.responder is not None else default_reply(request, config, rng)
+
+        limit = request.get("max_completion_tokens") or request.get("max_tokens")
+        content, finish_reason = reply.content, "tool_calls" if reply.tool_calls else "stop"
+        pieces = _pieces(content)
+        if limit is not None and len(pieces) > limit:
+            pieces, finish_reason = pieces[:limit], "length"
+            content = "".join(pieces)
+        arguments = [(name, json.dumps(args)) for name, args in reply.tool_calls]
+        reasoning_pieces = _pieces(reply.reasoning)
+        completion_tokens = len(pieces) + len(reasoning_pieces) + sum(len(_pieces(a)) for _, a in arguments)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens,
+                 "completion_tokens_details": {"reasoning_tokens": len(reasoning_pieces)}}
+        with fake._lock:
+            fake.stats.prompt_tokens += prompt_tokens
+            fake.stats.completion_tokens += completion_tokens
+
+        model = request.get("model", config.models[0])
+        completion_id = f"chatcmpl-{hashlib.sha256(body).hexdigest()[:24]}"
+        token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+        time.sleep(fake._latency(request, counter))
+
+        if not request.get("stream"):
+            time.sleep(token_delay * completion_tokens)
+            message: Dict[str, Any] = {"role": "assistant", "content": content if not arguments else None}
+            if reply.reasoning:
+                message[config.reasoning_field] = reply.reasoning
+            if arguments:
+                message["tool_calls"] = [{"id": f"call_{i}", "type": "function",
+                                          "function": {"name": name, "arguments": args}}
+                                         for i, (name, args) in enumerate(arguments)]
+            self._json(200, {"id": completion_id, "object": "chat.completion", "created": int(time.time()),
+                             "model": model, "usage": usage,
+                             "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}]},
+                       headers)
+            return
+
+        with fake._lock:
+            fake.stats.streamed += 1
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        def send(data: str):
+            payload = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta: dict, finish: Optional[str] = None, **extra):
+            send(json.dumps({"id": completion_id, "object": "chat.completion.chunk", "created": 0, "model": model,
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}))
+
+        chunk({"role": "assistant", "content": ""})
+        for piece in reasoning_pieces:
+            chunk({config.reasoning_field: piece})
+            time.sleep(token_delay)
+        for piece in pieces:
+            chunk({"content": piece})
+            time.sleep(token_delay)
+        for i, (name, args) in enumerate(arguments):
+            chunk({"tool_calls": [{"index": i, "id": f"call_{i}", "type": "function",
+                                   "function": {"name": name, "arguments": ""}}]})
+            for piece in _pieces(args):
+                chunk({"tool_calls": [{"index": i, "function": {"arguments": piece}}]})
+                time.sleep(token_delay)
+        chunk({}, finish_reason)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send(json.dumps({"id": completion_id, "object": "chat.completion.chunk", "created": 0,
+                             "model": model, "choices": [], "usage": usage}))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Deterministic fake OpenAI-compatible chat server")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--latency", type=float, default=0.2, help="median seconds before the first token")
+    arg_parser.add_argument("--sigma", type=float, default=0.0, help="lognormal spread of the latency (0: fixed)")
+    arg_parser.add_argument("--tps", type=float, default=50.0, help="tokens per second after the first")
+    arg_parser.add_argument("--reasoning-tokens", type=int, default=0)
+    arg_parser.add_argument("--rpm", type=int, default=None, help="requests per minute per key")
+    arg_parser.add_argument("--tpm", type=int, default=None, help="tokens per minute per key")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429")
+    arg_parser.add_argument("--model", action="append", default=None)
+    args = arg_parser.parse_args()
+
+    server = FakeOpenAIServer(FakeServerConfig(
+        latency=lognormal(args.latency, args.sigma) if args.sigma else fixed(args.latency),
+        tokens_per_second=args.tps, reasoning_tokens=args.reasoning_tokens,
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm, error_rate=args.error_rate,
+        models=args.model or ("fake",),
+    ), host=args.host, port=args.port)
+    print(f"serving on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
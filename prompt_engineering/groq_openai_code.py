@@ -21,6 +21,15 @@ client = openai.OpenAI(
     api_key=groq_key_1
 )
 
+# # rotate over grok_api_key_1..3 instead of only key 1
+# from key_pool import KeyPool
+# pool = KeyPool.from_keys_file("groq")
+# chat_completion = pool.chat(
+#     model="qwen/qwen3-32b",
+#     messages=[{"role": "user", "content": "Explain the importance of fast language models"}],
+# )
+# print(pool.stats())
+
 # #Normal chat completion
 # chat_completion = client.chat.completions.create(
 #     messages=[
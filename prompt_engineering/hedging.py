@@ -0,0 +1,341 @@
+"""
+Hedged streaming requests across keys and providers.
+
+The same model families are reachable through Groq (groq_openai_code.py),
+Gemini's OpenAI endpoint (gemini_openai_code.py) and a local vLLM
+(vllm_code.py), but every call goes to one of them, and p99 latency is set by
+the occasional call that sits for seconds before its first token.  Hedger
+sends each streamed call to the first backend and, if no token has arrived
+by a deadline, sends the same request to the next backend; the first of the
+two to produce a token is streamed to the caller and the other is cancelled
+(its HTTP stream closed).
+
+  - the deadline is a percentile (p95 by default) of the primary's recent
+    time to first token, so only about the slowest 5% of calls are hedged;
+    calls that lost a race count with the time they had waited, which keeps
+    the estimate from drifting down as the slow tail gets cut off
+  - backups are limited by a budget: each call earns `budget` hedges (at most
+    `burst` saved up) and each backup spends one, so extra requests stay
+    below `budget` of the traffic however slow the primary gets
+  - a backend that fails before its first token fails over to the next
+    one at once, budget or not
+  - stats() has the hedge rate, backup wins, budget refusals, estimated extra
+    prompt tokens, time-to-first-token percentiles of what callers got and
+    the latency the backups saved: when a backup wins, the primary is still
+    watched (up to `watch` seconds) until its first token, so the saving is
+    measured rather than guessed, then closed
+
+Backends are LLMClient instances (or anything with an `astream(messages,
+**kwargs)` async iterator of chunks), one per key or provider:
+
+    keys = load_keys("groq")
+    hedger = Hedger([LLMClient("groq", model="qwen/qwen3-32b", api_key=keys["grok_api_key_1"]),
+                     LLMClient("groq", model="qwen/qwen3-32b", api_key=keys["grok_api_key_2"]),
+                     LLMClient("vllm", model="Qwen/Qwen3-32B")])
+    async for chunk in hedger.astream(messages):
+        print(chunk.choices[0].delta.content or "", end="")
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Set
+
+from rate_limiter import estimate_tokens
+
+TTFT_SAMPLES = 2048
+
+
+@dataclass
+class HedgeOutcome:
+    winner: str                  # backend name
+    ttft_s: float                # time to first token the caller saw
+    deadline_s: float
+    hedged: bool = False         # a backup was sent because of the deadline
+    failover: bool = False       # a backup was sent because a backend failed
+    backup_won: bool = False
+    # hedged calls: how much sooner the first token came than the primary's (0 when the primary won);
+    # filled in once the primary answers, and a lower bound when it had not after `watch` seconds
+    saved_s: Optional[float] = None
+    saved_exact: bool = True
+
+
+def backend_name(backend: Any) -> str:
+    provider, model = getattr(backend, "provider", None), getattr(backend, "model", None)
+    if provider is None:
+        return type(backend).__name__
+    return f"{provider}:{model}" if model else provider
+
+
+def _has_token(chunk: Any) -> bool:
+    """Whether a stream chunk carries output (content, reasoning or a tool call), not just the role."""
+    choices = getattr(chunk, "choices", None)
+    if choices is None:
+        # plain text deltas
+        return bool(chunk)
+    for choice in choices:
+        delta = choice.delta
+        if delta.content or delta.tool_calls or getattr(delta, "reasoning_content", None) \
+                or getattr(delta, "reasoning", None):
+            return True
+    return False
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class _Attempt:
+    """One backend's stream, up to and including its first token."""
+
+    def __init__(self, index: int, backend: Any, messages, kwargs: dict):
+        self.index = index
+        self.started = time.perf_counter()
+        self.stream = backend.astream(messages, **kwargs)
+        self.head: List[Any] = []
+        self.ttft_s: Optional[float] = None
+        self.task = asyncio.ensure_future(self._first_token())
+
+    async def _first_token(self):
+        try:
+            async for chunk in self.stream:
+                self.head.append(chunk)
+                if _has_token(chunk):
+                    self.ttft_s = time.perf_counter() - self.started
+                    return
+        except BaseException:
+            await self.stream.aclose()
+            raise
+        raise RuntimeError("stream ended without output")
+
+    async def cancel(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except BaseException:
+            pass
+        await self.stream.aclose()
+
+
+class Hedger:
+    """Deadline-hedged streaming over `backends` in order of preference (the first is the primary)."""
+
+    def __init__(self, backends: Sequence[Any], percentile: float = 0.95, budget: float = 0.1, burst: float = 3.0,
+                 initial_deadline: float = 1.0, min_deadline: float = 0.05, max_deadline: Optional[float] = None,
+                 min_samples: int = 20, window: int = 200, watch: float = 5.0):
+        """
+        Until the primary has `min_samples` first-token times the deadline is
+        `initial_deadline`; then it is the `percentile` of the last `window`
+        of them, clamped to [min_deadline, max_deadline].  After a backup wins,
+        the primary is kept up to `watch` more seconds to measure the saving
+        (0: close it at once, saved_s is then a lower bound of 0).
+        """
+        if not backends:
+            raise ValueError("Hedger needs at least one backend")
+        self.backends = list(backends)
+        self.names = [backend_name(b) for b in self.backends]
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.initial_deadline = initial_deadline
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.min_samples = min_samples
+        self.watch = watch
+        self._primary_ttft: Deque[float] = deque(maxlen=window)
+        self._credit = burst
+        self._next_backup = 0
+        self._cleanup: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.backup_wins = 0
+        self.budget_denied = 0
+        self.errors = 0
+        self.extra_prompt_tokens = 0
+        self.wins: Dict[str, int] = {}
+        self.outcomes: Deque[HedgeOutcome] = deque(maxlen=TTFT_SAMPLES)
+
+    def deadline(self) -> float:
+        if len(self._primary_ttft) < self.min_samples:
+            deadline = self.initial_deadline
+        else:
+            deadline = _percentile(self._primary_ttft, self.percentile)
+        deadline = max(deadline, self.min_deadline)
+        if self.max_deadline is not None:
+            deadline = min(deadline, self.max_deadline)
+        return deadline
+
+    def _backup_index(self, tried: Set[int]) -> Optional[int]:
+        """Next backend after the primary in round-robin order that this call has not tried."""
+        n = len(self.backends)
+        for step in range(1, n):
+            index = 1 + (self._next_backup + step - 1) % (n - 1)
+            if index not in tried:
+                self._next_backup = index % (n - 1)
+                return index
+        return None
+
+    def _background(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._cleanup.add(task)
+        task.add_done_callback(self._cleanup.discard)
+
+    def _discard(self, attempts: List[_Attempt]):
+        """Cancel the losers in the background so the winner's first token is not held up."""
+        for attempt in attempts:
+            self._background(attempt.cancel())
+
+    async def _watch_primary(self, primary: _Attempt, outcome: HedgeOutcome, won_at: float):
+        """Wait for the losing primary's first token to see how much the backup saved, then close it."""
+        try:
+            await asyncio.wait_for(asyncio.shield(primary.task), self.watch)
+        except BaseException:
+            pass
+        if primary.ttft_s is not None:
+            outcome.saved_s = primary.started + primary.ttft_s - won_at
+        else:
+            # still waiting (or failed): it would have been at least this late
+            outcome.saved_s = time.perf_counter() - won_at
+            outcome.saved_exact = False
+        await primary.cancel()
+
+    async def drain(self):
+        """Wait for cancelled losers to close and watched primaries to answer (e.g. before the loop ends)."""
+        while self._cleanup:
+            await asyncio.gather(*list(self._cleanup), return_exceptions=True)
+
+    async def _race(self, messages, kwargs: dict) -> tuple:
+        start = time.perf_counter()
+        deadline = self.deadline()
+        outcome = HedgeOutcome(winner="", ttft_s=0.0, deadline_s=deadline)
+        attempts = [_Attempt(0, self.backends[0], messages, kwargs)]
+        tried = {0}
+        error: Optional[BaseException] = None
+        timeout: Optional[float] = deadline
+        try:
+            while True:
+                pending = [a.task for a in attempts if not a.task.done()]
+                finished = [a for a in attempts if a.task.done() and a.task.exception() is None]
+                if finished:
+                    winner = min(finished, key=lambda a: a.started + a.ttft_s)
+                    break
+                backup = None
+                if not pending:
+                    # every backend tried so far failed: fail over to the next one now
+                    error = attempts[-1].task.exception()
+                    backup = self._backup_index(tried)
+                    if backup is None:
+                        self.errors += 1
+                        raise error
+                    self.failovers += 1
+                    outcome.failover = True
+                else:
+                    done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if done:
+                        continue
+                    # deadline passed without a first token
+                    timeout = None
+                    if self._credit < 1.0:
+                        self.budget_denied += 1
+                        continue
+                    backup = self._backup_index(tried)
+                    if backup is None:
+                        continue
+                    self._credit -= 1.0
+                    self.hedged += 1
+                    outcome.hedged = True
+                tried.add(backup)
+                attempts.append(_Attempt(backup, self.backends[backup], messages, kwargs))
+                self.extra_prompt_tokens += estimate_tokens(messages)
+        except BaseException:
+            # the caller gave up (cancelled, timed out) or every backend failed
+            self._discard([a for a in attempts if not a.task.done() or a.task.exception() is None])
+            raise
+        elapsed = time.perf_counter() - start
+        primary = attempts[0]
+        watched = outcome.hedged and primary is not winner and not primary.task.done() and self.watch > 0
+        self._discard([a for a in attempts if a is not winner and not (watched and a is primary)])
+        if watched:
+            self._background(self._watch_primary(primary, outcome, winner.started + winner.ttft_s))
+        elif outcome.hedged and primary is winner:
+            outcome.saved_s = 0.0
+        elif outcome.hedged and primary.ttft_s is not None:
+            outcome.saved_s = primary.started + primary.ttft_s - (winner.started + winner.ttft_s)
+        elif outcome.hedged:
+            # the primary failed after the backup was sent, or watching is off
+            outcome.saved_s, outcome.saved_exact = 0.0, False
+        if primary is winner:
+            self._primary_ttft.append(primary.ttft_s)
+        elif not primary.task.done() or primary.task.cancelled():
+            # lost the race: its first token would have come later than this
+            self._primary_ttft.append(elapsed)
+        elif primary.task.exception() is None:
+            self._primary_ttft.append(primary.ttft_s)
+        name = self.names[winner.index]
+        self.wins[name] = self.wins.get(name, 0) + 1
+        outcome.winner, outcome.ttft_s = name, elapsed
+        outcome.backup_won = winner.index != 0
+        self.backup_wins += outcome.backup_won
+        self.outcomes.append(outcome)
+        return winner, outcome
+
+    async def astream(self, messages, **kwargs) -> AsyncIterator:
+        """Chunks of the first backend to produce a token; raises the last error if every backend fails."""
+        self.requests += 1
+        self._credit = min(self.burst, self._credit + self.budget)
+        winner, _ = await self._race(messages, kwargs)
+        try:
+            for chunk in winner.head:
+                yield chunk
+            async for chunk in winner.stream:
+                yield chunk
+        finally:
+            await winner.stream.aclose()
+
+    async def atext(self, messages, **kwargs) -> str:
+        """The streamed answer text."""
+        parts = []
+        async for chunk in self.astream(messages, **kwargs):
+            choices = getattr(chunk, "choices", None)
+            if choices is None:
+                parts.append(chunk)
+            elif choices and choices[0].delta.content:
+                parts.append(choices[0].delta.content)
+        return "".join(parts)
+
+    @property
+    def last_outcome(self) -> Optional[HedgeOutcome]:
+        return self.outcomes[-1] if self.outcomes else None
+
+    def stats(self) -> dict:
+        ttft = [o.ttft_s for o in self.outcomes]
+        saved = [o.saved_s for o in self.outcomes if o.saved_s is not None]
+        saved_by_backup = [o.saved_s for o in self.outcomes if o.backup_won and o.saved_s is not None]
+        return {
+            "requests": self.requests,
+            "deadline_s": round(self.deadline(), 4),
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "backup_wins": self.backup_wins,
+            "backup_win_rate": round(self.backup_wins / self.hedged, 4) if self.hedged else 0.0,
+            "failovers": self.failovers,
+            "budget_denied": self.budget_denied,
+            "errors": self.errors,
+            "extra_requests": self.hedged + self.failovers,
+            "extra_prompt_tokens": self.extra_prompt_tokens,
+            "wins": dict(self.wins),
+            "ttft_p50_s": round(_percentile(ttft, 0.5), 4),
+            "ttft_p95_s": round(_percentile(ttft, 0.95), 4),
+            "ttft_p99_s": round(_percentile(ttft, 0.99), 4),
+            # first-token time saved, over hedged calls (0 where the primary won) and over backup wins;
+            # lower bounds where the primary had not answered within `watch`
+            "saved_total_s": round(sum(saved), 4),
+            "saved_per_hedge_s": round(sum(saved) / len(saved), 4) if saved else 0.0,
+            "saved_p50_s": round(_percentile(saved_by_backup, 0.5), 4),
+            "saved_p95_s": round(_percentile(saved_by_backup, 0.95), 4),
+            "saved_lower_bounds": sum(not o.saved_exact for o in self.outcomes),
+        }
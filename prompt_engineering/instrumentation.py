@@ -0,0 +1,513 @@
+"""
+Per-call latency and token instrumentation.
+
+The LangChain scripts turn on set_debug(True)/set_verbose(True) at import and
+llmind_parser_1.py installs LlamaDebugHandler with root logging at DEBUG on
+stdout: every call dumps its full payload as text, which is slow and useless
+for anything but eyeballing.  Instead, every call becomes one CallRecord
+(provider, model, key id, queue wait, time to first token, latency, prompt /
+completion / reasoning tokens, retries, parse tier) in a fixed-size ring
+buffer, and running totals are kept for export.  The same records come from
+
+  - InstrumentedClient, wrapping an openai.OpenAI / groq.Groq client (sync or async, streaming or not)
+  - KeyPool(recorder=...), which adds the key id, queue wait and 429 retries
+  - langchain_handler(), a LangChain callback handler
+  - llama_index_handler(), for LlamaIndex's CallbackManager
+
+and go out through JsonlExporter (one JSON object per call) or
+prometheus_text() / write_prometheus() (text exposition format).
+
+    client = InstrumentedClient(Groq(api_key=...), provider="groq")
+    chain.invoke({...}, config={"callbacks": [langchain_handler()]})
+    JsonlExporter("calls.jsonl").export(RECORDER)
+    print(RECORDER.prometheus_text())
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class CallRecord:
+    started_at: float                    # time.time() when the call started
+    source: str                          # openai / groq / keypool / langchain / llama_index
+    provider: str = ""
+    model: str = ""
+    key_id: Optional[str] = None
+    queue_wait_s: float = 0.0
+    ttft_s: Optional[float] = None       # streaming calls only
+    latency_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    reasoning_tokens: int = 0
+    retries: int = 0
+    parse_tier: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _get(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def usage_counts(usage: Any) -> Tuple[int, int, int]:
+    """(prompt, completion, reasoning) tokens from an OpenAI/Groq usage object, or a LangChain/LlamaIndex dict."""
+    if usage is None:
+        return 0, 0, 0
+    prompt = _get(usage, "prompt_tokens") or _get(usage, "input_tokens") or 0
+    completion = _get(usage, "completion_tokens") or _get(usage, "output_tokens") or 0
+    details = _get(usage, "completion_tokens_details") or _get(usage, "output_token_details")
+    reasoning = _get(details, "reasoning_tokens") or _get(details, "reasoning") or 0
+    return prompt, completion, reasoning
+
+
+def response_usage(response: Any) -> Any:
+    """usage of a completion or of a stream chunk (Groq puts the streamed usage in x_groq)."""
+    return _get(response, "usage") or _get(_get(response, "x_groq"), "usage")
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class _Totals:
+    __slots__ = ("calls", "errors", "prompt", "completion", "reasoning", "retries", "queue_wait", "latency", "ttft")
+
+    def __init__(self):
+        self.calls = self.errors = self.prompt = self.completion = self.reasoning = self.retries = 0
+        self.queue_wait = 0.0
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.ttft = _Histogram(TTFT_BUCKETS)
+
+
+class CallRecorder:
+    """
+    Ring buffer of the last `capacity` CallRecords plus monotonic totals per
+    (provider, model) for Prometheus.  record() is a few dict and list
+    operations; nothing is formatted or written until an exporter runs.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._buffer: List[Optional[CallRecord]] = [None] * capacity
+        self._written = 0
+        self._totals: Dict[Tuple[str, str], _Totals] = {}
+        self._parse_tiers: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, rec: CallRecord) -> CallRecord:
+        with self._lock:
+            self._buffer[self._written % self.capacity] = rec
+            self._written += 1
+            totals = self._totals.get((rec.provider, rec.model))
+            if totals is None:
+                totals = self._totals[(rec.provider, rec.model)] = _Totals()
+            totals.calls += 1
+            totals.errors += rec.error is not None
+            totals.prompt += rec.prompt_tokens
+            totals.completion += rec.completion_tokens
+            totals.reasoning += rec.reasoning_tokens
+            totals.retries += rec.retries
+            totals.queue_wait += rec.queue_wait_s
+            totals.latency.observe(rec.latency_s)
+            if rec.ttft_s is not None:
+                totals.ttft.observe(rec.ttft_s)
+        return rec
+
+    def note_parse(self, rec: Optional[CallRecord], tier: Optional[str]):
+        """Attach the parser tier (parser_cascade.PARSER.last_tier) that decoded the call's output."""
+        if rec is None or tier is None:
+            return
+        rec.parse_tier = tier
+        key = (rec.provider, rec.model, tier)
+        with self._lock:
+            self._parse_tiers[key] = self._parse_tiers.get(key, 0) + 1
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    def records(self, since: int = 0) -> List[CallRecord]:
+        """Records with index >= since that are still in the buffer, oldest first."""
+        end = self._written
+        start = max(since, end - self.capacity)
+        return [rec for rec in (self._buffer[i % self.capacity] for i in range(start, end)) if rec is not None]
+
+    def prometheus_text(self, prefix: str = "llm") -> str:
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        with self._lock:
+            totals = sorted(self._totals.items())
+            parse_tiers = sorted(self._parse_tiers.items())
+            for name, attr, help_text in (
+                ("calls_total", "calls", "LLM calls"),
+                ("call_errors_total", "errors", "LLM calls that raised"),
+                ("retries_total", "retries", "Retries (e.g. after 429) inside LLM calls"),
+            ):
+                metric(name, "counter", help_text)
+                for (provider, model), t in totals:
+                    lines.append(f'{prefix}_{name}{{provider="{provider}",model="{model}"}} {getattr(t, attr)}')
+            metric("tokens_total", "counter", "Tokens by kind")
+            for (provider, model), t in totals:
+                for kind in ("prompt", "completion", "reasoning"):
+                    lines.append(f'{prefix}_tokens_total{{provider="{provider}",model="{model}",kind="{kind}"}} '
+                                 f'{getattr(t, kind)}')
+            metric("queue_wait_seconds_total", "counter", "Time spent waiting for a key or a slot")
+            for (provider, model), t in totals:
+                lines.append(f'{prefix}_queue_wait_seconds_total{{provider="{provider}",model="{model}"}} '
+                             f'{t.queue_wait:.6f}')
+            for name, attr, help_text in (("call_latency_seconds", "latency", "Total call latency"),
+                                          ("ttft_seconds", "ttft", "Time to first token of streamed calls")):
+                metric(name, "histogram", help_text)
+                for (provider, model), t in totals:
+                    hist = getattr(t, attr)
+                    labels = f'provider="{provider}",model="{model}"'
+                    cumulative = 0
+                    for bound, count in zip(hist.bounds, hist.counts):
+                        cumulative += count
+                        lines.append(f'{prefix}_{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{prefix}_{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                    lines.append(f"{prefix}_{name}_sum{{{labels}}} {hist.total:.6f}")
+                    lines.append(f"{prefix}_{name}_count{{{labels}}} {hist.count}")
+            metric("parse_tier_total", "counter", "Outputs decoded per parser tier")
+            for (provider, model, tier), count in parse_tiers:
+                lines.append(f'{prefix}_parse_tier_total{{provider="{provider}",model="{model}",tier="{tier}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class JsonlExporter:
+    """Appends the records written since the previous export, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._exported = 0
+        self.dropped = 0    # records overwritten in the ring before they were exported
+
+    def export(self, recorder: CallRecorder) -> int:
+        end = recorder.written
+        records = recorder.records(self._exported)
+        self.dropped += max(0, end - self._exported - len(records))
+        self._exported = end
+        if records:
+            with open(self.path, "a") as f:
+                f.writelines(json.dumps(asdict(rec)) + "\n" for rec in records)
+        return len(records)
+
+
+def write_prometheus(recorder: CallRecorder, path: str):
+    """Write the metrics for node_exporter's textfile collector (atomic replace)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(recorder.prometheus_text())
+    os.replace(tmp, path)
+
+
+RECORDER = CallRecorder()
+
+
+class InstrumentedClient:
+    """
+    Wraps an OpenAI or Groq client (sync or async); `chat.completions.create`
+    records one CallRecord per call.  Streams come back as the SDK's Stream
+    object, wrapped, and are recorded when exhausted or closed, with time to
+    first token.  `last_record` is the caller thread's latest record.
+    """
+
+    def __init__(self, client, provider: str = "openai", recorder: CallRecorder = RECORDER,
+                 key_id: Optional[str] = None):
+        from providers import is_async_client
+
+        self.client = client
+        self.provider = provider
+        self.recorder = recorder
+        self.key_id = key_id
+        self._source = type(client).__module__.split(".")[0]
+        self._local = threading.local()
+        create = client.chat.completions.create
+        self._create = create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._acreate if is_async_client(client) else self._screate
+        ))
+
+    @property
+    def last_record(self) -> Optional[CallRecord]:
+        return getattr(self._local, "record", None)
+
+    def _start(self, kwargs) -> CallRecord:
+        return CallRecord(started_at=time.time(), source=self._source, provider=self.provider,
+                          model=kwargs.get("model", ""), key_id=self.key_id)
+
+    def _finish(self, rec: CallRecord, start: float, response=None, error=None):
+        rec.latency_s = time.perf_counter() - start
+        if error is not None:
+            rec.error = repr(error)
+        else:
+            rec.prompt_tokens, rec.completion_tokens, rec.reasoning_tokens = usage_counts(response_usage(response))
+            rec.model = _get(response, "model") or rec.model
+        self._local.record = rec
+        self.recorder.record(rec)
+
+    def _screate(self, **kwargs):
+        rec, start = self._start(kwargs), time.perf_counter()
+        try:
+            response = self._create(**kwargs)
+        except Exception as e:
+            self._finish(rec, start, error=e)
+            raise
+        if kwargs.get("stream"):
+            return self._stream(response, rec, start)
+        self._finish(rec, start, response)
+        return response
+
+    async def _acreate(self, **kwargs):
+        rec, start = self._start(kwargs), time.perf_counter()
+        try:
+            response = await self._create(**kwargs)
+        except Exception as e:
+            self._finish(rec, start, error=e)
+            raise
+        if kwargs.get("stream"):
+            return self._astream(response, rec, start)
+        self._finish(rec, start, response)
+        return response
+
+    def _on_chunk(self, rec: CallRecord, start: float, chunk, state: dict):
+        if rec.ttft_s is None and _get(chunk, "choices"):
+            rec.ttft_s = time.perf_counter() - start
+        usage = response_usage(chunk)
+        if usage is not None:
+            state["usage"] = chunk
+
+    def _stream(self, stream, rec, start):
+        return _RecordedStream(self, stream, rec, start)
+
+    def _astream(self, stream, rec, start):
+        return _RecordedAsyncStream(self, stream, rec, start)
+
+
+class _RecordedStream:
+    """
+    The SDK's Stream, recorded: iterates the same chunks and keeps close(),
+    `response` and `with` working.  The record is written once, when the
+    stream is exhausted, raises or is closed.
+    """
+
+    def __init__(self, client: InstrumentedClient, stream, rec: CallRecord, start: float):
+        self._client = client
+        self._stream = stream
+        self._rec = rec
+        self._start = start
+        self._state = {"usage": None}
+        self._done = False
+        self._chunks = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+    def _end(self, error: Optional[BaseException] = None):
+        if not self._done:
+            self._done = True
+            self._client._finish(self._rec, self._start, self._state["usage"], error)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._chunks is None:
+            self._chunks = iter(self._stream)
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._end()
+            raise
+        except Exception as e:
+            self._end(e)
+            raise
+        self._client._on_chunk(self._rec, self._start, chunk, self._state)
+        return chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._end()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _RecordedAsyncStream(_RecordedStream):
+    """_RecordedStream for the AsyncStream of an async client."""
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._chunks is None:
+            self._chunks = self._stream.__aiter__()
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._end()
+            raise
+        except Exception as e:
+            self._end(e)
+            raise
+        self._client._on_chunk(self._rec, self._start, chunk, self._state)
+        return chunk
+
+    async def close(self):
+        try:
+            await self._stream.close()
+        finally:
+            self._end()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+_handler_classes: Dict[str, type] = {}
+
+
+def langchain_handler(recorder: CallRecorder = RECORDER, provider: Optional[str] = None):
+    """LangChain callback handler recording every chat/LLM run (pass it in `callbacks=[...]`)."""
+    cls = _handler_classes.get("langchain")
+    if cls is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LangChainRecorder(BaseCallbackHandler):
+            def __init__(self, recorder, provider):
+                self.recorder = recorder
+                self.provider = provider
+                self._runs: Dict[Any, Tuple[CallRecord, float]] = {}
+
+            def _begin(self, serialized, run_id, kwargs):
+                params = kwargs.get("invocation_params") or {}
+                rec = CallRecord(started_at=time.time(), source="langchain",
+                                 provider=self.provider or params.get("_type") or (serialized or {}).get("name", ""),
+                                 model=params.get("model") or params.get("model_name") or "")
+                self._runs[run_id] = (rec, time.perf_counter())
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                self._begin(serialized, run_id, kwargs)
+
+            def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+                self._begin(serialized, run_id, kwargs)
+
+            def on_llm_new_token(self, token, *, run_id, **kwargs):
+                run = self._runs.get(run_id)
+                if run is not None and run[0].ttft_s is None:
+                    run[0].ttft_s = time.perf_counter() - run[1]
+
+            def on_retry(self, retry_state, *, run_id, **kwargs):
+                run = self._runs.get(run_id)
+                if run is not None:
+                    run[0].retries += 1
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                run = self._runs.pop(run_id, None)
+                if run is None:
+                    return
+                rec, start = run
+                rec.latency_s = time.perf_counter() - start
+                output = response.llm_output or {}
+                usage = output.get("token_usage") or output.get("usage")
+                if usage is None and response.generations and response.generations[0]:
+                    message = getattr(response.generations[0][0], "message", None)
+                    usage = getattr(message, "usage_metadata", None)
+                rec.prompt_tokens, rec.completion_tokens, rec.reasoning_tokens = usage_counts(usage)
+                rec.model = output.get("model_name") or rec.model
+                self.recorder.record(rec)
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                run = self._runs.pop(run_id, None)
+                if run is not None:
+                    rec, start = run
+                    rec.latency_s = time.perf_counter() - start
+                    rec.error = repr(error)
+                    self.recorder.record(rec)
+
+        cls = _handler_classes["langchain"] = LangChainRecorder
+    return cls(recorder, provider)
+
+
+def llama_index_handler(recorder: CallRecorder = RECORDER, provider: Optional[str] = None):
+    """LlamaIndex callback handler recording LLM events (add it to Settings.callback_manager)."""
+    cls = _handler_classes.get("llama_index")
+    if cls is None:
+        from llama_index.core.callbacks import CBEventType, EventPayload
+        from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+        class LlamaIndexRecorder(BaseCallbackHandler):
+            def __init__(self, recorder, provider):
+                super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+                self.recorder = recorder
+                self.provider = provider
+                self._events: Dict[str, Tuple[CallRecord, float]] = {}
+
+            def on_event_start(self, event_type, payload=None, event_id="", parent_id="", **kwargs):
+                if event_type == CBEventType.LLM:
+                    serialized = (payload or {}).get(EventPayload.SERIALIZED) or {}
+                    rec = CallRecord(started_at=time.time(), source="llama_index",
+                                     provider=self.provider or serialized.get("class_name", ""),
+                                     model=serialized.get("model", ""))
+                    self._events[event_id] = (rec, time.perf_counter())
+                return event_id
+
+            def on_event_end(self, event_type, payload=None, event_id="", **kwargs):
+                run = self._events.pop(event_id, None)
+                if run is None:
+                    return
+                rec, start = run
+                rec.latency_s = time.perf_counter() - start
+                payload = payload or {}
+                if EventPayload.EXCEPTION in payload:
+                    rec.error = repr(payload[EventPayload.EXCEPTION])
+                response = payload.get(EventPayload.RESPONSE) or payload.get(EventPayload.COMPLETION)
+                raw = getattr(response, "raw", None)
+                rec.prompt_tokens, rec.completion_tokens, rec.reasoning_tokens = usage_counts(response_usage(raw))
+                rec.model = _get(raw, "model") or rec.model
+                self.recorder.record(rec)
+
+            def start_trace(self, trace_id=None):
+                pass
+
+            def end_trace(self, trace_id=None, trace_map=None):
+                pass
+
+        cls = _handler_classes["llama_index"] = LlamaIndexRecorder
+    return cls(recorder, provider)
@@ -0,0 +1,328 @@
+"""
+API key pool: round-robin over every configured key of a provider.
+
+keys.json holds three keys per provider but the scripts only ever used key 1,
+so throughput was capped at one key's rate limit.  KeyPool hands out keys in
+turn, tracks the remaining requests/tokens each key reports in its
+x-ratelimit-* response headers, and puts a key on cooldown after a 429 so the
+next call is routed to another key.
+
+    pool = KeyPool.from_keys_file("groq")
+    completion = pool.chat(model="qwen/qwen3-32b", messages=[...])
+
+Point `base_url` at fake_openai_server.FakeOpenAIServer (requests_per_minute=...)
+to exercise the header handling offline.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional, Tuple
+
+from instrumentation import CallRecord, response_usage, usage_counts
+from providers import PROVIDERS, load_keys
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset values such as "7.66s", "2m59.56s", "120ms" or "30" into seconds."""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _UNITS[unit] for number, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+@dataclass
+class RateLimitInfo:
+    """The x-ratelimit-* / retry-after headers of one response."""
+    limit_requests: Optional[int] = None
+    limit_tokens: Optional[int] = None
+    remaining_requests: Optional[int] = None
+    remaining_tokens: Optional[int] = None
+    reset_requests: Optional[float] = None     # seconds from now
+    reset_tokens: Optional[float] = None       # seconds from now
+    retry_after: Optional[float] = None        # seconds from now
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str]) -> "RateLimitInfo":
+        return cls(
+            limit_requests=_header_int(headers, "x-ratelimit-limit-requests"),
+            limit_tokens=_header_int(headers, "x-ratelimit-limit-tokens"),
+            remaining_requests=_header_int(headers, "x-ratelimit-remaining-requests"),
+            remaining_tokens=_header_int(headers, "x-ratelimit-remaining-tokens"),
+            reset_requests=parse_duration(headers.get("x-ratelimit-reset-requests")),
+            reset_tokens=parse_duration(headers.get("x-ratelimit-reset-tokens")),
+            retry_after=parse_duration(headers.get("retry-after")),
+        )
+
+
+@dataclass
+class KeyState:
+    key_id: str
+    api_key: str = field(repr=False)
+    remaining_requests: Optional[int] = None
+    remaining_tokens: Optional[int] = None
+    requests_reset_at: float = 0.0
+    tokens_reset_at: float = 0.0
+    cooldown_until: float = 0.0
+    requests: int = 0
+    rate_limited: int = 0
+
+    def ready_at(self, tokens: int = 0) -> float:
+        """Monotonic time at which this key is expected to accept a request of `tokens` tokens."""
+        at = self.cooldown_until
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            at = max(at, self.requests_reset_at)
+        if self.remaining_tokens is not None and self.remaining_tokens < max(tokens, 1):
+            at = max(at, self.tokens_reset_at)
+        return at
+
+
+class KeysExhausted(RuntimeError):
+    def __init__(self, retry_in: float):
+        super().__init__(f"All keys are rate limited, retry in {retry_in:.2f}s")
+        self.retry_in = retry_in
+
+
+class KeyPool:
+    """Round-robin key rotation with per-key rate-limit tracking. Thread-safe."""
+
+    def __init__(self, keys: Dict[str, str], base_url: str, default_cooldown: float = 10.0,
+                 max_wait: float = 60.0, client_kwargs: Optional[dict] = None, recorder=None, provider: str = "",
+                 pool=None):
+        """
+        `recorder` (an instrumentation.CallRecorder) gets one record per chat()/achat() call.
+        `pool` is the llm_client.PoolConfig of the shared connection pool when a call does not pass its own.
+        """
+        if not keys:
+            raise ValueError("KeyPool needs at least one key")
+        self.base_url = base_url
+        self.recorder = recorder
+        self.provider = provider
+        self.default_cooldown = default_cooldown
+        self.max_wait = max_wait
+        self.client_kwargs = client_kwargs or {}
+        self.pool = pool
+        self.keys = [KeyState(key_id, api_key) for key_id, api_key in keys.items()]
+        self._next = 0
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._async_clients = {}      # per event loop, see llm_client.loop_local()
+
+    @classmethod
+    def from_keys_file(cls, provider: str, base_url: Optional[str] = None, **kwargs) -> "KeyPool":
+        kwargs.setdefault("provider", provider)
+        return cls(load_keys(provider), base_url or PROVIDERS[provider].base_url, **kwargs)
+
+    def acquire(self, tokens: int = 0) -> KeyState:
+        """Next key in round-robin order that is not cooling down or out of quota."""
+        now = time.monotonic()
+        with self._lock:
+            n = len(self.keys)
+            for step in range(n):
+                key = self.keys[(self._next + step) % n]
+                if key.ready_at(tokens) <= now:
+                    self._next = (self._next + step + 1) % n
+                    key.requests += 1
+                    if key.remaining_requests is not None:
+                        key.remaining_requests -= 1
+                    if key.remaining_tokens is not None:
+                        key.remaining_tokens -= tokens
+                    return key
+            retry_in = min(key.ready_at(tokens) for key in self.keys) - now
+        raise KeysExhausted(max(retry_in, 0.0))
+
+    def peek(self, tokens: int = 0) -> KeyState:
+        """
+        The key acquire() would hand out next, or the one that frees up first,
+        without counting a request against it or moving the rotation on.  For
+        calls that do not spend chat quota, such as listing models.
+        """
+        now = time.monotonic()
+        with self._lock:
+            n = len(self.keys)
+            order = [self.keys[(self._next + step) % n] for step in range(n)]
+        return next((key for key in order if key.ready_at(tokens) <= now),
+                    min(order, key=lambda key: key.ready_at(tokens)))
+
+    def update(self, key: KeyState, headers: Mapping[str, str]):
+        """Record the quota a key reported in its response headers."""
+        info = RateLimitInfo.from_headers(headers)
+        now = time.monotonic()
+        with self._lock:
+            if info.remaining_requests is not None:
+                key.remaining_requests = info.remaining_requests
+            if info.remaining_tokens is not None:
+                key.remaining_tokens = info.remaining_tokens
+            if info.reset_requests is not None:
+                key.requests_reset_at = now + info.reset_requests
+            if info.reset_tokens is not None:
+                key.tokens_reset_at = now + info.reset_tokens
+        return info
+
+    def mark_rate_limited(self, key: KeyState, headers: Optional[Mapping[str, str]] = None):
+        """Put a key on cooldown after a 429, for retry-after seconds when the server says so."""
+        info = self.update(key, headers or {})
+        cooldown = info.retry_after
+        if cooldown is None:
+            resets = [r for r in (info.reset_requests, info.reset_tokens) if r]
+            cooldown = max(resets) if resets else self.default_cooldown
+        with self._lock:
+            key.rate_limited += 1
+            key.cooldown_until = max(key.cooldown_until, time.monotonic() + cooldown)
+
+    def _http_client(self, pool, asynchronous: bool):
+        from llm_client import PoolConfig, shared_http_client
+        return shared_http_client(self.base_url, pool or self.pool or PoolConfig(), asynchronous=asynchronous)
+
+    def client(self, key: KeyState, pool=None):
+        """Cached openai.OpenAI client bound to `key`, on the shared pool for `pool` (a PoolConfig)."""
+        pool = pool or self.pool
+        client = self._clients.get((key.key_id, pool))
+        if client is None:
+            from openai import OpenAI
+            kwargs = {"http_client": self._http_client(pool, asynchronous=False), **self.client_kwargs}
+            with self._lock:
+                client = self._clients.get((key.key_id, pool))
+                if client is None:
+                    client = OpenAI(api_key=key.api_key, base_url=self.base_url, max_retries=0, **kwargs)
+                    self._clients[(key.key_id, pool)] = client
+        return client
+
+    def async_client(self, key: KeyState, pool=None):
+        """Cached openai.AsyncOpenAI client bound to `key`, one per running event loop."""
+        from llm_client import loop_local
+        pool = pool or self.pool
+        clients = loop_local(self._async_clients)
+        client = clients.get((key.key_id, pool))
+        if client is None:
+            from openai import AsyncOpenAI
+            kwargs = {"http_client": self._http_client(pool, asynchronous=True), **self.client_kwargs}
+            with self._lock:
+                client = clients.get((key.key_id, pool))
+                if client is None:
+                    client = AsyncOpenAI(api_key=key.api_key, base_url=self.base_url, max_retries=0, **kwargs)
+                    clients[(key.key_id, pool)] = client
+        return client
+
+    def _wait_time(self, error: KeysExhausted, waited: float) -> float:
+        if waited + error.retry_in > self.max_wait:
+            raise error
+        return error.retry_in
+
+    def acquire_wait(self, tokens: int = 0, waited: float = 0.0) -> Tuple[KeyState, float]:
+        """
+        acquire(), sleeping while every key is cooling down; (key, seconds
+        waited in all).  Raises KeysExhausted once the wait would pass max_wait.
+        """
+        while True:
+            try:
+                return self.acquire(tokens), waited
+            except KeysExhausted as e:
+                delay = self._wait_time(e, waited)
+                time.sleep(delay)
+                waited += delay
+
+    async def aacquire_wait(self, tokens: int = 0, waited: float = 0.0) -> Tuple[KeyState, float]:
+        """acquire_wait() for coroutines."""
+        import asyncio
+
+        while True:
+            try:
+                return self.acquire(tokens), waited
+            except KeysExhausted as e:
+                delay = self._wait_time(e, waited)
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def _record(self, started_at: float, start: float, model: str, key: Optional[KeyState], waited: float,
+                retries: int, response=None, error: Optional[BaseException] = None):
+        if self.recorder is None:
+            return
+        rec = CallRecord(started_at=started_at, source="keypool", provider=self.provider, model=model,
+                         key_id=key.key_id if key is not None else None, queue_wait_s=waited,
+                         latency_s=time.perf_counter() - start, retries=retries,
+                         error=repr(error) if error is not None else None)
+        if response is not None:
+            rec.prompt_tokens, rec.completion_tokens, rec.reasoning_tokens = usage_counts(response_usage(response))
+        self.recorder.record(rec)
+
+    def chat(self, tokens: int = 0, pool=None, **kwargs):
+        """
+        chat.completions.create on the next available key, moving on to another
+        key on 429.  With stream=True the stream is returned once its response
+        headers arrive, and the call record covers only that part.  `pool`
+        overrides the PoolConfig of the connection pool for this call.
+        """
+        from openai import RateLimitError
+        started_at, start = time.time(), time.perf_counter()
+        waited, retries, key = 0.0, 0, None
+        try:
+            while True:
+                key, waited = self.acquire_wait(tokens, waited)
+                try:
+                    raw = self.client(key, pool).chat.completions.with_raw_response.create(**kwargs)
+                except RateLimitError as e:
+                    self.mark_rate_limited(key, e.response.headers)
+                    retries += 1
+                    continue
+                self.update(key, raw.headers)
+                response = raw.parse()
+                self._record(started_at, start, kwargs.get("model", ""), key, waited, retries, response)
+                return response
+        except Exception as e:
+            self._record(started_at, start, kwargs.get("model", ""), key, waited, retries, error=e)
+            raise
+
+    async def achat(self, tokens: int = 0, pool=None, **kwargs):
+        """Async version of chat()."""
+        from openai import RateLimitError
+        started_at, start = time.time(), time.perf_counter()
+        waited, retries, key = 0.0, 0, None
+        try:
+            while True:
+                key, waited = await self.aacquire_wait(tokens, waited)
+                try:
+                    raw = await self.async_client(key, pool).chat.completions.with_raw_response.create(**kwargs)
+                except RateLimitError as e:
+                    self.mark_rate_limited(key, e.response.headers)
+                    retries += 1
+                    continue
+                self.update(key, raw.headers)
+                response = raw.parse()
+                self._record(started_at, start, kwargs.get("model", ""), key, waited, retries, response)
+                return response
+        except Exception as e:
+            self._record(started_at, start, kwargs.get("model", ""), key, waited, retries, error=e)
+            raise
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                key.key_id: {
+                    "requests": key.requests,
+                    "rate_limited": key.rate_limited,
+                    "remaining_requests": key.remaining_requests,
+                    "remaining_tokens": key.remaining_tokens,
+                }
+                for key in self.keys
+            }
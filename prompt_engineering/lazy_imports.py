@@ -0,0 +1,74 @@
+"""
+Deferred imports for the framework-heavy scripts.
+
+The LangChain and LlamaIndex scripts import framework packages that cost
+hundreds of milliseconds each.  With
+
+    PromptTemplate = lazy_attr("langchain_core.prompts", "PromptTemplate")
+
+the name can be used as before (called, or an attribute read such as
+PromptTemplate.from_template) and the package is imported on that first use,
+so a path that never touches it never pays for it.  This only helps where
+the first use is conditional or late: a script that builds its backend at
+module level imports the package right there anyway, so the scripts keep
+plain imports.  `loaded()` lists which heavy packages a process actually
+imported; bench_startup.py asserts with it that the raw path imports neither
+openai nor httpx.
+
+Limits: isinstance() / subclassing need the real class (use `.resolve()`),
+and importing a dotted module lazily still imports its parent packages.
+"""
+import importlib
+import sys
+import threading
+from typing import Any, List, Sequence
+
+HEAVY_PACKAGES = ("openai", "groq", "httpx", "langchain", "langchain_core", "langchain_groq",
+                  "langchain_google_genai", "llama_index", "google", "pydantic", "yaml")
+
+_UNSET = object()
+_LOCK = threading.Lock()
+
+
+class LazyAttr:
+    """`getattr(import_module(module), name)`, done on first call or attribute access."""
+
+    __slots__ = ("_module", "_name", "_value")
+
+    def __init__(self, module: str, name: str):
+        self._module = module
+        self._name = name
+        self._value = _UNSET
+
+    def resolve(self) -> Any:
+        if self._value is _UNSET:
+            with _LOCK:
+                if self._value is _UNSET:
+                    self._value = getattr(importlib.import_module(self._module), self._name)
+        return self._value
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value):
+        # e.g. Settings.callback_manager = ...
+        if name in LazyAttr.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.resolve(), name, value)
+
+    def __repr__(self):
+        state = "loaded" if self._value is not _UNSET else "not loaded"
+        return f"<lazy {self._module}.{self._name} ({state})>"
+
+
+def lazy_attr(module: str, name: str) -> LazyAttr:
+    return LazyAttr(module, name)
+
+
+def loaded(packages: Sequence[str] = HEAVY_PACKAGES) -> List[str]:
+    """Which of `packages` this process has imported."""
+    return [name for name in packages if name in sys.modules]
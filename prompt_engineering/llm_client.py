@@ -0,0 +1,312 @@
+"""
+Provider-agnostic LLM client on shared keep-alive HTTP connection pools.
+
+Each script used to build its own client (openai.OpenAI with the Groq base
+URL, Groq(...), genai.Client, ChatGroq, LlamaIndex Groq/GoogleGenAI, vLLM on
+localhost:8000), none of which share connections.  Groq, Gemini and vLLM all
+serve the OpenAI chat-completions protocol, so LLMClient talks to each of them
+through the openai SDK on top of one httpx pool per base URL - HTTP/2 when the
+`h2` package is installed, HTTP/1.1 keep-alive otherwise - and exposes the
+same chat / stream / structured / tool-call methods, sync and async, for every
+backend.  Swapping backends for a benchmark is a change of `provider`.
+
+    llm = LLMClient("groq", model="qwen/qwen3-32b")
+    review = llm.structured(messages, ProductReview)
+    async for text in llm.astream(messages): ...
+    answer = llm.raw_chat(messages)     # plain dict, no openai import (fast cold start)
+"""
+import asyncio
+import importlib.util
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Type
+
+from providers import PROVIDERS, load_keys
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    max_connections: int = 32
+    max_keepalive_connections: int = 16
+    keepalive_expiry: float = 120.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+    http2: bool = True
+
+
+_POOLS: Dict[tuple, Any] = {}
+_ASYNC_POOLS: Dict[asyncio.AbstractEventLoop, Dict[tuple, Any]] = {}
+_POOLS_LOCK = threading.Lock()
+_LOOPS_LOCK = threading.Lock()
+
+
+def loop_local(store: dict) -> dict:
+    """
+    store[running event loop]: a dict for objects bound to that loop, such as
+    an httpx.AsyncClient.  Entries of loops that have closed are dropped, so
+    repeated asyncio.run calls each get fresh ones.
+    """
+    loop = asyncio.get_running_loop()
+    local = store.get(loop)
+    if local is None:
+        with _LOOPS_LOCK:
+            for closed in [other for other in store if other.is_closed()]:
+                del store[closed]
+            local = store.setdefault(loop, {})
+    return local
+
+
+def shared_http_client(base_url: str, pool: PoolConfig = PoolConfig(), asynchronous: bool = False):
+    """
+    One httpx.Client per (base_url, pool config), reused by every LLMClient
+    and KeyPool.  An AsyncClient is bound to the event loop it first runs on,
+    so async pools are kept per running loop (call this inside the loop).
+    """
+    key = (base_url.rstrip("/"), pool)
+    pools = loop_local(_ASYNC_POOLS) if asynchronous else _POOLS
+    client = pools.get(key)
+    if client is not None:
+        return client
+    with _POOLS_LOCK:
+        client = pools.get(key)
+        if client is None:
+            import httpx
+            cls = httpx.AsyncClient if asynchronous else httpx.Client
+            client = cls(
+                http2=pool.http2 and importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=pool.max_connections,
+                    max_keepalive_connections=pool.max_keepalive_connections,
+                    keepalive_expiry=pool.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(pool.read_timeout, connect=pool.connect_timeout),
+            )
+            pools[key] = client
+    return client
+
+
+_RAW = threading.local()
+
+
+def _raw_connection(base_url: str, pool: PoolConfig):
+    """This thread's http.client connection to base_url's host, and the URL path prefix."""
+    import http.client
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(base_url)
+    connections = _RAW.__dict__.setdefault("connections", {})
+    connection = connections.get((parts.scheme, parts.netloc))
+    if connection is None:
+        cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        connection = connections[(parts.scheme, parts.netloc)] = cls(parts.netloc, timeout=pool.read_timeout)
+    return connection, parts.path.rstrip("/")
+
+
+class RawChatError(RuntimeError):
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body[:500]}")
+        self.status = status
+        self.body = body
+
+
+class ToolCall(dict):
+    """{"id", "name", "arguments"} with arguments already decoded from JSON."""
+
+
+def _messages(messages) -> List[dict]:
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    return list(messages)
+
+
+def _json_schema_format(schema_model) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema_model.__name__, "schema": schema_model.model_json_schema()},
+    }
+
+
+def _tool_calls(response) -> List[ToolCall]:
+    calls = response.choices[0].message.tool_calls or []
+    return [
+        ToolCall(id=call.id, name=call.function.name, arguments=json.loads(call.function.arguments or "{}"))
+        for call in calls
+    ]
+
+
+class LLMClient:
+    """
+    Same interface for Groq, Gemini (OpenAI endpoint) and vLLM.
+
+    `provider` picks the base URL and keys.json prefix from providers.PROVIDERS;
+    `base_url`/`api_key` override them.  Pass a key_pool.KeyPool as `key_pool`
+    to rotate keys per call instead of using one key.
+    """
+
+    def __init__(self, provider: str = "groq", model: Optional[str] = None, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, pool: PoolConfig = PoolConfig(), key_pool=None,
+                 max_retries: int = 2, **defaults):
+        self.provider = provider
+        self.model = model
+        self.base_url = base_url or PROVIDERS[provider].base_url
+        self.pool = pool
+        self.key_pool = key_pool
+        self.max_retries = max_retries
+        self.defaults = defaults
+        if api_key is None and key_pool is None:
+            api_key = next(iter(load_keys(provider).values()))
+        self.api_key = api_key
+        self._sync = None
+        self._async: Dict[asyncio.AbstractEventLoop, dict] = {}     # per event loop, see loop_local()
+
+    @property
+    def client(self):
+        """
+        openai.OpenAI bound to the shared pool.  With a key_pool it uses the key
+        that is up next without counting a request against it (peek()): calls
+        made through it, e.g. list_models(), send no rate-limit headers back.
+        """
+        if self.key_pool is not None:
+            return self.key_pool.client(self.key_pool.peek(), self.pool)
+        if self._sync is None:
+            from openai import OpenAI
+            self._sync = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=self.max_retries,
+                                http_client=shared_http_client(self.base_url, self.pool))
+        return self._sync
+
+    @property
+    def async_client(self):
+        if self.key_pool is not None:
+            return self.key_pool.async_client(self.key_pool.peek(), self.pool)
+        clients = loop_local(self._async)
+        client = clients.get("openai")
+        if client is None:
+            from openai import AsyncOpenAI
+            client = clients["openai"] = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=self.max_retries,
+                http_client=shared_http_client(self.base_url, self.pool, asynchronous=True))
+        return client
+
+    def _request(self, messages, kwargs) -> dict:
+        request = {"model": self.model, **self.defaults, **kwargs, "messages": _messages(messages)}
+        if request["model"] is None:
+            raise ValueError("No model given to LLMClient or to the call")
+        return request
+
+    def list_models(self) -> List[str]:
+        return [model.id for model in self.client.models.list()]
+
+    # sync
+
+    def chat(self, messages, **kwargs):
+        request = self._request(messages, kwargs)
+        if self.key_pool is not None:
+            return self.key_pool.chat(pool=self.pool, **request)
+        return self.client.chat.completions.create(**request)
+
+    def stream(self, messages, **kwargs) -> Iterator:
+        """Raw chunks of a streamed completion (feed them to StreamDemux or print delta.content)."""
+        request = self._request(messages, kwargs)
+        if self.key_pool is not None:
+            return self.key_pool.chat(pool=self.pool, **request, stream=True)
+        return self.client.chat.completions.create(**request, stream=True)
+
+    def structured(self, messages, schema_model: Type, **kwargs):
+        response = self.chat(messages, response_format=_json_schema_format(schema_model), **kwargs)
+        return schema_model.model_validate_json(response.choices[0].message.content)
+
+    def tool_call(self, messages, tools: List[dict], tool_choice: Any = "auto", **kwargs) -> List[ToolCall]:
+        return _tool_calls(self.chat(messages, tools=tools, tool_choice=tool_choice, **kwargs))
+
+    def raw_chat(self, messages, **kwargs) -> dict:
+        """
+        The completion as a plain dict, POSTed with the stdlib's http.client on
+        a keep-alive connection per thread.  Importing openai (or httpx and
+        httpcore) is most of a cold start, so one-shot scripts get their first
+        answer several times sooner this way.  With a key_pool it waits for a
+        free key and moves on to another key after a 429, like KeyPool.chat;
+        otherwise no retries beyond reconnecting a stale connection once.
+        """
+        import http.client
+
+        body = json.dumps(self._request(messages, kwargs)).encode()
+        key, api_key, waited = None, self.api_key, 0.0
+        while True:
+            if self.key_pool is not None:
+                key, waited = self.key_pool.acquire_wait(waited=waited)
+                api_key = key.api_key
+            headers = {"content-type": "application/json", "authorization": f"Bearer {api_key}"}
+            for attempt in range(2):
+                connection, path = _raw_connection(self.base_url, self.pool)
+                try:
+                    connection.request("POST", path + "/chat/completions", body, headers)
+                    response = connection.getresponse()
+                    data = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    connection.close()
+                    if attempt:
+                        raise
+            if key is None:
+                break
+            if response.status == 429:
+                # cool this key down and try the next one, as KeyPool.chat does
+                self.key_pool.mark_rate_limited(key, response.headers)
+                continue
+            self.key_pool.update(key, response.headers)
+            break
+        if response.status >= 400:
+            raise RawChatError(response.status, data.decode(errors="replace"))
+        return json.loads(data)
+
+    # async
+
+    async def achat(self, messages, **kwargs):
+        request = self._request(messages, kwargs)
+        if self.key_pool is not None:
+            return await self.key_pool.achat(pool=self.pool, **request)
+        return await self.async_client.chat.completions.create(**request)
+
+    async def astream(self, messages, **kwargs) -> AsyncIterator:
+        request = self._request(messages, kwargs)
+        if self.key_pool is not None:
+            stream = await self.key_pool.achat(pool=self.pool, **request, stream=True)
+        else:
+            stream = await self.async_client.chat.completions.create(**request, stream=True)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            # an abandoned stream (aclose(), a cancelled task) releases its connection now, not at GC
+            await stream.close()
+
+    async def astructured(self, messages, schema_model: Type, **kwargs):
+        response = await self.achat(messages, response_format=_json_schema_format(schema_model), **kwargs)
+        return schema_model.model_validate_json(response.choices[0].message.content)
+
+    async def atool_call(self, messages, tools: List[dict], tool_choice: Any = "auto", **kwargs) -> List[ToolCall]:
+        return _tool_calls(await self.achat(messages, tools=tools, tool_choice=tool_choice, **kwargs))
+
+
+def close_pools():
+    """
+    Close every shared sync connection pool.  Async pools can only be closed
+    on their own event loop (aclose_pools()); those of loops that have already
+    finished are dropped here.
+    """
+    with _POOLS_LOCK:
+        for client in _POOLS.values():
+            client.close()
+        _POOLS.clear()
+    with _LOOPS_LOCK:
+        for loop in [loop for loop in _ASYNC_POOLS if loop.is_closed()]:
+            del _ASYNC_POOLS[loop]
+
+
+async def aclose_pools():
+    """Close the running event loop's async connection pools, e.g. at the end of the coroutine given to asyncio.run."""
+    with _LOOPS_LOCK:
+        pools = _ASYNC_POOLS.pop(asyncio.get_running_loop(), {})
+    for client in pools.values():
+        await client.aclose()
@@ -1,30 +1,55 @@
 from mlx_lm import load, generate
+from mlx_lm.models.cache import can_trim_prompt_cache, make_prompt_cache, trim_prompt_cache
+
+from chat_prefix import IncrementalChatPrompt
+from conversation_memory import ConversationMemory, make_token_counter
 
 
 class QwenChatbot:
-    def __init__(self, model_name="Qwen/Qwen3-8B-MLX-4bit"):
+    def __init__(self, model_name="Qwen/Qwen3-8B-MLX-4bit", token_budget=8192, max_tokens=32768,
+                 system_prompt=None, summarizer=None):
         self.model, self.tokenizer = load(model_name)
-        self.history = []
+        self.max_tokens = max_tokens
+        # prompt stays under token_budget however long the conversation gets
+        self.memory = ConversationMemory(
+            make_token_counter(self.tokenizer),
+            token_budget=token_budget,
+            system_prompt=system_prompt,
+            summarizer=summarizer,
+        )
+        # earlier turns are rendered/tokenized once and their KV cache is reused
+        self.prompt = IncrementalChatPrompt(self.tokenizer)
+        self.prompt_cache = make_prompt_cache(self.model)
+
+    @property
+    def history(self):
+        return self.memory.messages()
+
+    def _prefill_tokens(self, ids, shared):
+        """Trim the KV cache back to the prefix shared with the last prompt; return the tokens still to prefill."""
+        cached = self.prompt_cache[0].offset
+        if shared and cached >= shared and can_trim_prompt_cache(self.prompt_cache):
+            trim_prompt_cache(self.prompt_cache, cached - shared)
+            return ids[shared:]
+        self.prompt_cache = make_prompt_cache(self.model)
+        return ids
 
     def generate_response(self, user_input):
-        messages = self.history + [{"role": "user", "content": user_input}]
+        self.memory.add("user", user_input)
+        messages = self.memory.messages()
 
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True
-        )
+        ids, shared = self.prompt.render(messages)
 
         response = generate(
             self.model,
             self.tokenizer,
-            prompt=text,
+            prompt=self._prefill_tokens(ids, shared),
+            prompt_cache=self.prompt_cache,
             verbose=True,
-            max_tokens=32768
+            max_tokens=self.max_tokens
         )
-        # Update history
-        self.history.append({"role": "user", "content": user_input})
-        self.history.append({"role": "assistant", "content": response})
+        # Update history (<think> blocks are not kept)
+        self.memory.add("assistant", response)
 
         return response
 
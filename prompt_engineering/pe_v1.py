@@ -2,20 +2,6 @@ import os
 import openai
 import json 
 
-with open("keys.json") as f:
-    api_key = json.load(f)
-
-
-groq_key_1 =api_key["grok_api_key_1"]
-groq_key_2 =api_key["grok_api_key_2"]
-groq_key_3 =api_key["grok_api_key_3"]
-
-from groq import Groq
-
-client = Groq(
-    api_key=groq_key_1,
-)
-
 #instruction prompting
 prompt_1 = """A user has input their first and last name into a form. We don't know in which order their first name and last name are, but we need it to be in this format '[Last name], [First name]'.
 Please convert the following name in the expected format: Charlie Brown"""
@@ -83,23 +69,43 @@ A: She bought 5 bagels for $3 each. This means she spent $15. She has $8 left.
 Q: When I was 6 my sister was half my age. Now I’m 70 how old is my sister?
 A:"""
 
-completion = client.chat.completions.create(
-    model="openai/gpt-oss-20b",
-    messages=[
-        {
-            "role": "user",
-            "content":prompt_7 ,
-        }
-    ],
-    temperature=0.6,
-    # max_completion_tokens=1024,
-    # reasoning_effort="none",
+PROMPTS = [prompt_1, prompt_2, prompt_3, prompt_4, prompt_5, prompt_6, prompt_7]
+
+
+if __name__ == "__main__":
+    with open("keys.json") as f:
+        api_key = json.load(f)
+
 
-    top_p=0.95,
-)
+    groq_key_1 =api_key["grok_api_key_1"]
+    groq_key_2 =api_key["grok_api_key_2"]
+    groq_key_3 =api_key["grok_api_key_3"]
 
-print(completion.choices[0].message.content)
+    from groq import AsyncGroq
+    from batch_runner import run_batch_sync
 
+    client = AsyncGroq(
+        api_key=groq_key_1,
+    )
 
+    # # re-runs of the same prompts are served from disk, no tokens spent
+    # from groq.types.chat import ChatCompletion
+    # from response_cache import CachedClient, ResponseCache
+    # client = CachedClient(client, ResponseCache("pe_cache.sqlite", ttl=24 * 3600), response_type=ChatCompletion)
 
+    # all prompts concurrently, results in the same order as PROMPTS
+    results = run_batch_sync(
+        client,
+        PROMPTS,
+        max_concurrency=4,
+        timeout=60,
+        model="openai/gpt-oss-20b",
+        temperature=0.6,
+        # max_completion_tokens=1024,
+        # reasoning_effort="none",
+        top_p=0.95,
+    )
 
+    for i, result in enumerate(results, start=1):
+        print(f"----- prompt_{i} ({result.latency:.2f}s)")
+        print(result.content if result.ok else f"failed: {result.error!r}")
@@ -0,0 +1,49 @@
+"""
+OpenAI-compatible endpoints used by the scripts in this folder and the
+keys.json prefixes that hold their API keys.
+"""
+import inspect
+import json
+import pathlib
+from typing import Dict, NamedTuple, Optional
+
+KEYS_PATH = pathlib.Path(__file__).parent.parent / "keys.json"
+
+
+class Provider(NamedTuple):
+    base_url: str
+    key_prefix: Optional[str]   # None for local servers that take any key
+
+
+PROVIDERS: Dict[str, Provider] = {
+    # rate limit: https://console.groq.com/settings/limits
+    "groq": Provider("https://api.groq.com/openai/v1", "grok_api_key_"),
+    # rate limit: https://ai.google.dev/gemini-api/docs/rate-limits
+    "gemini": Provider("https://generativelanguage.googleapis.com/v1beta/openai/", "google_api_key_"),
+    "vllm": Provider("http://localhost:8000/v1", None),
+}
+
+
+def is_async_client(client) -> bool:
+    """
+    Whether client.chat.completions.create has to be awaited (AsyncOpenAI,
+    AsyncGroq, ...).  The SDKs wrap create() in a decorator, so
+    inspect.iscoroutinefunction(create) alone says False for them.
+    """
+    completions = client.chat.completions
+    if type(completions).__name__.startswith("Async"):
+        return True
+    return inspect.iscoroutinefunction(inspect.unwrap(completions.create))
+
+
+def load_keys(provider: str, path=KEYS_PATH) -> Dict[str, str]:
+    """Return {key_id: api_key} for every configured key of `provider`, e.g. grok_api_key_1..3."""
+    prefix = PROVIDERS[provider].key_prefix
+    if prefix is None:
+        return {f"{provider}_local": "EMPTY"}
+    with open(path) as f:
+        api_key = json.load(f)
+    keys = {name: value for name, value in api_key.items() if name.startswith(prefix) and value}
+    if not keys:
+        raise KeyError(f"No keys starting with {prefix!r} in {path}")
+    return dict(sorted(keys.items()))
@@ -0,0 +1,421 @@
+"""
+Client-side rate limiting against requests-per-minute and tokens-per-minute quotas.
+
+Groq and Gemini limit every key by requests and tokens per minute (see the
+links in providers.py), and the scripts only find out from a 429:
+ChatGroq(max_retries=2) and the openai SDK retry blindly, which spends quota
+on rejected calls and adds seconds of backoff to the tail.  RateLimiter keeps
+two token buckets - requests and tokens - and holds a call back until both
+can pay for it:
+
+  - the cost of a call is estimated before it is sent (about four characters
+    per token of the messages, plus max_tokens when completions count against
+    the quota) and corrected with the usage the response reports
+  - the buckets refill at (1 - headroom) of the limit and hold at most
+    `headroom` of it, so no window ever sees more than the limit: throughput
+    settles just under it without 429s, as long as the headroom covers the
+    largest single call
+  - x-ratelimit-limit-* headers set the limits (a limiter without configured
+    limits sends one call at a time until the first response states them),
+    x-ratelimit-remaining-* pull the buckets down when something else uses
+    the key, and a 429 empties them until retry-after and slows the refill
+    until calls succeed again
+  - waiting callers are served by priority (lower values first) and in
+    arrival order within a priority; the head of the queue is not overtaken
+    by smaller calls of its own priority, so large calls do not starve
+  - every Permit carries its queue wait, and stats() has totals and percentiles
+
+    limiter = RateLimiter(requests_per_minute=30, tokens_per_minute=6000)
+    permit = limiter.acquire(messages, max_tokens=512)
+    raw = client.chat.completions.with_raw_response.create(model=..., messages=messages, max_tokens=512)
+    limiter.complete(permit, raw.parse(), raw.headers)
+
+run_batch(..., limiter=limiter) does the same for every prompt, and
+RateLimiters keeps one limiter per (provider, model, key).  Permit.waited is
+what instrumentation.CallRecord.queue_wait_s expects.
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from instrumentation import response_usage, usage_counts
+from key_pool import RateLimitInfo
+
+WAIT_SAMPLES = 2048
+
+
+def estimate_tokens(messages: Union[str, Sequence[dict], None], max_tokens: Optional[int] = None) -> int:
+    """Prompt tokens at about four characters each (as fake_openai_server.count_tokens counts), plus max_tokens."""
+    if messages is None:
+        prompt = 0
+    else:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        prompt = max(1, len(json.dumps(list(messages))) // 4)
+    return prompt + (max_tokens or 0)
+
+
+class Limits(NamedTuple):
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+
+
+class RateLimitTimeout(TimeoutError):
+    def __init__(self, waited: float):
+        super().__init__(f"No rate-limit capacity after {waited:.2f}s")
+        self.waited = waited
+
+
+@dataclass
+class Permit:
+    tokens: int                  # estimated cost charged to the token bucket
+    priority: int = 0
+    waited: float = 0.0          # seconds in the queue
+    granted_at: float = 0.0      # time.monotonic()
+
+
+class _Bucket:
+    """`limit` per window: refills at (1 - headroom) * limit / window per second, holds headroom * limit."""
+
+    __slots__ = ("limit", "rate", "capacity", "level")
+
+    def __init__(self, limit: Optional[int], headroom: float, window: float):
+        self.level = 0.0
+        self.set_limit(limit, headroom, window)
+        self.level = self.capacity
+
+    def set_limit(self, limit: Optional[int], headroom: float, window: float):
+        self.limit = limit
+        if limit is None:
+            self.rate, self.capacity = 0.0, 0.0
+        else:
+            self.rate = (1.0 - headroom) * limit / window
+            self.capacity = headroom * limit
+        self.level = min(self.level, self.capacity)
+
+    def delay(self, cost: float, rate_factor: float) -> float:
+        """Seconds until `cost` can be paid.  A call larger than the bucket waits for a full one and goes into debt."""
+        if self.limit is None:
+            return 0.0
+        missing = min(cost, self.capacity) - self.level
+        if missing <= 1e-9:
+            return 0.0
+        return missing / (self.rate * rate_factor)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    cost: int = field(compare=False)
+    wake: Callable[[], None] = field(compare=False, repr=False)
+    granted: bool = field(default=False, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class RateLimiter:
+    """Request and token buckets plus a priority queue for one (provider, model, key). Thread-safe, sync or async."""
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 headroom: float = 0.05, window: float = 60.0, count_completion: bool = True,
+                 default_cooldown: float = 1.0, min_rate_factor: float = 0.25, recovery: float = 0.02):
+        """
+        `window` is the period the limits refer to (60 s for per-minute quotas).
+        `count_completion`: completion tokens count against tokens_per_minute
+        (Groq); False when only prompt tokens do.  After a 429 the refill rate
+        is multiplied by 0.75 (not below `min_rate_factor`) and grows back by
+        `recovery` per successful call.
+        """
+        self.headroom = headroom
+        self.window = window
+        self.count_completion = count_completion
+        self.default_cooldown = default_cooldown
+        self.min_rate_factor = min_rate_factor
+        self.recovery = recovery
+        self._requests = _Bucket(requests_per_minute, headroom, window)
+        self._tokens = _Bucket(tokens_per_minute, headroom, window)
+        self._rate_factor = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._probing = requests_per_minute is None and tokens_per_minute is None
+        self._in_flight = 0
+        self._in_flight_tokens = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.queued = 0              # permits that had to wait
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits: Dict[int, Deque[float]] = {}
+
+    @property
+    def limits(self) -> Limits:
+        return Limits(self._requests.limit, self._tokens.limit)
+
+    def estimate(self, messages, max_tokens: Optional[int] = None) -> int:
+        return estimate_tokens(messages, max_tokens if self.count_completion else None)
+
+    # --- scheduling, all under self._lock ---
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if elapsed <= 0:
+            return
+        for bucket in (self._requests, self._tokens):
+            if bucket.limit is not None:
+                bucket.level = min(bucket.capacity, bucket.level + elapsed * bucket.rate * self._rate_factor)
+
+    def _delay(self, cost: int, now: float) -> Optional[float]:
+        """Seconds until a call of `cost` tokens may go; None while waiting for a probe call to come back."""
+        if self._probing and self._in_flight:
+            return None
+        return max(self._blocked_until - now, self._requests.delay(1, self._rate_factor),
+                   self._tokens.delay(cost, self._rate_factor), 0.0)
+
+    def _dispatch(self, now: float, wake_head: bool = False) -> Optional[float]:
+        """Grant every waiter that fits, in queue order; the delay until the (new) head fits."""
+        self._refill(now)
+        while self._queue:
+            head = self._queue[0]
+            if head.cancelled:
+                heapq.heappop(self._queue)
+                wake_head = True
+                continue
+            delay = self._delay(head.cost, now)
+            if delay is None or delay > 0:
+                if wake_head:
+                    # a new head, or new conditions: it sets its own timer
+                    head.wake()
+                return delay
+            heapq.heappop(self._queue)
+            self._requests.level -= 1
+            self._tokens.level -= head.cost
+            self._in_flight += 1
+            self._in_flight_tokens += head.cost
+            head.granted = wake_head = True
+            head.wake()
+        return 0.0
+
+    def _timeout(self, waiter: _Waiter, delay: Optional[float], deadline: Optional[float], now: float,
+                 start: float) -> Optional[float]:
+        """How long `waiter` sleeps before looking again: the head sleeps until it fits, the rest until woken."""
+        timeout = delay if self._queue and self._queue[0] is waiter else None
+        if deadline is not None:
+            if now >= deadline:
+                waiter.cancelled = True
+                self.timeouts += 1
+                self._dispatch(now)
+                raise RateLimitTimeout(now - start)
+            timeout = deadline - now if timeout is None else min(timeout, deadline - now)
+        return timeout
+
+    def _permit(self, waiter: _Waiter, start: float) -> Permit:
+        now = time.monotonic()
+        waited = now - start
+        with self._lock:
+            self.granted += 1
+            if waited > 0.001:
+                self.queued += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            waits = self._waits.get(waiter.priority)
+            if waits is None:
+                waits = self._waits[waiter.priority] = deque(maxlen=WAIT_SAMPLES)
+            waits.append(waited)
+        return Permit(waiter.cost, waiter.priority, waited, now)
+
+    def _abandon(self, waiter: _Waiter):
+        """A caller stopped waiting (cancelled task): give back a grant it will not use."""
+        with self._lock:
+            if waiter.granted:
+                self._requests.level += 1
+                self._tokens.level += waiter.cost
+                self._in_flight -= 1
+                self._in_flight_tokens -= waiter.cost
+            waiter.cancelled = True
+            self._dispatch(time.monotonic())
+
+    # --- public API ---
+
+    def acquire(self, messages=None, max_tokens: Optional[int] = None, tokens: Optional[int] = None,
+                priority: int = 0, timeout: Optional[float] = None) -> Permit:
+        """
+        Block until the call may be sent.  The cost is `tokens` if given,
+        otherwise estimated from `messages` and `max_tokens`.  Raises
+        RateLimitTimeout after `timeout` seconds in the queue.
+        """
+        cost = tokens if tokens is not None else self.estimate(messages, max_tokens)
+        event = threading.Event()
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        waiter = _Waiter(priority, next(self._seq), cost, event.set)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._dispatch(now)
+                if waiter.granted:
+                    break
+                wait = self._timeout(waiter, delay, deadline, now, start)
+                event.clear()
+            event.wait(wait)
+        return self._permit(waiter, start)
+
+    async def aacquire(self, messages=None, max_tokens: Optional[int] = None, tokens: Optional[int] = None,
+                       priority: int = 0, timeout: Optional[float] = None) -> Permit:
+        """acquire() for coroutines: waits without blocking the event loop."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        cost = tokens if tokens is not None else self.estimate(messages, max_tokens)
+        event = asyncio.Event()
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        waiter = _Waiter(priority, next(self._seq), cost, lambda: loop.call_soon_threadsafe(event.set))
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    delay = self._dispatch(now)
+                    if waiter.granted:
+                        break
+                    wait = self._timeout(waiter, delay, deadline, now, start)
+                    event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return self._permit(waiter, start)
+
+    def complete(self, permit: Permit, response=None, headers: Optional[Mapping[str, str]] = None,
+                 rate_limited: bool = False):
+        """
+        Report how the call went: the response (its usage corrects the token
+        estimate), the response headers, and whether it was a 429.  Call it
+        for failed calls too, or the limiter counts them as still in flight.
+        """
+        actual = None
+        if response is not None:
+            prompt, completion, _ = usage_counts(response_usage(response))
+            if prompt or completion:
+                actual = prompt + completion if self.count_completion else prompt
+        info = RateLimitInfo.from_headers(headers) if headers is not None else None
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._in_flight -= 1
+            self._in_flight_tokens -= permit.tokens
+            if actual is not None and self._tokens.limit is not None:
+                self._tokens.level = min(self._tokens.capacity, self._tokens.level + permit.tokens - actual)
+            if response is not None or info is not None:
+                self._probing = False
+            if info is not None:
+                self._adapt(info, now)
+            if rate_limited:
+                self._on_rate_limited(info, now)
+            elif response is not None:
+                self._rate_factor = min(1.0, self._rate_factor + self.recovery)
+            self._dispatch(now, wake_head=True)
+
+    def _adapt(self, info: RateLimitInfo, now: float):
+        for bucket, limit, remaining, reset, in_flight in (
+            (self._requests, info.limit_requests, info.remaining_requests, info.reset_requests, self._in_flight),
+            (self._tokens, info.limit_tokens, info.remaining_tokens, info.reset_tokens, self._in_flight_tokens),
+        ):
+            if limit is not None and limit != bucket.limit:
+                first = bucket.limit is None
+                bucket.set_limit(limit, self.headroom, self.window)
+                if first:
+                    bucket.level = bucket.capacity
+            if remaining is None or bucket.limit is None:
+                continue
+            # calls still in flight may not be counted in `remaining` yet: assume they are not
+            bucket.level = min(bucket.level, remaining - in_flight)
+            if remaining <= 0 and reset:
+                self._blocked_until = max(self._blocked_until, now + reset)
+
+    def _on_rate_limited(self, info: Optional[RateLimitInfo], now: float):
+        self.rate_limited += 1
+        self._rate_factor = max(self.min_rate_factor, self._rate_factor * 0.75)
+        cooldown = info.retry_after if info is not None else None
+        if cooldown is None and info is not None:
+            resets = [r for r in (info.reset_requests, info.reset_tokens) if r]
+            cooldown = max(resets) if resets else None
+        self._blocked_until = max(self._blocked_until, now + (cooldown or self.default_cooldown))
+        for bucket in (self._requests, self._tokens):
+            bucket.level = min(bucket.level, 0.0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = {priority: list(samples) for priority, samples in sorted(self._waits.items())}
+            every = [w for samples in waits.values() for w in samples]
+            return {
+                "requests_per_minute": self._requests.limit,
+                "tokens_per_minute": self._tokens.limit,
+                "rate_factor": round(self._rate_factor, 3),
+                "in_flight": self._in_flight,
+                "waiting": sum(not w.cancelled for w in self._queue),
+                "granted": self.granted,
+                "queued": self.queued,
+                "rate_limited": self.rate_limited,
+                "timeouts": self.timeouts,
+                "wait_total_s": round(self.wait_total, 4),
+                "wait_max_s": round(self.wait_max, 4),
+                "wait_p50_s": round(_percentile(every, 0.5), 4),
+                "wait_p95_s": round(_percentile(every, 0.95), 4),
+                "by_priority": {
+                    priority: {"granted": len(samples), "wait_p50_s": round(_percentile(samples, 0.5), 4),
+                               "wait_p95_s": round(_percentile(samples, 0.95), 4)}
+                    for priority, samples in waits.items()
+                },
+            }
+
+
+class RateLimiters:
+    """
+    One RateLimiter per (provider, model, key id), created on first use.
+    `limits` is keyed by "provider/model" or "provider"; keys without an
+    entry learn their limits from the response headers.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Limits]] = None, **kwargs):
+        self.limits = limits or {}
+        self.kwargs = kwargs
+        self._limiters: Dict[Tuple[str, str, str], RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str = "", key_id: str = "") -> RateLimiter:
+        key = (provider, model, key_id)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    limits = self.limits.get(f"{provider}/{model}") or self.limits.get(provider) or Limits()
+                    limiter = self._limiters[key] = RateLimiter(*limits, **self.kwargs)
+        return limiter
+
+    def stats(self) -> Dict[str, dict]:
+        return {"/".join(part for part in key if part): limiter.stats() for key, limiter in self._limiters.items()}
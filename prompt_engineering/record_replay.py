@@ -0,0 +1,250 @@
+"""
+Record LLM HTTP sessions once and replay them offline.
+
+RecordingTransport sits under an OpenAI / AsyncOpenAI client (through its
+httpx http_client) and appends every exchange to a gzip-compressed JSONL
+file: status, response headers and the raw body chunks, each with its offset
+from the start of the request.  ReplayTransport serves those responses back
+byte for byte, with the same SSE chunk boundaries and, with `timing=True`, the
+recorded timing, so a streamed session replays with its real TTFT.
+
+Requests are matched on method, path and the sha256 of the canonical JSON
+body; identical requests replay in recorded order (the last one repeats).  No
+request header is written, so API keys never end up in the file.  A request
+that was not recorded gets a 404 naming it.
+
+    transport = RecordingTransport("session.jsonl.gz")
+    client = OpenAI(api_key=key, base_url=base_url, http_client=httpx.Client(transport=transport))
+    ...
+    client = OpenAI(api_key="replay", base_url=base_url,
+                    http_client=httpx.Client(transport=ReplayTransport("session.jsonl.gz")))
+
+    python record_replay.py session.jsonl.gz      # list the recorded exchanges
+"""
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+Chunks = List[Tuple[float, bytes]]
+
+_SKIP_HEADERS = {"set-cookie"}
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """method, path and body hash; JSON bodies are canonicalised so key order does not matter."""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    return f"{method} {path} {hashlib.sha256(body).hexdigest()[:32]}"
+
+
+def _key(request: httpx.Request) -> str:
+    return request_key(request.method, request.url.raw_path.decode(), request.content)
+
+
+def _encode_chunks(chunks: Chunks) -> Tuple[str, list]:
+    try:
+        return "text", [[round(offset, 4), chunk.decode()] for offset, chunk in chunks]
+    except UnicodeDecodeError:
+        return "base64", [[round(offset, 4), base64.b64encode(chunk).decode()] for offset, chunk in chunks]
+
+
+def _decode_chunks(encoding: str, chunks: list) -> Chunks:
+    if encoding == "text":
+        return [(offset, chunk.encode()) for offset, chunk in chunks]
+    return [(offset, base64.b64decode(chunk)) for offset, chunk in chunks]
+
+
+@dataclass
+class Exchange:
+    key: str
+    status: int
+    headers: List[Tuple[str, str]]
+    chunks: Chunks
+
+    def to_json(self) -> str:
+        encoding, chunks = _encode_chunks(self.chunks)
+        return json.dumps({"key": self.key, "status": self.status, "headers": self.headers,
+                           "encoding": encoding, "chunks": chunks}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "Exchange":
+        data = json.loads(line)
+        return cls(data["key"], data["status"], [tuple(h) for h in data["headers"]],
+                   _decode_chunks(data["encoding"], data["chunks"]))
+
+
+def load_exchanges(path: str) -> Iterator[Exchange]:
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            if line.strip():
+                yield Exchange.from_json(line)
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Passes the body through unchanged and writes the exchange once the body is closed."""
+
+    def __init__(self, stream, start: float, done):
+        self._stream = stream
+        self._start = start
+        self._done = done
+        self._chunks: Chunks = []
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._chunks.append((time.perf_counter() - self._start, chunk))
+            yield chunk
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._chunks.append((time.perf_counter() - self._start, chunk))
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+        self._done(self._chunks)
+
+    async def aclose(self):
+        await self._stream.aclose()
+        self._done(self._chunks)
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Forwards to a real transport (httpx.HTTPTransport / AsyncHTTPTransport
+    unless given) and records each exchange; works under httpx.Client and
+    AsyncClient.  Responses are requested uncompressed so the file stays
+    text and gzip compresses it as a whole.
+    """
+
+    def __init__(self, path: str, transport: Optional[httpx.BaseTransport] = None,
+                 async_transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.path = path
+        self.recorded = 0
+        self._transport = transport
+        self._async_transport = async_transport
+        self._file = gzip.open(path, "at")
+        self._lock = threading.Lock()
+
+    def _write(self, key: str, response: httpx.Response, chunks: Chunks):
+        headers = [(name, value) for name, value in response.headers.multi_items() if name not in _SKIP_HEADERS]
+        line = Exchange(key, response.status_code, headers, chunks).to_json()
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+    def _wrap(self, key: str, response: httpx.Response, start: float) -> httpx.Response:
+        stream = _RecordingStream(response.stream, start, lambda chunks: self._write(key, response, chunks))
+        return httpx.Response(response.status_code, headers=response.headers, stream=stream,
+                              extensions=response.extensions)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._transport is None:
+            self._transport = httpx.HTTPTransport()
+        request.headers["accept-encoding"] = "identity"
+        request.read()
+        start = time.perf_counter()
+        return self._wrap(_key(request), self._transport.handle_request(request), start)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._async_transport is None:
+            self._async_transport = httpx.AsyncHTTPTransport()
+        request.headers["accept-encoding"] = "identity"
+        await request.aread()
+        start = time.perf_counter()
+        return self._wrap(_key(request), await self._async_transport.handle_async_request(request), start)
+
+    def _close_file(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+        self._close_file()
+
+    async def aclose(self):
+        if self._async_transport is not None:
+            await self._async_transport.aclose()
+        self._close_file()
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+
+    def __init__(self, chunks: Chunks, timing: bool):
+        self._chunks = chunks
+        self._timing = timing
+
+    def __iter__(self):
+        start = time.perf_counter()
+        for offset, chunk in self._chunks:
+            if self._timing:
+                time.sleep(max(0.0, offset - (time.perf_counter() - start)))
+            yield chunk
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        for offset, chunk in self._chunks:
+            if self._timing:
+                await asyncio.sleep(max(0.0, offset - (time.perf_counter() - start)))
+            yield chunk
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Serves the exchanges recorded in `path`, for httpx.Client and AsyncClient alike."""
+
+    def __init__(self, path: str, timing: bool = False):
+        self.timing = timing
+        self.served = 0
+        self.misses = 0
+        self._exchanges: Dict[str, Deque[Exchange]] = defaultdict(deque)
+        for exchange in load_exchanges(path):
+            self._exchanges[exchange.key].append(exchange)
+        self._lock = threading.Lock()
+
+    def _next(self, key: str) -> Optional[Exchange]:
+        with self._lock:
+            queue = self._exchanges.get(key)
+            if not queue:
+                self.misses += 1
+                return None
+            self.served += 1
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        key = _key(request)
+        exchange = self._next(key)
+        if exchange is None:
+            return httpx.Response(404, json={"error": {"message": f"No recorded response for {key}",
+                                                       "type": "replay_miss", "code": "replay_miss"}})
+        return httpx.Response(exchange.status, headers=exchange.headers,
+                              stream=_ReplayStream(exchange.chunks, self.timing))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        return self.handle_request(request)
+
+
+if __name__ == "__main__":
+    import sys
+
+    for exchange in load_exchanges(sys.argv[1]):
+        size = sum(len(chunk) for _, chunk in exchange.chunks)
+        last = exchange.chunks[-1][0] if exchange.chunks else 0.0
+        print(f"{exchange.status} {exchange.key}  {len(exchange.chunks)} chunks, {size} bytes, {last:.3f}s")
@@ -0,0 +1,239 @@
+"""
+Content-addressed cache for chat completions.
+
+The same prompts are re-sent on every run (the few-shot prompt_7, the
+strawberry prompts, the joke queries).  CachedClient sits in front of an
+OpenAI/Groq client and keys each request on a canonical hash of everything
+that changes the answer: model, messages, sampling params, tools and
+response_format.  Hits are served from an in-memory LRU tier, then from an
+on-disk SQLite tier, so repeated dev iterations cost no tokens.
+
+    client = CachedClient(openai.OpenAI(...), ResponseCache("cache.sqlite", ttl=24 * 3600))
+    client.chat.completions.create(model=..., messages=[...], temperature=0)
+    print(client.cache.stats)
+"""
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from providers import is_async_client
+
+# request options that do not change what the model returns
+_IGNORED_PARAMS = frozenset({"stream", "timeout", "extra_headers", "user"})
+
+
+def _canonical_default(value):
+    if isinstance(value, type) and hasattr(value, "model_json_schema"):
+        return value.model_json_schema()        # response_format=SomePydanticModel
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Cannot hash request value of type {type(value).__name__}")
+
+
+def cache_key(**request) -> str:
+    """sha256 of the canonical JSON form of a chat.completions request."""
+    payload = {k: v for k, v in request.items() if k not in _IGNORED_PARAMS and v is not None}
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                      default=_canonical_default)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expired: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / total if total else 0.0
+
+
+class ResponseCache:
+    """
+    Two-tier cache: OrderedDict LRU in memory, optional SQLite file on disk.
+
+    `ttl` (seconds) applies to both tiers; `max_entries` bounds the memory
+    tier and `max_disk_entries` the SQLite tier (least recently used rows go first).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024,
+                 max_disk_entries: int = 100_000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._memory = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts = 0
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._db.commit()
+
+    def get(self, key: str, loads=None) -> Any:
+        """
+        Return the cached value or None.  Disk hits are decoded with `loads`
+        (default: return the stored JSON text) and promoted to memory.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats.memory_hits += 1
+                    return value
+                del self._memory[key]
+                self.stats.expired += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    text, expires_at = row
+                    if expires_at is None or expires_at > now:
+                        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = loads(text) if loads is not None else text
+                        self._remember(key, expires_at, value)
+                        self.stats.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.stats.expired += 1
+
+            self.stats.misses += 1
+            return None
+
+    def put(self, key: str, value: Any, text: Optional[str] = None):
+        """Store `value` in memory and its JSON `text` on disk (when a disk tier is configured)."""
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is None:
+                return
+            if text is None:
+                text = value if isinstance(value, str) else json.dumps(value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, text, expires_at, time.time()),
+            )
+            self._puts += 1
+            if self._puts % 64 == 0:
+                self._evict_disk()
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _evict_disk(self):
+        now = time.time()
+        self._db.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        extra = count - self.max_disk_entries
+        if extra > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (extra,)
+            )
+            self.stats.evictions += extra
+
+
+class CachedClient:
+    """
+    Drop-in wrapper exposing `chat.completions.create` (sync or async, following
+    the wrapped client).  Streaming calls always go to the backend.
+
+    With `deterministic_only=True` only temperature-0 requests are cached;
+    otherwise every request is (handy while iterating on prompts).
+    """
+
+    def __init__(self, client, cache: Optional[ResponseCache] = None, deterministic_only: bool = False,
+                 response_type=None):
+        self.client = client
+        self.cache = cache if cache is not None else ResponseCache()
+        self.deterministic_only = deterministic_only
+        self._response_type = response_type
+        create = client.chat.completions.create
+        self._create = create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._acreate if is_async_client(client) else self._screate
+        ))
+
+    def _cacheable(self, kwargs) -> bool:
+        if kwargs.get("stream"):
+            return False
+        return not self.deterministic_only or kwargs.get("temperature") == 0
+
+    @staticmethod
+    def _copy(response):
+        # callers may mutate what they get back; the memory tier must keep its own object
+        if hasattr(response, "model_copy"):
+            return response.model_copy(deep=True)
+        return copy.deepcopy(response)
+
+    def _loads(self, text: str):
+        if self._response_type is None:
+            from openai.types.chat import ChatCompletion
+            self._response_type = ChatCompletion
+        return self._response_type.model_validate_json(text)
+
+    def _screate(self, **kwargs):
+        if not self._cacheable(kwargs):
+            return self._create(**kwargs)
+        key = cache_key(**kwargs)
+        response = self.cache.get(key, loads=self._loads)
+        if response is not None:
+            return self._copy(response)
+        response = self._create(**kwargs)
+        self.cache.put(key, self._copy(response), response.model_dump_json())
+        return response
+
+    async def _acreate(self, **kwargs):
+        if not self._cacheable(kwargs):
+            return await self._create(**kwargs)
+        key = cache_key(**kwargs)
+        response = self.cache.get(key, loads=self._loads)
+        if response is not None:
+            return self._copy(response)
+        response = await self._create(**kwargs)
+        self.cache.put(key, self._copy(response), response.model_dump_json())
+        return response
+
+    def stats(self) -> dict:
+        return asdict(self.cache.stats)
@@ -0,0 +1,211 @@
+"""
+Reasoning / answer stream demultiplexer.
+
+Reasoning shows up in three shapes across the backends used here:
+  - vLLM with --reasoning-parser: delta.reasoning_content
+  - Groq with reasoning_format="parsed": delta.reasoning
+  - Groq reasoning_format="raw", Qwen3 through MLX: inline <think>...</think> in the content
+
+StreamDemux normalises all three into two async iterators, `reasoning()` and
+`answer()`, and records per-channel timing so we can see what a thinking
+budget costs in latency.
+
+    demux = StreamDemux(stream)          # OpenAI/Groq chunks, or plain text deltas
+    async for text in demux.answer():
+        print(text, end="")
+    print(demux.metrics)
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+REASONING = "reasoning"
+ANSWER = "answer"
+_OPEN, _CLOSE = "<think>", "</think>"
+_DONE = object()
+
+
+@dataclass
+class ChannelMetrics:
+    first_token_s: Optional[float] = None   # since the request started
+    last_token_s: Optional[float] = None
+    chunks: int = 0
+    chars: int = 0
+
+    @property
+    def chunks_per_s(self) -> Optional[float]:
+        """Delta chunks per second after the first; about tokens/s, as servers send one token per chunk."""
+        if self.chunks < 2 or self.last_token_s == self.first_token_s:
+            return None
+        return (self.chunks - 1) / (self.last_token_s - self.first_token_s)
+
+
+@dataclass
+class DemuxMetrics:
+    reasoning: ChannelMetrics
+    answer: ChannelMetrics
+    total_s: Optional[float] = None
+    reasoning_tokens: Optional[int] = None   # from usage when the server reports it, else chunk count
+
+    @property
+    def ttft_reasoning(self) -> Optional[float]:
+        return self.reasoning.first_token_s
+
+    @property
+    def ttft_answer(self) -> Optional[float]:
+        return self.answer.first_token_s
+
+
+class _InlineThinkSplitter:
+    """Splits text deltas on <think> tags, holding back partial tags at chunk edges."""
+
+    def __init__(self):
+        self.in_think = False
+        self._held = ""
+
+    def feed(self, text: str):
+        text = self._held + text
+        self._held = ""
+        out = []
+        while text:
+            tag = _CLOSE if self.in_think else _OPEN
+            at = text.find(tag)
+            if at >= 0:
+                if at:
+                    out.append((REASONING if self.in_think else ANSWER, text[:at]))
+                self.in_think = not self.in_think
+                text = text[at + len(tag):]
+                continue
+            keep = 0
+            for size in range(min(len(tag) - 1, len(text)), 0, -1):
+                if tag.startswith(text[-size:]):
+                    keep = size
+                    break
+            if keep:
+                self._held = text[-keep:]
+                text = text[:-keep]
+            if text:
+                out.append((REASONING if self.in_think else ANSWER, text))
+            break
+        return out
+
+    def flush(self):
+        held, self._held = self._held, ""
+        return [(REASONING if self.in_think else ANSWER, held)] if held else []
+
+
+class StreamDemux:
+    """
+    Consume a completion stream (sync or async iterable of chunks or strings)
+    into separate reasoning and answer channels.  Iterating either channel
+    starts the pump.  Text of a channel nobody is reading is still timed and
+    stays queued, so it can be read after the other one; with
+    keep_reasoning=False the reasoning text is timed but not queued.
+    """
+
+    def __init__(self, stream, start_time: Optional[float] = None, keep_reasoning: bool = True):
+        self.stream = stream
+        self.start = start_time if start_time is not None else time.perf_counter()
+        self.keep_reasoning = keep_reasoning
+        self.metrics = DemuxMetrics(ChannelMetrics(), ChannelMetrics())
+        self._queues = {REASONING: asyncio.Queue(), ANSWER: asyncio.Queue()}
+        self._splitter = _InlineThinkSplitter()
+        self._task = None
+        self._error = None
+
+    def reasoning(self) -> AsyncIterator[str]:
+        return self._channel(REASONING)
+
+    def answer(self) -> AsyncIterator[str]:
+        return self._channel(ANSWER)
+
+    async def collect(self):
+        """Drain the stream; returns (reasoning_text, answer_text)."""
+        reasoning, answer = await asyncio.gather(self._join(REASONING), self._join(ANSWER))
+        return reasoning, answer
+
+    async def _join(self, channel):
+        return "".join([text async for text in self._channel(channel)])
+
+    async def _channel(self, channel):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._pump())
+        queue = self._queues[channel]
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            yield item
+        await self._task
+        if self._error is not None:
+            raise self._error
+
+    def _emit(self, channel, text, at: Optional[float] = None):
+        if not text:
+            return
+        now = (at if at is not None else time.perf_counter()) - self.start
+        metrics = self.metrics.reasoning if channel == REASONING else self.metrics.answer
+        if metrics.first_token_s is None:
+            metrics.first_token_s = now
+        metrics.last_token_s = now
+        metrics.chunks += 1
+        metrics.chars += len(text)
+        if channel == ANSWER or self.keep_reasoning:
+            self._queues[channel].put_nowait(text)
+
+    def _handle(self, chunk, at: Optional[float] = None):
+        """`at`: perf_counter() when the chunk arrived, if earlier than now."""
+        if isinstance(chunk, str):
+            for channel, text in self._splitter.feed(chunk):
+                self._emit(channel, text, at)
+            return
+        usage = getattr(chunk, "usage", None)
+        details = getattr(usage, "completion_tokens_details", None)
+        if getattr(details, "reasoning_tokens", None):
+            self.metrics.reasoning_tokens = details.reasoning_tokens
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+        reasoning = getattr(delta, "reasoning_content", None) or getattr(delta, "reasoning", None)
+        if reasoning:
+            self._emit(REASONING, reasoning, at)
+        if delta.content:
+            for channel, text in self._splitter.feed(delta.content):
+                self._emit(channel, text, at)
+
+    async def _pump(self):
+        try:
+            if hasattr(self.stream, "__aiter__"):
+                async for chunk in self.stream:
+                    self._handle(chunk)
+            else:
+                # one thread drains the sync iterator and stamps each chunk as it arrives;
+                # a thread hop per chunk would add its own latency to every timing
+                loop = asyncio.get_running_loop()
+                arrivals = asyncio.Queue()
+
+                def drain():
+                    try:
+                        for chunk in self.stream:
+                            loop.call_soon_threadsafe(arrivals.put_nowait, (chunk, time.perf_counter()))
+                    finally:
+                        loop.call_soon_threadsafe(arrivals.put_nowait, (_DONE, None))
+
+                reader = asyncio.ensure_future(asyncio.to_thread(drain))
+                while True:
+                    chunk, at = await arrivals.get()
+                    if chunk is _DONE:
+                        break
+                    self._handle(chunk, at)
+                await reader
+            for channel, text in self._splitter.flush():
+                self._emit(channel, text)
+        except Exception as e:
+            self._error = e
+        finally:
+            self.metrics.total_s = time.perf_counter() - self.start
+            if self.metrics.reasoning_tokens is None:
+                self.metrics.reasoning_tokens = self.metrics.reasoning.chunks
+            for queue in self._queues.values():
+                queue.put_nowait(_DONE)
@@ -0,0 +1,39 @@
+import asyncio
+
+from openai import AsyncOpenAI
+
+from batch_runner import run_batch
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig, fixed
+from rate_limiter import RateLimiter
+
+PROMPTS = [f"question {i}" for i in range(6)]
+
+
+def test_results_in_input_order_and_permits_completed():
+    with FakeOpenAIServer() as server:
+        client = AsyncOpenAI(api_key="EMPTY", base_url=server.base_url, max_retries=0)
+        limiter = RateLimiter(requests_per_minute=600)
+        results = asyncio.run(run_batch(client, PROMPTS, max_concurrency=2, limiter=limiter, model="fake"))
+    assert [r.index for r in results] == list(range(len(PROMPTS)))
+    assert all(r.ok and r.content for r in results)
+    stats = limiter.stats()
+    assert stats["granted"] == len(PROMPTS) and stats["in_flight"] == 0
+
+
+def test_cancelled_batch_releases_its_permits():
+    with FakeOpenAIServer(FakeServerConfig(latency=fixed(2.0))) as server:
+        client = AsyncOpenAI(api_key="EMPTY", base_url=server.base_url, max_retries=0)
+        limiter = RateLimiter()                     # no limits given: probes with one call in flight
+
+        async def cancel_midway():
+            task = asyncio.ensure_future(run_batch(client, PROMPTS, limiter=limiter, model="fake"))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(cancel_midway())
+    stats = limiter.stats()
+    assert stats["granted"] == 1
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
+    # the probe came back (cancelled), so the next caller is not stuck behind it
+    assert limiter.acquire(tokens=1, timeout=0.5) is not None
@@ -0,0 +1,24 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig
+
+
+def test_concurrent_requests_each_get_their_own_latency_draw():
+    draws, lock = [], threading.Lock()
+
+    def latency(rng, request):
+        with lock:
+            draws.append(rng.random())
+        return 0.05
+
+    with FakeOpenAIServer(FakeServerConfig(latency=latency, seed=7)) as server:
+        client = OpenAI(api_key="EMPTY", base_url=server.base_url, max_retries=0)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda i: client.chat.completions.create(
+                model="fake", messages=[{"role": "user", "content": f"q{i}"}]), range(16)))
+    expected = [random.Random(f"7:latency:{counter}").random() for counter in range(1, 17)]
+    assert sorted(draws) == sorted(expected)
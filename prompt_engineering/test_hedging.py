@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from hedging import Hedger
+
+
+class Backend:
+    """astream() yields one text delta after `delays[i]` seconds for the i-th call."""
+
+    def __init__(self, name, delays):
+        self.provider, self.model = name, None
+        self.delays = list(delays)
+        self.calls = 0
+
+    async def astream(self, messages, **kwargs):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        yield f"{self.provider} answer"
+
+
+def run(hedger, calls=1):
+    async def go():
+        texts = [await hedger.atext("hi") for _ in range(calls)]
+        await hedger.drain()
+        return texts
+    return asyncio.run(go())
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = Hedger([Backend("a", [0.01]), Backend("b", [0.01])], initial_deadline=0.2)
+    assert run(hedger, 3) == ["a answer"] * 3
+    stats = hedger.stats()
+    assert stats["hedged"] == 0 and stats["saved_total_s"] == 0.0
+    assert hedger.last_outcome.saved_s is None
+
+
+def test_backup_win_measures_the_saving():
+    hedger = Hedger([Backend("a", [0.5]), Backend("b", [0.05])], initial_deadline=0.1, min_deadline=0.1)
+    assert run(hedger) == ["b answer"]
+    outcome = hedger.last_outcome
+    assert outcome.hedged and outcome.backup_won and outcome.saved_exact
+    # primary answers at ~0.5s, the backup at ~0.1 + 0.05s
+    assert outcome.saved_s == pytest.approx(0.35, abs=0.1)
+    assert hedger.stats()["saved_p50_s"] == pytest.approx(0.35, abs=0.1)
+
+
+def test_primary_slower_than_watch_gives_a_lower_bound():
+    hedger = Hedger([Backend("a", [5.0]), Backend("b", [0.01])], initial_deadline=0.05, min_deadline=0.05,
+                    watch=0.2)
+    assert run(hedger) == ["b answer"]
+    outcome = hedger.last_outcome
+    assert not outcome.saved_exact
+    assert outcome.saved_s == pytest.approx(0.2, abs=0.1)
+    assert hedger.stats()["saved_lower_bounds"] == 1
+
+
+def test_primary_winning_after_a_hedge_saves_nothing():
+    hedger = Hedger([Backend("a", [0.15]), Backend("b", [1.0])], initial_deadline=0.1, min_deadline=0.1)
+    assert run(hedger) == ["a answer"]
+    outcome = hedger.last_outcome
+    assert outcome.hedged and not outcome.backup_won and outcome.saved_s == 0.0
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+from openai import APIConnectionError, AsyncOpenAI, OpenAI
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig
+from instrumentation import CallRecord, CallRecorder, InstrumentedClient, JsonlExporter, usage_counts, write_prometheus
+
+MESSAGES = [{"role": "user", "content": "Tell me a joke"}]
+USAGE = {"stream_options": {"include_usage": True}}
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeOpenAIServer(FakeServerConfig(reasoning_tokens=5, completion_tokens=12)) as server:
+        yield server
+
+
+def client(server, recorder, asynchronous=False):
+    cls = AsyncOpenAI if asynchronous else OpenAI
+    return InstrumentedClient(cls(api_key="EMPTY", base_url=server.base_url, max_retries=0),
+                              provider="vllm", recorder=recorder, key_id="k1")
+
+
+def test_usage_counts():
+    assert usage_counts(None) == (0, 0, 0)
+    assert usage_counts({"input_tokens": 3, "output_tokens": 4, "output_token_details": {"reasoning": 2}}) == (3, 4, 2)
+
+
+def test_sync_call_and_stream_are_recorded(server):
+    recorder = CallRecorder()
+    llm = client(server, recorder)
+    response = llm.chat.completions.create(model="fake", messages=MESSAGES)
+    rec = llm.last_record
+    assert (rec.source, rec.provider, rec.model, rec.key_id) == ("openai", "vllm", "fake", "k1")
+    assert (rec.prompt_tokens, rec.completion_tokens) == (response.usage.prompt_tokens,
+                                                         response.usage.completion_tokens)
+    assert rec.ttft_s is None and rec.latency_s > 0
+
+    stream = llm.chat.completions.create(model="fake", messages=MESSAGES, stream=True, **USAGE)
+    assert stream.response.status_code == 200                     # the SDK Stream is still reachable
+    assert recorder.written == 1                                  # nothing recorded before the stream ends
+    chunks = list(stream)
+    rec = llm.last_record
+    assert recorder.written == 2 and chunks
+    assert rec.completion_tokens == chunks[-1].usage.completion_tokens and 0 < rec.ttft_s <= rec.latency_s
+
+
+def test_closed_stream_is_recorded_once(server):
+    recorder = CallRecorder()
+    llm = client(server, recorder)
+    with llm.chat.completions.create(model="fake", messages=MESSAGES, stream=True) as stream:
+        next(stream)
+    stream.close()
+    assert recorder.written == 1 and recorder.records()[0].ttft_s is not None
+
+
+def test_async_client_is_recorded(server):
+    recorder = CallRecorder()
+    llm = client(server, recorder, asynchronous=True)
+
+    async def calls():
+        await llm.chat.completions.create(model="fake", messages=MESSAGES)
+        stream = await llm.chat.completions.create(model="fake", messages=MESSAGES, stream=True, **USAGE)
+        texts = [c.choices[0].delta.content or "" async for c in stream if c.choices]
+        early = await llm.chat.completions.create(model="fake", messages=MESSAGES, stream=True)
+        async with early:
+            await early.__anext__()
+        return texts
+
+    assert "".join(asyncio.run(calls()))
+    first, streamed, closed = recorder.records()
+    assert first.completion_tokens and first.ttft_s is None
+    assert streamed.completion_tokens and streamed.ttft_s is not None
+    assert closed.ttft_s is not None and closed.error is None
+
+
+def test_errors_are_recorded():
+    recorder = CallRecorder()
+    llm = InstrumentedClient(OpenAI(api_key="EMPTY", base_url="http://127.0.0.1:1/v1", max_retries=0),
+                             provider="vllm", recorder=recorder)
+    with pytest.raises(APIConnectionError):
+        llm.chat.completions.create(model="fake", messages=MESSAGES)
+    assert "APIConnectionError" in recorder.records()[0].error
+
+
+def test_ring_buffer_and_jsonl_export(tmp_path):
+    recorder = CallRecorder(capacity=3)
+    exporter = JsonlExporter(str(tmp_path / "calls.jsonl"))
+    for i in range(2):
+        recorder.record(CallRecord(started_at=i, source="test", model="m", latency_s=0.2))
+    assert exporter.export(recorder) == 2
+    for i in range(2, 7):
+        recorder.record(CallRecord(started_at=i, source="test", model="m", latency_s=0.2))
+    assert exporter.export(recorder) == 3 and exporter.dropped == 2          # 2 and 3 were overwritten
+    assert exporter.export(recorder) == 0
+    lines = [json.loads(line) for line in (tmp_path / "calls.jsonl").open()]
+    assert [line["started_at"] for line in lines] == [0, 1, 4, 5, 6]
+
+
+def test_prometheus_text(tmp_path):
+    recorder = CallRecorder()
+    recorder.record(CallRecord(0, "test", "groq", "m", latency_s=0.3, ttft_s=0.07, prompt_tokens=10,
+                               completion_tokens=5, retries=1))
+    rec = recorder.record(CallRecord(0, "test", "groq", "m", latency_s=20.0, error="boom"))
+    recorder.note_parse(rec, "repair")
+    text = recorder.prometheus_text()
+    labels = 'provider="groq",model="m"'
+    for line in (f"llm_calls_total{{{labels}}} 2", f"llm_call_errors_total{{{labels}}} 1",
+                 f"llm_retries_total{{{labels}}} 1", f'llm_tokens_total{{{labels},kind="prompt"}} 10',
+                 f'llm_call_latency_seconds_bucket{{{labels},le="0.5"}} 1',
+                 f'llm_call_latency_seconds_bucket{{{labels},le="30.0"}} 2',
+                 f'llm_call_latency_seconds_bucket{{{labels},le="+Inf"}} 2',
+                 f"llm_ttft_seconds_count{{{labels}}} 1",
+                 f'llm_parse_tier_total{{{labels},tier="repair"}} 1'):
+        assert line in text.splitlines()
+    assert rec.parse_tier == "repair"
+    path = tmp_path / "llm.prom"
+    write_prometheus(recorder, str(path))
+    assert path.read_text() == text
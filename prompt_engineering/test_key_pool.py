@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig
+from key_pool import KeyPool, KeysExhausted, parse_duration
+
+MESSAGES = [{"role": "user", "content": "Tell me a joke"}]
+KEYS = {"k1": "key-1", "k2": "key-2", "k3": "key-3"}
+
+
+@pytest.mark.parametrize("value, seconds", [("7.66s", 7.66), ("2m59.56s", 179.56), ("120ms", 0.12), ("30", 30.0),
+                                            ("soon", None), (None, None)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds) if seconds is not None else parse_duration(value) is None
+
+
+def test_requests_rotate_over_the_keys():
+    with FakeOpenAIServer(FakeServerConfig(requests_per_minute=100)) as server:
+        pool = KeyPool(KEYS, server.base_url)
+        for _ in range(6):
+            pool.chat(model="fake", messages=MESSAGES)
+        stats = pool.stats()
+    assert [s["requests"] for s in stats.values()] == [2, 2, 2]
+    assert [s["remaining_requests"] for s in stats.values()] == [98, 98, 98]     # from x-ratelimit headers
+
+
+def test_peek_does_not_count_or_rotate():
+    pool = KeyPool(KEYS, "http://127.0.0.1:1/v1")
+    assert pool.peek() is pool.peek() is pool.keys[0]
+    pool.mark_rate_limited(pool.keys[0], {"retry-after": "30"})
+    pool.mark_rate_limited(pool.keys[1], {"retry-after": "10"})
+    assert pool.peek() is pool.keys[2]
+    pool.mark_rate_limited(pool.keys[2], {"retry-after": "20"})
+    assert pool.peek() is pool.keys[1]                   # all cooling: the one that frees up first
+    assert all(s["requests"] == 0 for s in pool.stats().values())
+
+
+def test_429_puts_the_key_on_cooldown():
+    config = FakeServerConfig(requests_per_minute=1, rate_limit_window=30.0)
+    with FakeOpenAIServer(config) as server:
+        pool = KeyPool(KEYS, server.base_url, max_wait=0.5)
+        for _ in range(3):
+            pool.chat(model="fake", messages=MESSAGES)
+        # every key has used its request: each answers 429 with retry-after ~30s and
+        # the pool gives up instead of waiting longer than max_wait
+        with pytest.raises(KeysExhausted) as error:
+            pool.chat(model="fake", messages=MESSAGES)
+        assert error.value.retry_in > 20
+        assert [s["rate_limited"] for s in pool.stats().values()] == [1, 1, 1]
+        assert server.stats.rate_limited == 3
+
+
+def test_injected_429_moves_the_call_to_the_next_key():
+    with FakeOpenAIServer(FakeServerConfig(fail_every=2, retry_after=30.0)) as server:
+        pool = KeyPool(KEYS, server.base_url)
+        pool.chat(model="fake", messages=MESSAGES)                 # k1
+        pool.chat(model="fake", messages=MESSAGES)                 # k2 gets the 429, k3 answers
+        assert pool.stats()["k2"]["rate_limited"] == 1
+        pool.chat(model="fake", messages=MESSAGES)                 # k1 gets the 429; k2 is cooling down: k3
+        stats = pool.stats()
+        assert [s["requests"] for s in stats.values()] == [2, 1, 2]
+        assert [s["rate_limited"] for s in stats.values()] == [1, 1, 0]
+
+
+def test_async_chat_and_clients_built_once():
+    with FakeOpenAIServer() as server:
+        pool = KeyPool(KEYS, server.base_url)
+
+        async def calls():
+            return await asyncio.gather(*(pool.achat(model="fake", messages=MESSAGES) for _ in range(6)))
+
+        assert len(asyncio.run(calls())) == 6
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(pool.client(pool.keys[0]))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(client) for client in clients}) == 1
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig
+from key_pool import KeyPool
+from llm_client import LLMClient, PoolConfig, aclose_pools, shared_http_client
+
+MESSAGES = [{"role": "user", "content": "Tell me a joke"}]
+
+
+def text(chunks) -> str:
+    return "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+
+
+async def atext(stream) -> str:
+    return text([chunk async for chunk in stream])
+
+
+def test_async_client_survives_repeated_asyncio_run():
+    with FakeOpenAIServer() as server:
+        llm = LLMClient("vllm", model="fake", base_url=server.base_url, api_key="EMPTY")
+
+        async def call():
+            response = await llm.achat(MESSAGES)
+            return response.choices[0].message.content, shared_http_client(server.base_url, asynchronous=True)
+
+        first, first_pool = asyncio.run(call())
+        second, second_pool = asyncio.run(call())
+        assert first == second
+        assert first_pool is not second_pool
+
+
+def test_aclose_pools_closes_the_running_loops_pools():
+    async def run():
+        pool = shared_http_client("http://127.0.0.1:1/v1", asynchronous=True)
+        await aclose_pools()
+        return pool, shared_http_client("http://127.0.0.1:1/v1", asynchronous=True)
+
+    closed, fresh = asyncio.run(run())
+    assert closed.is_closed and fresh is not closed
+
+
+def test_key_pool_stream_waits_for_a_key():
+    config = FakeServerConfig(requests_per_minute=1, rate_limit_window=0.5)
+    with FakeOpenAIServer(config) as server:
+        pool = KeyPool({"k1": "key-1", "k2": "key-2"}, server.base_url)
+        llm = LLMClient("vllm", model="fake", base_url=server.base_url, key_pool=pool)
+        start = time.perf_counter()
+        answers = [text(llm.stream(MESSAGES)) for _ in range(3)]
+        assert all(answers)
+        assert time.perf_counter() - start > 0.3           # the third call waited for a key to reset
+
+
+def test_key_pool_astream_moves_on_after_429():
+    with FakeOpenAIServer(FakeServerConfig(fail_every=2, retry_after=30.0)) as server:
+        pool = KeyPool({"k1": "key-1", "k2": "key-2"}, server.base_url)
+        llm = LLMClient("vllm", model="fake", base_url=server.base_url, key_pool=pool)
+
+        async def calls():
+            return [await atext(llm.astream(MESSAGES)) for _ in range(2)]
+
+        assert all(asyncio.run(calls()))
+        stats = pool.stats()
+        assert stats["k2"]["rate_limited"] == 1              # second request got the injected 429
+        assert server.stats.requests == 3
+
+
+def test_raw_chat_waits_for_a_key_and_moves_on_after_429():
+    config = FakeServerConfig(requests_per_minute=1, rate_limit_window=0.5)
+    with FakeOpenAIServer(config) as server:
+        pool = KeyPool({"k1": "key-1", "k2": "key-2"}, server.base_url)
+        llm = LLMClient("vllm", model="fake", base_url=server.base_url, key_pool=pool)
+        answers = [llm.raw_chat(MESSAGES)["choices"][0]["message"]["content"] for _ in range(3)]
+        assert all(answers)
+
+
+def test_key_pool_non_chat_access_spends_no_quota_and_uses_the_clients_pool():
+    with FakeOpenAIServer() as server:
+        pool = KeyPool({"k1": "key-1", "k2": "key-2"}, server.base_url)
+        pool.keys[0].remaining_requests = 1
+        config = PoolConfig(max_connections=4)
+        llm = LLMClient("vllm", model="fake", base_url=server.base_url, key_pool=pool, pool=config)
+        assert llm.list_models() == ["fake"]
+        assert llm.client is llm.client
+        assert pool.stats()["k1"]["requests"] == 0 and pool.keys[0].remaining_requests == 1
+        assert llm.client._client is shared_http_client(server.base_url, config)
+        llm.chat(MESSAGES)
+        assert pool.client(pool.keys[0], config)._client is shared_http_client(server.base_url, config)
+        assert pool.stats()["k1"]["requests"] == 1
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rate_limiter import RateLimiter, RateLimitTimeout, estimate_tokens
+
+
+def waiting(limiter, count, timeout=2.0):
+    """Block until `count` callers are queued."""
+    deadline = time.monotonic() + timeout
+    while limiter.stats()["waiting"] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens(None, 100) == 100
+    assert estimate_tokens("x" * 400) == estimate_tokens([{"role": "user", "content": "x" * 400}]) > 100
+
+
+def test_request_bucket_holds_the_headroom_and_refills_at_the_rest():
+    # 20 per second: the bucket holds 20% (4 calls) and refills at 16 per second
+    limiter = RateLimiter(requests_per_minute=20, window=1.0, headroom=0.2)
+    assert [limiter.acquire().waited for _ in range(4)] == pytest.approx([0] * 4, abs=0.03)
+    assert limiter.acquire().waited == pytest.approx(1 / 16, abs=0.04)
+    stats = limiter.stats()
+    assert stats["granted"] == 5 and stats["queued"] == 1 and stats["in_flight"] == 5
+
+
+def test_token_bucket_charges_the_estimate_and_corrects_it_with_usage():
+    limiter = RateLimiter(tokens_per_minute=1000, window=1.0, headroom=0.1)      # holds 100, refills 900/s
+    permit = limiter.acquire(tokens=100)
+    assert permit.waited < 0.01
+    limiter.complete(permit, {"usage": {"prompt_tokens": 20, "completion_tokens": 10}})
+    assert limiter.acquire(tokens=60).waited < 0.01                               # 70 tokens were refunded
+    # a call larger than the bucket waits for a full one and goes into debt
+    big = limiter.acquire(tokens=250)
+    assert big.waited == pytest.approx((100 - 10) / 900, abs=0.03)
+    assert limiter._tokens.level < 0
+
+
+def test_remaining_headers_pull_the_buckets_down():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60000)
+    in_flight = limiter.acquire(tokens=100)
+    permit = limiter.acquire(tokens=100)
+    limiter.complete(permit, headers={"x-ratelimit-remaining-requests": "5", "x-ratelimit-remaining-tokens": "400"})
+    assert limiter._requests.level == 5 - 1           # the other call still in flight is not in `remaining` yet
+    assert limiter._tokens.level == 400 - in_flight.tokens
+
+
+def test_exhausted_quota_blocks_until_the_reset():
+    limiter = RateLimiter(requests_per_minute=600)
+    limiter.complete(limiter.acquire(), headers={"x-ratelimit-remaining-requests": "0",
+                                                 "x-ratelimit-reset-requests": "0.2s"})
+    assert limiter.acquire().waited == pytest.approx(0.2, abs=0.05)
+
+
+def test_limits_are_learned_from_the_first_response():
+    limiter = RateLimiter()                            # no limits: one call at a time until headers arrive
+    first = limiter.acquire()
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(timeout=0.05)
+    limiter.complete(first, headers={"x-ratelimit-limit-requests": "6000", "x-ratelimit-limit-tokens": "100000"})
+    assert limiter.limits == (6000, 100000)
+    assert [limiter.acquire().waited for _ in range(3)] == pytest.approx([0] * 3, abs=0.03)
+
+
+def test_429_cools_down_and_slows_the_refill_until_calls_succeed():
+    limiter = RateLimiter(requests_per_minute=6000, recovery=0.1, default_cooldown=0.01)
+    limiter.complete(limiter.acquire(), headers={"retry-after": "0.15"}, rate_limited=True)
+    stats = limiter.stats()
+    assert stats["rate_limited"] == 1 and stats["rate_factor"] == 0.75
+    permit = limiter.acquire()
+    assert permit.waited == pytest.approx(0.15, abs=0.05)
+    limiter.complete(permit, {"usage": {"prompt_tokens": 1, "completion_tokens": 1}})
+    assert limiter.stats()["rate_factor"] == 0.85
+    for _ in range(5):
+        limiter.complete(limiter.acquire(), headers={}, rate_limited=True)
+    assert limiter.stats()["rate_factor"] == limiter.min_rate_factor
+
+
+def test_queue_serves_priority_then_arrival_order():
+    limiter = RateLimiter()                            # probing: one call in flight at a time
+    first = limiter.acquire()
+    order = []
+
+    def call(label, priority):
+        permit = limiter.acquire(priority=priority)
+        order.append(label)
+        limiter.complete(permit)
+
+    threads = []
+    for count, (label, priority) in enumerate([("low-1", 5), ("high-1", 0), ("low-2", 5), ("high-2", 0)], 1):
+        threads.append(threading.Thread(target=call, args=(label, priority)))
+        threads[-1].start()
+        waiting(limiter, count)
+    limiter.complete(first)
+    for thread in threads:
+        thread.join(2)
+    assert order == ["high-1", "high-2", "low-1", "low-2"]
+    assert set(limiter.stats()["by_priority"]) == {0, 5}
+
+
+def test_large_head_is_not_overtaken_by_smaller_calls():
+    limiter = RateLimiter(tokens_per_minute=1000, window=5.0, headroom=0.1)      # holds 100, refills 180/s
+    limiter.acquire(tokens=100)
+    order = []
+
+    def call(label, tokens):
+        limiter.acquire(tokens=tokens)
+        order.append(label)
+
+    threads = []
+    for count, (label, tokens) in enumerate([("large", 100), ("small", 1)], 1):
+        threads.append(threading.Thread(target=call, args=(label, tokens)))
+        threads[-1].start()
+        waiting(limiter, count)
+    for thread in threads:
+        thread.join(2)
+    assert order == ["large", "small"]
+
+
+def test_timeout_leaves_the_queue():
+    limiter = RateLimiter()
+    limiter.acquire()
+    with pytest.raises(RateLimitTimeout) as info:
+        limiter.acquire(timeout=0.05)
+    assert info.value.waited >= 0.05
+
+    async def timed_out():
+        with pytest.raises(RateLimitTimeout):
+            await limiter.aacquire(timeout=0.05)
+
+    asyncio.run(timed_out())
+    stats = limiter.stats()
+    assert stats["timeouts"] == 2 and stats["waiting"] == 0 and stats["granted"] == 1
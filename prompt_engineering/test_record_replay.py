@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig
+from record_replay import RecordingTransport, ReplayTransport, load_exchanges
+
+REQUESTS = [
+    {"model": "fake", "messages": [{"role": "user", "content": "Tell me a joke"}]},
+    {"model": "fake", "messages": [{"role": "user", "content": "Tell me a joke"}], "stream": True},
+    # the same request with its keys in another order: matched to the same recording, replayed in order
+    {"stream": True, "messages": [{"content": "Tell me a joke", "role": "user"}], "model": "fake"},
+]
+
+
+def sync_bodies(client):
+    bodies = []
+    for request in REQUESTS:
+        with client.chat.completions.with_streaming_response.create(**request) as response:
+            bodies.append(b"".join(response.iter_bytes()))
+    return bodies
+
+
+async def async_bodies(client):
+    bodies = []
+    for request in REQUESTS:
+        async with client.chat.completions.with_streaming_response.create(**request) as response:
+            bodies.append(b"".join([chunk async for chunk in response.iter_bytes()]))
+    return bodies
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeOpenAIServer(FakeServerConfig(tokens_per_second=500, completion_tokens=20)) as server:
+        yield server
+
+
+def test_sync_replay_is_byte_identical(server, tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    transport = RecordingTransport(path)
+    with httpx.Client(transport=transport) as http_client:
+        recorded = sync_bodies(OpenAI(api_key="secret-key", base_url=server.base_url, http_client=http_client))
+    assert transport.recorded == len(REQUESTS)
+    exchanges = list(load_exchanges(path))
+    assert len(exchanges[1].chunks) > 1                          # SSE chunk boundaries are kept
+    assert "secret-key" not in str([e.headers for e in exchanges])
+
+    replay = ReplayTransport(path)
+    requests = server.stats.requests
+    with httpx.Client(transport=replay) as http_client:
+        replayed = sync_bodies(OpenAI(api_key="replay", base_url=server.base_url, http_client=http_client))
+    assert replayed == recorded and all(recorded)
+    assert server.stats.requests == requests and replay.served == len(REQUESTS)
+
+
+def test_async_replay_is_byte_identical(server, tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+
+    async def record():
+        async with httpx.AsyncClient(transport=RecordingTransport(path)) as http_client:
+            return await async_bodies(AsyncOpenAI(api_key="key", base_url=server.base_url, http_client=http_client))
+
+    async def replay():
+        async with httpx.AsyncClient(transport=ReplayTransport(path, timing=True)) as http_client:
+            return await async_bodies(AsyncOpenAI(api_key="key", base_url=server.base_url, http_client=http_client))
+
+    recorded = asyncio.run(record())
+    assert asyncio.run(replay()) == recorded and all(recorded)
+
+
+def test_unrecorded_request_is_a_404(server, tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    transport = RecordingTransport(path)
+    transport.close()
+    replay = ReplayTransport(path)
+    client = OpenAI(api_key="replay", base_url=server.base_url, max_retries=0,
+                    http_client=httpx.Client(transport=replay))
+    with pytest.raises(Exception, match="No recorded response"):
+        client.chat.completions.create(**REQUESTS[0])
+    assert replay.misses == 1
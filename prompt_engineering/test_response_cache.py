@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from fake_openai_server import FakeOpenAIServer
+from response_cache import CachedClient, ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Tell me a joke"}]
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+def test_sync_call_is_cached(server):
+    client = CachedClient(OpenAI(api_key="EMPTY", base_url=server.base_url))
+    first = client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+    second = client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert client.cache.stats.misses == 1
+    assert client.cache.stats.memory_hits == 1
+
+
+def test_async_call_is_cached(server):
+    client = CachedClient(AsyncOpenAI(api_key="EMPTY", base_url=server.base_url))
+
+    async def calls():
+        first = await client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+        second = await client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+        return first, second
+
+    requests = server.stats.requests
+    first, second = asyncio.run(calls())
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert server.stats.requests == requests + 1
+    assert client.cache.stats.memory_hits == 1
+
+
+def test_memory_tier_is_not_shared_with_callers(server):
+    client = CachedClient(OpenAI(api_key="EMPTY", base_url=server.base_url), ResponseCache())
+    first = client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+    content = first.choices[0].message.content
+    first.choices[0].message.content = "mutated"
+    second = client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+    assert second.choices[0].message.content == content
+    second.choices[0].message.content = "mutated again"
+    third = client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+    assert third.choices[0].message.content == content
+
+
+def test_disk_tier_survives_a_new_cache(server, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    client = CachedClient(OpenAI(api_key="EMPTY", base_url=server.base_url), ResponseCache(path))
+    first = client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+    client.cache.close()
+    client = CachedClient(OpenAI(api_key="EMPTY", base_url=server.base_url), ResponseCache(path))
+    second = client.chat.completions.create(model="fake", messages=MESSAGES, temperature=0)
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert client.cache.stats.disk_hits == 1
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig
+from stream_demux import StreamDemux
+
+MESSAGES = [{"role": "user", "content": "Tell me a joke"}]
+
+
+def test_inline_think_tags_split_across_chunks():
+    chunks = ["<thi", "nk>let me ", "think</th", "ink>The answer", " is 4", "<"]
+    reasoning, answer = asyncio.run(StreamDemux(chunks).collect())
+    assert reasoning == "let me think"
+    assert answer == "The answer is 4<"
+
+
+
+def test_unread_channel_stays_queued_unless_dropped():
+    chunks = ["<think>plan</think>", "answer"]
+
+    async def answer_then_reasoning(demux):
+        answer = "".join([text async for text in demux.answer()])
+        return answer, "".join([text async for text in demux.reasoning()])
+
+    assert asyncio.run(answer_then_reasoning(StreamDemux(chunks))) == ("answer", "plan")
+    demux = StreamDemux(chunks, keep_reasoning=False)
+    assert asyncio.run(answer_then_reasoning(demux)) == ("answer", "")
+    assert demux.metrics.reasoning.chars == len("plan")
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeOpenAIServer(FakeServerConfig(tokens_per_second=200, reasoning_tokens=10, completion_tokens=20)) as server:
+        yield server
+
+
+def test_sync_stream_timings(server):
+    client = OpenAI(api_key="EMPTY", base_url=server.base_url)
+    stream = client.chat.completions.create(model="fake", messages=MESSAGES, stream=True)
+    demux = StreamDemux(stream)
+    reasoning, answer = asyncio.run(demux.collect())
+    assert reasoning and answer
+    metrics = demux.metrics
+    assert metrics.reasoning.first_token_s < metrics.answer.first_token_s <= metrics.total_s
+    # one token per chunk at 200/s: the rate must not be dragged down by per-chunk thread hops
+    assert metrics.answer.chunks_per_s == pytest.approx(200, rel=0.3)
+
+
+def test_async_stream_reasoning_channel(server):
+    client = AsyncOpenAI(api_key="EMPTY", base_url=server.base_url)
+
+    async def run():
+        stream = await client.chat.completions.create(model="fake", messages=MESSAGES, stream=True)
+        demux = StreamDemux(stream, start_time=time.perf_counter())
+        return await demux.collect(), demux.metrics
+
+    (reasoning, answer), metrics = asyncio.run(run())
+    assert len(reasoning.split()) == metrics.reasoning.chunks == metrics.reasoning_tokens
+    assert answer
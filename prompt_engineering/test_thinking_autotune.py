@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from thinking_autotune import (LabelledPrompt, Observation, Recording, SettingStats, ThinkingSetting,
+                               choose_policy, last_number_matches, sweep)
+
+SETTINGS = [ThinkingSetting("off", {}), ThinkingSetting("on", {})]
+PROMPTS = [LabelledPrompt("p1", "arithmetic", "What is 2+2?", "4"),
+           LabelledPrompt("p2", "cot", "How many?", "67")]
+
+
+def fake_call(calls):
+    """`on` thinks (slow, always right), `off` is fast and only right on arithmetic."""
+    def call(setting, prompt):
+        calls.append((setting.name, prompt))
+        if setting.name == "on":
+            return "so the answer is 4" if "2+2" in prompt else "it is 67", 2.0, 500
+        return "4" if "2+2" in prompt else "60", 0.5, 10
+    return call
+
+
+@pytest.mark.parametrize("answer, ok", [("The answer is 1,400.", True), ("1400.0", True), ("14 or 1399", False),
+                                        ("no idea", False)])
+def test_last_number_matches(answer, ok):
+    assert last_number_matches(answer, "1400") is ok
+
+
+def test_record_then_replay_gives_the_same_stats(tmp_path):
+    path = str(tmp_path / "sweep.jsonl")
+    calls = []
+    recorded = sweep(SETTINGS, PROMPTS, Recording(path), call=fake_call(calls), trials=2)
+    assert len(calls) == 8
+    replayed = sweep(SETTINGS, PROMPTS, Recording(path, replay=True), trials=2)
+    assert {k: (v.latencies, v.correct) for k, v in replayed.items()} == \
+        {k: (v.latencies, v.correct) for k, v in recorded.items()}
+    with pytest.raises(KeyError):
+        sweep(SETTINGS, PROMPTS, Recording(path, replay=True), trials=3)
+
+
+def test_re_recording_resumes_instead_of_duplicating(tmp_path):
+    path = tmp_path / "sweep.jsonl"
+    sweep(SETTINGS, PROMPTS, Recording(str(path)), call=fake_call([]), trials=2)
+    calls = []
+    sweep(SETTINGS, PROMPTS, Recording(str(path)), call=fake_call(calls), trials=3)
+    assert len(calls) == 4                                          # only trial 2 was missing
+    keys = [tuple(json.loads(line)[k] for k in ("prompt_id", "setting", "trial")) for line in path.open()]
+    assert len(keys) == len(set(keys)) == 12
+
+
+def test_recording_rejects_a_duplicate(tmp_path):
+    recording = Recording(str(tmp_path / "sweep.jsonl"))
+    recording.add(Observation("p1", "off", 0, 0.5, 10, "4"))
+    with pytest.raises(ValueError):
+        recording.add(Observation("p1", "off", 0, 0.6, 10, "4"))
+
+
+def test_choose_policy_picks_the_fastest_accurate_setting():
+    stats = sweep(SETTINGS, PROMPTS, Recording(None), call=fake_call([]), trials=3)
+    assert choose_policy(stats) == {"arithmetic": "off", "cot": "on"}
+
+
+def test_choose_policy_falls_back_to_the_most_accurate():
+    def entry(setting, latencies, correct):
+        return SettingStats(setting, "cot", latencies, [0] * len(latencies), correct)
+
+    stats = {("cot", "a"): entry("a", [1.0, 1.0], 1), ("cot", "b"): entry("b", [3.0, 3.0], 1),
+             ("cot", "c"): entry("c", [0.5, 0.5], 0)}
+    assert choose_policy(stats) == {"cot": "a"}                      # tie on accuracy: the faster one
+    assert choose_policy(stats, min_accuracy=0.5) == {"cot": "a"}
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import List, Literal, Optional
+
+from tool_runtime import ToolCallAccumulator, ToolRegistry, ToolRuntime
+
+
+def chunk(content=None, calls=(), finish_reason=None):
+    """A streamed chunk; `calls` are (index, id, name, arguments) deltas."""
+    tool_calls = [SimpleNamespace(index=index, id=call_id,
+                                  function=SimpleNamespace(name=name, arguments=arguments))
+                  for index, call_id, name, arguments in calls] or None
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+# two calls whose argument deltas interleave and split keys, strings and escapes
+FRAGMENTED = [
+    chunk(calls=[(0, "call_a", "get_", "")]),
+    chunk(calls=[(0, None, "weather", '{"loc')]),
+    chunk(calls=[(1, "call_b", "get_weather", '{"location": "Par')]),
+    chunk(calls=[(0, None, None, 'ation": "San Francisco, \\"CA\\" {"')]),
+    chunk(calls=[(1, None, None, 'is", "unit": "fahrenheit"}')]),
+    chunk(calls=[(0, None, None, '}')]),
+    chunk(calls=[(2, "call_c", "get_time", "")], finish_reason="tool_calls"),
+]
+
+
+def test_fragmented_arguments_across_indexes():
+    accumulator = ToolCallAccumulator()
+    ready = [[call["id"] for call in accumulator.feed(c)] for c in FRAGMENTED]
+    assert ready == [[], [], [], [], ["call_b"], ["call_a"], []]      # each call as soon as its JSON closes
+    leftover = accumulator.close()
+    assert leftover == [{"id": "call_c", "name": "get_time", "arguments": {}}]
+    assert accumulator.finish_reason == "tool_calls"
+    message = accumulator.assistant_message()
+    assert [c["function"]["name"] for c in message["tool_calls"]] == ["get_weather", "get_weather", "get_time"]
+    assert json.loads(message["tool_calls"][0]["function"]["arguments"]) == {"location": 'San Francisco, "CA" {'}
+    assert message["tool_calls"][2]["function"]["arguments"] == "{}"
+
+
+def test_invalid_arguments_become_an_error_call():
+    accumulator = ToolCallAccumulator()
+    assert accumulator.feed(chunk(calls=[(0, "x", "f", '{"a": tru}')]))[0]["error"].startswith("invalid arguments")
+
+
+def test_schema_from_type_hints():
+    registry = ToolRegistry()
+
+    @registry.register
+    def get_weather(location: str, unit: Literal["celsius", "fahrenheit"] = "celsius", days: Optional[int] = None,
+                    tags: List[str] = (), *args, **kwargs) -> dict:
+        """Get the current weather in a given location
+
+        More detail that is not part of the description.
+        """
+
+    @registry.register(name="lookup", description="Look something up")
+    def anything(query):
+        pass
+
+    weather, lookup = registry.tools
+    function = weather["function"]
+    assert function["name"] == "get_weather"
+    assert function["description"] == "Get the current weather in a given location"
+    parameters = function["parameters"]
+    assert parameters["required"] == ["location"]
+    assert parameters["properties"]["location"] == {"type": "string"}
+    assert parameters["properties"]["unit"] == {"enum": ["celsius", "fahrenheit"], "type": "string",
+                                                "default": "celsius"}
+    assert parameters["properties"]["days"]["anyOf"] == [{"type": "integer"}, {"type": "null"}]
+    assert parameters["properties"]["tags"]["items"] == {"type": "string"}
+    assert set(parameters["properties"]) == {"location", "unit", "days", "tags"}
+    assert lookup["function"]["name"] == "lookup" and lookup["function"]["description"] == "Look something up"
+    assert "lookup" in registry and registry["lookup"] is anything
+
+
+def test_a_failing_tool_does_not_stop_the_others():
+    registry = ToolRegistry()
+    finished = []
+
+    @registry.register
+    def slow(seconds: float) -> dict:
+        time.sleep(seconds)
+        finished.append("slow")
+        return {"slept": seconds}
+
+    @registry.register
+    async def broken() -> dict:
+        raise RuntimeError("boom")
+
+    async def stream():
+        for c in [chunk(calls=[(0, "a", "slow", '{"seconds": 0.05}')]), chunk(calls=[(1, "b", "broken", "{}")]),
+                  chunk(calls=[(2, "c", "missing", "{}")])]:
+            yield c
+
+    runtime = ToolRuntime(registry)
+    try:
+        assistant, results, metrics = asyncio.run(runtime.run_turn(stream()))
+    finally:
+        runtime.close()
+    by_id = {r["tool_call_id"]: json.loads(r["content"]) for r in results}
+    assert by_id["a"] == {"slept": 0.05} and finished == ["slow"]
+    assert "boom" in by_id["b"]["error"]
+    assert by_id["c"] == {"error": "unknown tool 'missing'"}
+    assert metrics.tool_calls == 3 and metrics.first_tool_start_s <= metrics.stream_end_s <= metrics.tools_done_s
+    assert len(assistant["tool_calls"]) == 3
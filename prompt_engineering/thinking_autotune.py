@@ -0,0 +1,248 @@
+"""
+Thinking-budget autotuner.
+
+The scripts hard-code their reasoning knobs: thinking_budget 800 / 0 on
+Gemini, reasoning_effort="none" on Groq, enable_thinking False on vLLM.  This
+sweeps those settings over a labelled prompt set (starting with the arithmetic
+and chain-of-thought prompts of pe_v1.py), records p50/p95 latency, output
+tokens and correctness, and picks per prompt class the cheapest setting that
+stays accurate.
+
+Every response is written to a JSONL recording, so a sweep can be replayed
+offline and the policy recomputed without spending tokens.  Recording into a
+file that already exists resumes it: observations already there are reused
+and only the missing ones are requested.
+
+    python thinking_autotune.py --provider groq --model qwen/qwen3-32b --record sweep.jsonl
+    python thinking_autotune.py --provider groq --replay sweep.jsonl
+"""
+import argparse
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from pe_v1 import prompt_4, prompt_7
+
+
+class ThinkingSetting(NamedTuple):
+    name: str
+    params: dict      # extra chat.completions.create kwargs
+
+
+def _gemini_budget(budget: int) -> ThinkingSetting:
+    return ThinkingSetting(f"thinking_budget={budget}", {
+        "extra_body": {"extra_body": {"google": {"thinking_config": {"thinking_budget": budget}}}}
+    })
+
+
+def _vllm_thinking(enabled: bool) -> ThinkingSetting:
+    return ThinkingSetting(f"enable_thinking={enabled}", {
+        "extra_body": {"chat_template_kwargs": {"enable_thinking": enabled}}
+    })
+
+
+SETTINGS: Dict[str, List[ThinkingSetting]] = {
+    "gemini": [_gemini_budget(0), _gemini_budget(800), _gemini_budget(2048)],
+    "groq": [ThinkingSetting("reasoning_effort=none", {"reasoning_effort": "none"}),
+             ThinkingSetting("reasoning_effort=default", {"reasoning_effort": "default"})],
+    "vllm": [_vllm_thinking(False), _vllm_thinking(True)],
+}
+
+
+class LabelledPrompt(NamedTuple):
+    prompt_id: str
+    prompt_class: str
+    prompt: str
+    expected: str
+
+
+PROMPTS = [
+    LabelledPrompt("pe_v1.prompt_4", "arithmetic", prompt_4, "1400"),
+    LabelledPrompt("pe_v1.prompt_7", "cot", prompt_7, "67"),
+]
+
+_NUMBER = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+def last_number_matches(answer: str, expected: str) -> bool:
+    """Correct when the last number in the answer equals the expected one."""
+    numbers = _NUMBER.findall(answer or "")
+    if not numbers:
+        return False
+    try:
+        return float(numbers[-1].replace(",", "")) == float(expected)
+    except ValueError:
+        return False
+
+
+class Observation(NamedTuple):
+    prompt_id: str
+    setting: str
+    trial: int
+    latency: float
+    output_tokens: int
+    content: str
+
+
+class Recording:
+    """
+    JSONL file of observations, one per (prompt, setting, trial); `replay` mode
+    never calls the backend.  An existing file is loaded in record mode too, so
+    a re-run appends only what is missing instead of duplicating lines.
+    """
+
+    def __init__(self, path: Optional[str], replay: bool = False):
+        self.path = path
+        self.replay = replay
+        self._seen = {}
+        if path is not None and (replay or os.path.exists(path)):
+            with open(path) as f:
+                for line in f:
+                    obs = Observation(**json.loads(line))
+                    self._seen[obs[:3]] = obs
+
+    def get(self, prompt_id, setting, trial) -> Optional[Observation]:
+        return self._seen.get((prompt_id, setting, trial))
+
+    def add(self, obs: Observation):
+        if obs[:3] in self._seen:
+            raise ValueError(f"Already recorded: {obs[:3]}")
+        self._seen[obs[:3]] = obs
+        if self.path is not None and not self.replay:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(obs._asdict()) + "\n")
+
+
+def live_call(client, model: str, **defaults) -> Callable[[ThinkingSetting, str], tuple]:
+    """(setting, prompt) -> (content, latency_s, output_tokens) through an OpenAI-compatible client."""
+
+    def call(setting: ThinkingSetting, prompt: str):
+        start = time.perf_counter()
+        response = client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}], **defaults, **setting.params
+        )
+        latency = time.perf_counter() - start
+        usage = response.usage
+        return response.choices[0].message.content, latency, usage.completion_tokens if usage else 0
+
+    return call
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    rank = (len(ordered) - 1) * q
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+@dataclass
+class SettingStats:
+    setting: str
+    prompt_class: str
+    latencies: List[float] = field(default_factory=list)
+    output_tokens: List[int] = field(default_factory=list)
+    correct: int = 0
+
+    @property
+    def n(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def accuracy(self) -> float:
+        return self.correct / self.n if self.n else 0.0
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.latencies, 0.50)
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.latencies, 0.95)
+
+    @property
+    def mean_output_tokens(self) -> float:
+        return sum(self.output_tokens) / self.n if self.n else 0.0
+
+
+def sweep(settings: Sequence[ThinkingSetting], prompts: Sequence[LabelledPrompt], recording: Recording,
+          call: Optional[Callable] = None, trials: int = 3,
+          is_correct: Callable[[str, str], bool] = last_number_matches) -> Dict[tuple, SettingStats]:
+    """Run (or replay) every prompt x setting x trial; stats keyed by (prompt_class, setting name)."""
+    stats: Dict[tuple, SettingStats] = {}
+    for setting in settings:
+        for prompt in prompts:
+            key = (prompt.prompt_class, setting.name)
+            entry = stats.setdefault(key, SettingStats(setting.name, prompt.prompt_class))
+            for trial in range(trials):
+                obs = recording.get(prompt.prompt_id, setting.name, trial)
+                if obs is None:
+                    if recording.replay or call is None:
+                        raise KeyError(f"No recorded response for {prompt.prompt_id} / {setting.name} / {trial}")
+                    content, latency, tokens = call(setting, prompt.prompt)
+                    obs = Observation(prompt.prompt_id, setting.name, trial, latency, tokens, content)
+                    recording.add(obs)
+                entry.latencies.append(obs.latency)
+                entry.output_tokens.append(obs.output_tokens)
+                entry.correct += is_correct(obs.content, prompt.expected)
+    return stats
+
+
+def choose_policy(stats: Dict[tuple, SettingStats], min_accuracy: float = 1.0) -> Dict[str, str]:
+    """Per prompt class: the lowest-p50 setting meeting min_accuracy, else the most accurate one."""
+    by_class = defaultdict(list)
+    for entry in stats.values():
+        by_class[entry.prompt_class].append(entry)
+    policy = {}
+    for prompt_class, entries in by_class.items():
+        accurate = [e for e in entries if e.accuracy >= min_accuracy]
+        if accurate:
+            best = min(accurate, key=lambda e: (e.p50, e.mean_output_tokens))
+        else:
+            best = max(entries, key=lambda e: (e.accuracy, -e.p50))
+        policy[prompt_class] = best.setting
+    return policy
+
+
+def print_report(stats: Dict[tuple, SettingStats]):
+    print(f"{'class':<11} {'setting':<26} {'n':>3} {'acc':>5} {'p50 s':>7} {'p95 s':>7} {'out tok':>8}")
+    for (prompt_class, _), e in sorted(stats.items()):
+        print(f"{prompt_class:<11} {e.setting:<26} {e.n:>3} {e.accuracy:>5.2f} {e.p50:>7.2f} "
+              f"{e.p95:>7.2f} {e.mean_output_tokens:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", choices=sorted(SETTINGS), default="groq")
+    parser.add_argument("--model", default="qwen/qwen3-32b")
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--min-accuracy", type=float, default=1.0)
+    parser.add_argument("--record", help="JSONL file to append live responses to")
+    parser.add_argument("--replay", help="JSONL file to replay instead of calling the API")
+    parser.add_argument("--policy-out", help="write the chosen policy as JSON")
+    args = parser.parse_args()
+
+    call = None
+    if args.replay:
+        recording = Recording(args.replay, replay=True)
+    else:
+        from openai import OpenAI
+        from providers import PROVIDERS, load_keys
+        recording = Recording(args.record)
+        client = OpenAI(api_key=next(iter(load_keys(args.provider).values())),
+                        base_url=PROVIDERS[args.provider].base_url)
+        call = live_call(client, args.model, temperature=0.6, top_p=0.95)
+
+    stats = sweep(SETTINGS[args.provider], PROMPTS, recording, call=call, trials=args.trials)
+    print_report(stats)
+    policy = choose_policy(stats, args.min_accuracy)
+    print(json.dumps(policy, indent=2))
+    if args.policy_out:
+        with open(args.policy_out, "w") as f:
+            json.dump(policy, f, indent=2)
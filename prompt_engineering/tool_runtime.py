@@ -0,0 +1,274 @@
+"""
+Streaming tool-call runtime.
+
+vllm_code.py sends `tools=[get_weather]` with a blocking call and only prints
+the response.  Here the tool calls are read from a streamed completion: the
+argument deltas of every call are accumulated and a call is dispatched as soon
+as its arguments JSON closes, while the model is still writing the next call.
+Independent calls run concurrently (async tools on the event loop, plain
+functions on a thread pool) and their results go back to the model until it
+answers without tools.
+
+    registry = ToolRegistry()
+
+    @registry.register
+    def get_weather(location: str, unit: str = "celsius") -> dict:
+        \"\"\"Get the current weather in a given location\"\"\"
+        ...
+
+    result = run_tools_sync(AsyncOpenAI(...), registry, "What's the weather in SF and Paris?", model=model)
+    print(result.answer)
+"""
+import asyncio
+import inspect
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import create_model
+
+from llm_client import ToolCall, _messages
+
+
+class ToolRegistry:
+    """Python functions exposed as tools; the `tools` schema is built from their signatures."""
+
+    def __init__(self):
+        self._functions: Dict[str, Callable] = {}
+        self._schemas: Dict[str, dict] = {}
+
+    def register(self, fn: Optional[Callable] = None, *, name: Optional[str] = None,
+                 description: Optional[str] = None):
+        """Use as @registry.register or @registry.register(name=..., description=...)."""
+        def decorate(fn):
+            tool_name = name or fn.__name__
+            self._functions[tool_name] = fn
+            self._schemas[tool_name] = {
+                "type": "function",
+                "function": {
+                    "name": tool_name,
+                    "description": description or inspect.cleandoc(fn.__doc__ or "").split("\n\n")[0],
+                    "parameters": _parameters_schema(fn),
+                },
+            }
+            return fn
+        return decorate(fn) if fn is not None else decorate
+
+    @property
+    def tools(self) -> List[dict]:
+        return list(self._schemas.values())
+
+    def __getitem__(self, name: str) -> Callable:
+        return self._functions[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._functions
+
+
+def _parameters_schema(fn: Callable) -> dict:
+    fields = {}
+    for param in inspect.signature(fn).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        annotation = Any if param.annotation is param.empty else param.annotation
+        fields[param.name] = (annotation, ... if param.default is param.empty else param.default)
+    schema = create_model(f"{fn.__name__}_parameters", **fields).model_json_schema()
+    schema.pop("title", None)
+    for prop in schema.get("properties", {}).values():
+        prop.pop("title", None)
+    return schema
+
+
+class _PendingCall:
+    __slots__ = ("id", "name", "arguments", "depth", "in_string", "escape", "started", "closed")
+
+    def __init__(self):
+        self.id = None
+        self.name = ""
+        self.arguments = []
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.started = False
+        self.closed = False
+
+    def feed(self, text: str) -> bool:
+        """Append an arguments delta; True once the top-level JSON object has closed."""
+        self.arguments.append(text)
+        for ch in text:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                self.started = True
+            elif ch in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return True
+        return False
+
+    def to_call(self) -> ToolCall:
+        self.closed = True
+        text = "".join(self.arguments)
+        try:
+            arguments = json.loads(text) if text.strip() else {}
+        except json.JSONDecodeError as e:
+            return ToolCall(id=self.id, name=self.name, arguments={}, error=f"invalid arguments JSON: {e}")
+        return ToolCall(id=self.id, name=self.name, arguments=arguments)
+
+
+class ToolCallAccumulator:
+    """
+    Rebuilds tool calls from streamed chunks.  `feed(chunk)` returns the calls
+    whose arguments completed in that chunk; `close()` returns any left open
+    when the stream ends (e.g. a call with no arguments).
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, _PendingCall] = {}
+        self.content: List[str] = []
+        self.finish_reason: Optional[str] = None
+
+    def feed(self, chunk) -> List[ToolCall]:
+        ready = []
+        if not chunk.choices:
+            return ready
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+        if delta is None:
+            return ready
+        if delta.content:
+            self.content.append(delta.content)
+        for part in delta.tool_calls or ():
+            pending = self._calls.setdefault(part.index, _PendingCall())
+            if part.id:
+                pending.id = part.id
+            function = part.function
+            if function is None:
+                continue
+            if function.name:
+                pending.name += function.name
+            if function.arguments and not pending.closed and pending.feed(function.arguments):
+                ready.append(pending.to_call())
+        return ready
+
+    def close(self) -> List[ToolCall]:
+        return [pending.to_call() for _, pending in sorted(self._calls.items()) if not pending.closed]
+
+    def assistant_message(self) -> dict:
+        """The assistant turn to append to the conversation before the tool results."""
+        message = {"role": "assistant", "content": "".join(self.content) or None}
+        if self._calls:
+            message["tool_calls"] = [
+                {"id": pending.id, "type": "function",
+                 "function": {"name": pending.name, "arguments": "".join(pending.arguments) or "{}"}}
+                for _, pending in sorted(self._calls.items())
+            ]
+        return message
+
+
+@dataclass
+class TurnMetrics:
+    """Seconds since the request started."""
+    first_tool_start_s: Optional[float] = None
+    stream_end_s: Optional[float] = None
+    tools_done_s: Optional[float] = None
+    tool_calls: int = 0
+
+
+@dataclass
+class ToolRunResult:
+    answer: Optional[str]
+    messages: List[dict]
+    turns: List[TurnMetrics] = field(default_factory=list)
+
+
+class ToolRuntime:
+
+    def __init__(self, registry: ToolRegistry, max_workers: int = 8):
+        self.registry = registry
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    async def execute(self, call: ToolCall) -> dict:
+        """Run one call; errors go back to the model as the tool result instead of raising."""
+        if "error" in call:
+            result = {"error": call["error"]}
+        elif call["name"] not in self.registry:
+            result = {"error": f"unknown tool {call['name']!r}"}
+        else:
+            fn = self.registry[call["name"]]
+            try:
+                if inspect.iscoroutinefunction(fn):
+                    result = await fn(**call["arguments"])
+                else:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(self._pool, lambda: fn(**call["arguments"]))
+            except Exception as e:
+                result = {"error": repr(e)}
+        content = result if isinstance(result, str) else json.dumps(result, default=str)
+        return {"role": "tool", "tool_call_id": call["id"], "content": content}
+
+    async def run_turn(self, stream, start: Optional[float] = None) -> Tuple[dict, List[dict], TurnMetrics]:
+        """Consume one streamed completion, executing tool calls as they close."""
+        start = time.perf_counter() if start is None else start
+        metrics = TurnMetrics()
+        accumulator = ToolCallAccumulator()
+        tasks = []
+
+        def dispatch(calls):
+            for call in calls:
+                if metrics.first_tool_start_s is None:
+                    metrics.first_tool_start_s = time.perf_counter() - start
+                tasks.append(asyncio.ensure_future(self.execute(call)))
+
+        async for chunk in stream:
+            dispatch(accumulator.feed(chunk))
+        dispatch(accumulator.close())
+        metrics.stream_end_s = time.perf_counter() - start
+        results = list(await asyncio.gather(*tasks))
+        metrics.tools_done_s = time.perf_counter() - start
+        metrics.tool_calls = len(tasks)
+        return accumulator.assistant_message(), results, metrics
+
+    async def run(self, client, messages, max_turns: int = 5, **settings) -> ToolRunResult:
+        """
+        Multi-turn loop: stream, run the tools, send their results back, until the
+        model answers without tool calls or `max_turns` is reached.
+        """
+        messages = _messages(messages)
+        result = ToolRunResult(answer=None, messages=messages)
+        for _ in range(max_turns):
+            start = time.perf_counter()
+            stream = await client.chat.completions.create(
+                messages=messages, tools=self.registry.tools, stream=True, **settings)
+            assistant, tool_messages, metrics = await self.run_turn(stream, start)
+            messages.append(assistant)
+            result.turns.append(metrics)
+            if not tool_messages:
+                result.answer = assistant["content"]
+                break
+            messages.extend(tool_messages)
+        return result
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+def run_tools_sync(client, registry: ToolRegistry, messages, **kwargs) -> ToolRunResult:
+    """ToolRuntime.run for plain scripts; `client` is an openai.AsyncOpenAI."""
+    runtime = ToolRuntime(registry)
+    try:
+        return asyncio.run(runtime.run(client, messages, **kwargs))
+    finally:
+        runtime.close()
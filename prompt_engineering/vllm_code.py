@@ -59,6 +59,43 @@ messages = [{"role": "user", "content": "How many 'r' are there in strawberry?"}
 #         print(content, end="", flush=True)
 
 
+# # same split for vLLM reasoning_content, Groq reasoning/raw <think> and MLX output, with timings
+# import asyncio
+# from stream_demux import StreamDemux
+
+# stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+# demux = StreamDemux(stream)
+# reasoning_content, content = asyncio.run(demux.collect())
+# print("reasoning_content:", reasoning_content)
+# print("content:", content)
+# print(f"ttft reasoning {demux.metrics.ttft_reasoning:.2f}s, ttft answer {demux.metrics.ttft_answer:.2f}s, "
+#       f"thinking tokens {demux.metrics.reasoning_tokens}")
+
+# Schema-constrained output: vLLM enforces response_format json_schema with guided decoding,
+# so the content always parses (see llm_output_parsing/constrained_decoding.py for the MLX path)
+# from enum import Enum
+# from typing import Optional
+# from pydantic import BaseModel
+#
+# class Category(str, Enum):
+#     violence = "violence"
+#     sexual = "sexual"
+#     self_harm = "self_harm"
+#
+# class ContentCompliance(BaseModel):
+#     is_violating: bool
+#     category: Optional[Category]
+#     explanation_if_violating: Optional[str]
+#
+# response = client.chat.completions.create(
+#     model=model,
+#     messages=[{"role": "user", "content": "Is 'I will hurt you' violating? Answer as JSON."}],
+#     response_format={"type": "json_schema",
+#                      "json_schema": {"name": "ContentCompliance", "schema": ContentCompliance.model_json_schema()}},
+#     extra_body={"chat_template_kwargs": {"enable_thinking": False}},
+# )
+# print(ContentCompliance.model_validate_json(response.choices[0].message.content))
+
 tools = [{
     "type": "function",
     "function": {
@@ -90,6 +127,22 @@ print(f"reasoning_content: {response.choices[0].message.reasoning_content}")
 # print(f"Function called: {tool_call.name}")
 # print(f"Arguments: {tool_call.arguments}")
 
+# Streamed tool calls, executed as soon as their arguments close, results sent back to the model
+# from openai import AsyncOpenAI
+# from tool_runtime import ToolRegistry, run_tools_sync
+
+# registry = ToolRegistry()
+
+# @registry.register
+# def get_weather(location: str, unit: str = "celsius") -> dict:
+#     """Get the current weather in a given location"""
+#     return {"location": location, "temperature": 21, "unit": unit}
+
+# result = run_tools_sync(AsyncOpenAI(api_key=openai_api_key, base_url=openai_api_base), registry,
+#                         "What's the weather like in San Francisco and Paris?", model=model,
+#                         extra_body={"chat_template_kwargs": {"enable_thinking": False}})
+# print(result.answer, result.turns)
+
 
 #  result = chat_completion_from_url.choices[0].message.content
 